@@ -7,20 +7,34 @@ __version__ = "1.0.0"
 __author__ = "Auto-Clicker Development Team"
 
 from .auto_clicker import AutoClicker
+from .multi_clicker import MultiAutoClicker
+from .async_clicker import AsyncAutoClicker, MatchEvent
 from .window_manager import WindowManager
+from .window_index import WindowIndex
 from .screen_capture import ScreenCapture
 from .image_matcher import ImageMatcher, MatchResult
 from .mouse_controller import MouseController
 from .action_handler import ActionHandler
 from .config_loader import ConfigLoader
+from .pixel_probe import PixelProbeSet
+from .task_plan import ProcessPlan, CompiledTask, CompiledAction, ActionOp
 
 __all__ = [
     'AutoClicker',
+    'MultiAutoClicker',
+    'AsyncAutoClicker',
+    'MatchEvent',
     'WindowManager',
+    'WindowIndex',
     'ScreenCapture',
     'ImageMatcher',
     'MatchResult',
     'MouseController',
     'ActionHandler',
     'ConfigLoader',
+    'PixelProbeSet',
+    'ProcessPlan',
+    'CompiledTask',
+    'CompiledAction',
+    'ActionOp',
 ]
@@ -0,0 +1,253 @@
+"""
+Action Executor Module
+Play timestamped action timelines on a dedicated thread with immediate cancellation
+"""
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, List, Optional, Tuple
+
+from mouse_controller import MouseController
+from input_backend import EventKind, InputEvent
+
+logger = logging.getLogger(__name__)
+
+POLICY_DROP = 'drop'        # ignore a new timeline while the owner has one playing or queued
+POLICY_REPLACE = 'replace'  # cancel the owner's timeline and play the new one
+POLICY_QUEUE = 'queue'      # play the new timeline after the owner's current one
+CONFLICT_POLICIES = (POLICY_DROP, POLICY_REPLACE, POLICY_QUEUE)
+
+
+# Timeline steps use the input backend's event kinds
+StepKind = EventKind
+
+
+@dataclass(frozen=True)
+class TimelineStep:
+    """Input operation scheduled relative to the timeline start"""
+    at: float  # seconds from timeline start
+    kind: StepKind
+    x: int = 0
+    y: int = 0
+    button: str = "left"
+
+
+@dataclass(frozen=True)
+class Timeline:
+    """Ordered input steps plus a trailing cooldown"""
+    steps: Tuple[TimelineStep, ...]
+    duration: float  # seconds; may extend past the last step
+    owner: str = ""  # conflict key, e.g. a window or process
+    label: str = ""
+    prepare: Optional[Callable[[], bool]] = field(default=None, compare=False)  # runs before the first step
+
+
+class ActionExecutor:
+    """Run timelines one at a time using event-based waits"""
+
+    def __init__(self, mouse_controller: MouseController, policy: str = POLICY_DROP):
+        """
+        Initialize action executor
+
+        Args:
+            mouse_controller: MouseController instance
+            policy: Conflict policy for timelines with the same owner
+                    ('drop', 'replace' or 'queue')
+        """
+        if policy not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy: {policy}")
+
+        self.mouse = mouse_controller
+        self.policy = policy
+
+        self._queue: Deque[Timeline] = deque()
+        self._current: Optional[Timeline] = None
+        self._cancel_current = threading.Event()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.completed = 0
+        self.cancelled = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start executor thread"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Cancel all timelines and stop the executor thread
+
+        Args:
+            timeout: Seconds to wait for the thread to exit
+        """
+        with self._condition:
+            self._running = False
+            self._queue.clear()
+            self._cancel_current.set()
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def is_busy(self, owner: Optional[str] = None) -> bool:
+        """
+        Check whether a timeline is playing or queued
+
+        Args:
+            owner: Only consider timelines of this owner (default: any)
+
+        Returns:
+            True if busy
+        """
+        with self._condition:
+            return self._owner_busy(owner)
+
+    def _owner_busy(self, owner: Optional[str]) -> bool:
+        """Check busy state; caller holds the condition lock"""
+        if owner is None:
+            return self._current is not None or bool(self._queue)
+        if self._current is not None and self._current.owner == owner:
+            return True
+        return any(t.owner == owner for t in self._queue)
+
+    def submit(self, timeline: Timeline) -> bool:
+        """
+        Submit a timeline, applying the conflict policy
+
+        Args:
+            timeline: Timeline to play
+
+        Returns:
+            True if the timeline was accepted
+        """
+        with self._condition:
+            if not self._running:
+                return False
+
+            if self._owner_busy(timeline.owner):
+                if self.policy == POLICY_DROP:
+                    self.dropped += 1
+                    logger.debug(f"Dropped timeline {timeline.label}: {timeline.owner} busy")
+                    return False
+                if self.policy == POLICY_REPLACE:
+                    self._cancel_owner(timeline.owner)
+
+            self._queue.append(timeline)
+            self._condition.notify_all()
+            return True
+
+    def cancel(self, owner: Optional[str] = None):
+        """
+        Cancel playing and queued timelines immediately
+
+        Args:
+            owner: Only cancel timelines of this owner (default: all)
+        """
+        with self._condition:
+            self._cancel_owner(owner)
+
+    def _cancel_owner(self, owner: Optional[str]):
+        """Cancel timelines; caller holds the condition lock"""
+        before = len(self._queue)
+        if owner is None:
+            self._queue.clear()
+        else:
+            self._queue = deque(t for t in self._queue if t.owner != owner)
+        self.cancelled += before - len(self._queue)
+
+        if self._current is not None and (owner is None or self._current.owner == owner):
+            self._cancel_current.set()
+
+    def _run(self):
+        """Executor thread body"""
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    break
+                self._current = self._queue.popleft()
+                self._cancel_current.clear()
+
+            timeline = self._current
+            try:
+                finished = self._play(timeline)
+            except Exception as e:
+                logger.error(f"Error playing timeline {timeline.label}: {e}", exc_info=True)
+                finished = False
+
+            with self._condition:
+                self._current = None
+                if finished:
+                    self.completed += 1
+                else:
+                    self.cancelled += 1
+                self._condition.notify_all()
+
+        logger.debug("Action executor stopped")
+
+    def _play(self, timeline: Timeline) -> bool:
+        """
+        Play a timeline, waiting on the cancel event between steps
+
+        Returns:
+            True if played to the end, False if cancelled
+        """
+        if timeline.prepare is not None and not timeline.prepare():
+            logger.debug(f"Skipped timeline {timeline.label}: prepare failed")
+            return False
+
+        start = time.monotonic()
+        pressed = set()
+        steps = timeline.steps
+        i = 0
+
+        while i < len(steps):
+            at = steps[i].at
+            remaining = start + at - time.monotonic()
+            if remaining > 0 and self._cancel_current.wait(remaining):
+                self._release_buttons(pressed)
+                return False
+            if self._cancel_current.is_set():
+                self._release_buttons(pressed)
+                return False
+
+            # Steps due at the same instant go to the backend as one batch
+            batch: List[InputEvent] = []
+            while i < len(steps) and steps[i].at == at:
+                step = steps[i]
+                batch.append(InputEvent(step.kind, step.x, step.y, step.button))
+                i += 1
+
+            if not self.mouse.submit(batch):
+                logger.warning(f"Input batch failed in timeline {timeline.label}")
+            for event in batch:
+                if event.kind == StepKind.DOWN:
+                    pressed.add(event.button)
+                elif event.kind == StepKind.UP:
+                    pressed.discard(event.button)
+
+        if pressed:
+            self._release_buttons(pressed)
+
+        # Trailing delays keep the owner busy, like the blocking implementation did
+        remaining = start + timeline.duration - time.monotonic()
+        if remaining > 0 and self._cancel_current.wait(remaining):
+            return False
+
+        logger.debug(f"Timeline {timeline.label} finished in {time.monotonic() - start:.3f}s")
+        return True
+
+    def _release_buttons(self, buttons):
+        """Make sure a cancelled timeline never leaves a button held"""
+        for button in list(buttons):
+            self.mouse.release(button)
@@ -4,9 +4,12 @@ Execute action sequences (move, click, delay)
 """
 import time
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import Callable, Dict, Any, Optional, Sequence, Tuple, Union
 from mouse_controller import MouseController
 from image_matcher import MatchResult
+from config_loader import ConfigLoader
+from task_plan import ActionOp, CompiledAction
+from action_executor import StepKind, Timeline, TimelineStep
 
 logger = logging.getLogger(__name__)
 
@@ -26,14 +29,14 @@ class ActionHandler:
     def calculate_absolute_position(self,
                                    match_result: MatchResult,
                                    window_rect: Tuple[int, int, int, int],
-                                   offset: Dict[str, int]) -> Tuple[int, int]:
+                                   offset: Union[Dict[str, int], Tuple[int, int]]) -> Tuple[int, int]:
         """
         Calculate absolute screen position from match result and offset
         
         Args:
             match_result: Template match result
             window_rect: Window rectangle (left, top, right, bottom)
-            offset: Offset dictionary with 'X' and 'Y' keys
+            offset: Offset dictionary with 'X' and 'Y' keys, or (x, y) tuple
             
         Returns:
             Tuple of (x, y) absolute screen coordinates
@@ -45,8 +48,16 @@ class ActionHandler:
         match_x, match_y = match_result.location
         
         # Get offset
-        offset_x = offset.get('X', 0)
-        offset_y = offset.get('Y', 0)
+        if isinstance(offset, dict):
+            offset_x = offset.get('X', 0)
+            offset_y = offset.get('Y', 0)
+        else:
+            offset_x, offset_y = offset
+        
+        # Offsets are written for unscaled templates
+        if match_result.scale != 1.0:
+            offset_x = int(round(offset_x * match_result.scale))
+            offset_y = int(round(offset_y * match_result.scale))
         
         # Calculate absolute position
         window_left, window_top, _, _ = window_rect
@@ -61,62 +72,64 @@ class ActionHandler:
         return (abs_x, abs_y)
     
     def execute_action(self,
-                      action: Dict[str, Any],
+                      action: Union[CompiledAction, Dict[str, Any]],
                       match_result: MatchResult,
                       window_rect: Tuple[int, int, int, int]) -> bool:
         """
         Execute a single action
         
         Args:
-            action: Action dictionary with 'Type' and other parameters
+            action: CompiledAction, or action dictionary with 'Type' and other parameters
             match_result: Template match result for position reference
             window_rect: Window rectangle
             
         Returns:
             True if successful, False otherwise
         """
-        action_type = action.get('Type', '').lower()
+        if isinstance(action, dict):
+            try:
+                action = ConfigLoader.compile_action(action)
+            except ValueError as e:
+                logger.warning(str(e))
+                return False
+        
+        op = action.op
         
         try:
-            if action_type == 'move':
-                offset = action.get('Offset', {'X': 0, 'Y': 0})
-                x, y = self.calculate_absolute_position(match_result, window_rect, offset)
+            if op == ActionOp.MOVE:
+                x, y = self.calculate_absolute_position(match_result, window_rect, action.offset)
                 self.mouse.move(x, y)
                 logger.info(f"Executed move to ({x}, {y})")
                 return True
             
-            elif action_type == 'click':
-                offset = action.get('Offset', {'X': 0, 'Y': 0})
-                x, y = self.calculate_absolute_position(match_result, window_rect, offset)
-                button = action.get('Button', 'left').lower()
-                self.mouse.click(x, y, button)
-                logger.info(f"Executed {button} click at ({x}, {y})")
+            elif op == ActionOp.CLICK:
+                x, y = self.calculate_absolute_position(match_result, window_rect, action.offset)
+                self.mouse.click(x, y, action.button)
+                logger.info(f"Executed {action.button} click at ({x}, {y})")
                 return True
             
-            elif action_type == 'delay':
-                delay_ms = action.get('Delay', 0)
-                delay_sec = delay_ms / 1000.0
-                time.sleep(delay_sec)
-                logger.debug(f"Executed delay: {delay_ms}ms")
+            elif op == ActionOp.DELAY:
+                time.sleep(action.delay)
+                logger.debug(f"Executed delay: {action.delay * 1000:.0f}ms")
                 return True
             
             else:
-                logger.warning(f"Unknown action type: {action_type}")
+                logger.warning(f"Unknown action op: {op}")
                 return False
                 
         except Exception as e:
-            logger.error(f"Error executing action {action_type}: {e}")
+            logger.error(f"Error executing action {op.name}: {e}")
             return False
     
     def execute_actions(self,
-                       actions: List[Dict[str, Any]],
+                       actions: Sequence[Union[CompiledAction, Dict[str, Any]]],
                        match_result: MatchResult,
                        window_rect: Tuple[int, int, int, int]) -> bool:
         """
         Execute a sequence of actions
         
         Args:
-            actions: List of action dictionaries
+            actions: List of compiled actions or action dictionaries
             match_result: Template match result for position reference
             window_rect: Window rectangle
             
@@ -130,3 +143,47 @@ class ActionHandler:
         
         logger.info(f"Executed {len(actions)} actions successfully")
         return True
+    
+    def build_timeline(self,
+                       actions: Sequence[CompiledAction],
+                       match_result: MatchResult,
+                       window_rect: Tuple[int, int, int, int],
+                       owner: str = "",
+                       label: str = "",
+                       prepare: Optional[Callable[[], bool]] = None) -> Timeline:
+        """
+        Compile actions into a timestamped timeline for the ActionExecutor
+        
+        Positions are resolved now, against the frame the match came from.
+        
+        Args:
+            actions: Compiled actions
+            match_result: Template match result for position reference
+            window_rect: Window rectangle
+            owner: Conflict key for the executor
+            label: Name used in logs
+            prepare: Called by the executor right before playback, e.g. to focus
+                     the target window; returning False skips the timeline
+            
+        Returns:
+            Timeline instance
+        """
+        steps = []
+        t = 0.0
+        
+        for action in actions:
+            if action.op == ActionOp.MOVE:
+                x, y = self.calculate_absolute_position(match_result, window_rect, action.offset)
+                steps.append(TimelineStep(at=t, kind=StepKind.MOVE, x=x, y=y))
+            
+            elif action.op == ActionOp.CLICK:
+                x, y = self.calculate_absolute_position(match_result, window_rect, action.offset)
+                steps.append(TimelineStep(at=t, kind=StepKind.MOVE, x=x, y=y))
+                steps.append(TimelineStep(at=t, kind=StepKind.DOWN, x=x, y=y, button=action.button))
+                t += self.mouse.click_delay
+                steps.append(TimelineStep(at=t, kind=StepKind.UP, x=x, y=y, button=action.button))
+            
+            elif action.op == ActionOp.DELAY:
+                t += action.delay
+        
+        return Timeline(steps=tuple(steps), duration=t, owner=owner, label=label, prepare=prepare)
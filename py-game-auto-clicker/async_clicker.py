@@ -0,0 +1,295 @@
+"""
+Async Auto Clicker Module
+asyncio-native runtime: coroutine start/stop and an async stream of match events
+"""
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Tuple, Union
+
+import numpy as np
+
+from auto_clicker import AutoClicker
+from image_matcher import MatchResult
+from action_executor import ActionExecutor
+from input_backend import InputBackend
+from cycle_budget import CycleScheduler
+from task_plan import CompiledTask
+from window_index import WindowIndex
+
+logger = logging.getLogger(__name__)
+
+# Pause between task cycles, as in the threaded task loop
+CYCLE_DELAY = 0.01
+
+# Events kept for a slow consumer before the oldest are dropped
+EVENT_QUEUE_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class MatchEvent:
+    """Outcome of evaluating one task against one frame"""
+    process_name: str
+    cycle: int
+    task_index: int
+    result: Optional[MatchResult]  # None if the task did not trigger
+    submitted: bool  # actions accepted by the action executor
+    timestamp: float  # time.time() when matching finished
+    
+    @property
+    def matched(self) -> bool:
+        return self.result is not None
+
+
+class AsyncAutoClicker:
+    """
+    Drive one target window from an asyncio event loop
+    
+    Capture and matching run in an executor, task delays are asyncio
+    sleeps, and stop() cancels the loop task, so many clickers can share
+    one loop. Tasks go through AutoClicker.evaluate_task, so 'CycleBudget',
+    'AdaptiveOrder' and 'FlightRecorder' behave as in the threaded loop.
+    Pass a shared executor, WindowIndex and ActionExecutor to avoid
+    per-target threads entirely.
+    """
+    
+    def __init__(self,
+                 config_path: str,
+                 capture_method: str = "win32",
+                 input_backend: Union[str, InputBackend] = "auto",
+                 executor: Optional[Executor] = None,
+                 window_index: Optional[WindowIndex] = None,
+                 action_executor: Optional[ActionExecutor] = None):
+        """
+        Initialize async auto-clicker
+        
+        Args:
+            config_path: Path to configuration file
+            capture_method: Screen capture method ('win32' or 'mss')
+            input_backend: Input backend ('auto', 'win32', 'xtest' or 'recording') or instance
+            executor: Executor for capture and matching (default: loop's default executor)
+            window_index: Shared, already started window index (default: own index)
+            action_executor: Shared, already started action executor (default: own executor)
+        """
+        self.clicker = AutoClicker(config_path, capture_method=capture_method,
+                                   input_backend=input_backend, window_index=window_index)
+        self.executor = executor
+        self._shared_action_executor = action_executor
+        
+        self.cycle = 0
+        self._task: Optional[asyncio.Task] = None
+        self._events: Optional[asyncio.Queue] = None
+        self.dropped_events = 0
+    
+    @property
+    def is_running(self) -> bool:
+        """Check if the task loop is running"""
+        return self._task is not None and not self._task.done()
+    
+    @property
+    def owner(self) -> str:
+        """Action executor conflict key of this target"""
+        return f"{self.clicker.plan.process_name}:{self.clicker.window_manager.hwnd}"
+    
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call in the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+    
+    async def start(self, process_name: str) -> bool:
+        """
+        Load configuration, activate the window and start the task loop
+        
+        Args:
+            process_name: Name of the target process
+            
+        Returns:
+            True if started successfully, False otherwise
+        """
+        if self.is_running:
+            logger.warning("Async auto-clicker is already running")
+            return False
+            
+        clicker = self.clicker
+        if not await self._run_blocking(clicker.load_config, process_name):
+            return False
+            
+        if self._shared_action_executor is not None:
+            clicker.action_executor = self._shared_action_executor
+            
+        if clicker._owns_window_index:
+            await self._run_blocking(clicker.window_index.start)
+            
+        if not await self._run_blocking(clicker.activate_target_window, process_name):
+            logger.error("Failed to activate target window")
+            if clicker._owns_window_index:
+                clicker.window_index.stop()
+            return False
+            
+        clicker._stop_event.clear()
+        if self._shared_action_executor is None:
+            clicker.action_executor.start()
+        clicker.is_running = True
+        
+        self.cycle = 0
+        self._events = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._run(), name=f"clicker:{process_name}")
+        
+        logger.info(f"Async auto-clicker started for {process_name}")
+        return True
+    
+    async def stop(self):
+        """Stop the task loop and cancel pending actions; also cleans up after the loop died"""
+        if self._task is None:
+            logger.warning("Async auto-clicker is not running")
+            return
+            
+        clicker = self.clicker
+        clicker.is_running = False
+        # In-flight matching abandons its remaining icon groups
+        clicker._stop_event.set()
+        clicker.action_executor.cancel(self.owner)
+        
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+            
+        if self._shared_action_executor is None:
+            await self._run_blocking(clicker.action_executor.stop)
+        if clicker._owns_window_index:
+            await self._run_blocking(clicker.window_index.stop)
+        clicker.frame_source.close()
+        self._task = None
+        
+        await self._run_blocking(clicker.report_stats)
+        logger.info(f"Async auto-clicker stopped after {self.cycle} cycles")
+    
+    def _evaluate(self, task: CompiledTask) -> Optional[Tuple[Optional[MatchResult], bool]]:
+        """Capture a frame, match a task and submit its actions; runs in the executor"""
+        clicker = self.clicker
+        frame = clicker.capture_frame()
+        if frame is None:
+            return None
+        screenshot, window_rect = frame
+        # Scale detection searches every scale until the anchor is found, so it stays off the loop
+        gray = clicker.image_matcher.to_gray(screenshot, clicker.frame_source.regions)
+        return clicker.evaluate_task(task, screenshot, window_rect, clicker.match_scale(gray), gray,
+                                     owner=self.owner)
+    
+    def _prepare_budgeted_cycle(self) -> Optional[Tuple[np.ndarray, Tuple[int, int, int, int], np.ndarray,
+                                                        float, Optional[Tuple[CompiledTask, ...]]]]:
+        """Capture the frame of a budgeted cycle and classify it; runs in the executor"""
+        clicker = self.clicker
+        frame = clicker.capture_frame()
+        if frame is None:
+            return None
+        screenshot, window_rect = frame
+        # The cycle's tasks may run on other executor threads, which have their own gray buffers
+        gray = clicker.image_matcher.to_gray(screenshot, clicker.frame_source.regions).copy()
+        scale = clicker.match_scale(gray)
+        tasks = clicker.state_tasks(screenshot, gray, scale) if clicker.screen_classifier is not None else None
+        return screenshot, window_rect, gray, scale, tasks
+    
+    async def _run_budgeted_cycle(self):
+        """Capture once and evaluate tasks in priority order until the cycle budget is spent"""
+        clicker = self.clicker
+        if clicker.cycle_scheduler is None:
+            clicker.cycle_scheduler = CycleScheduler(clicker.plan.tasks, clicker.plan.cycle_budget)
+        scheduler = clicker.cycle_scheduler
+        
+        # The budget covers capture too: it bounds how stale the frame gets
+        started = time.monotonic()
+        prepared = await self._run_blocking(self._prepare_budgeted_cycle)
+        if prepared is None:
+            if clicker.frame_source.exhausted:
+                clicker.is_running = False
+            return
+        screenshot, window_rect, gray, scale, tasks = prepared
+        
+        scheduler.start_cycle(started, tasks)
+        while clicker.is_running:
+            task = scheduler.next_task()
+            if task is None:
+                break
+            result, submitted = await self._run_blocking(clicker.evaluate_task, task, screenshot,
+                                                         window_rect, scale, gray, self.owner)
+            self._publish(MatchEvent(clicker.plan.process_name, self.cycle, task.index,
+                                     result, submitted, time.time()))
+            if task.delay > 0:
+                await asyncio.sleep(task.delay)
+        scheduler.end_cycle()
+        clicker.end_cycle()
+    
+    async def _run_cycle(self):
+        """Evaluate every task of the cycle, each on a fresh frame"""
+        clicker = self.clicker
+        plan = clicker.plan
+        tasks = await self._run_blocking(clicker.cycle_tasks)
+        for task in tasks:
+            if not clicker.is_running:
+                break
+            evaluated = await self._run_blocking(self._evaluate, task)
+            if evaluated is not None:
+                result, submitted = evaluated
+                self._publish(MatchEvent(plan.process_name, self.cycle, task.index,
+                                         result, submitted, time.time()))
+                
+            if task.delay > 0:
+                await asyncio.sleep(task.delay)
+        # Ends the loop at the cycle limit or the end of the frames
+        clicker.end_cycle()
+    
+    def _publish(self, event: MatchEvent):
+        """Queue an event, dropping the oldest when the consumer falls behind"""
+        if self._events.full():
+            self._events.get_nowait()
+            self.dropped_events += 1
+        self._events.put_nowait(event)
+    
+    async def _run(self):
+        """Task loop coroutine"""
+        clicker = self.clicker
+        try:
+            while clicker.is_running:
+                clicker.apply_pending_reload()
+                if clicker.plan.cycle_budget > 0:
+                    await self._run_budgeted_cycle()
+                else:
+                    await self._run_cycle()
+                self.cycle += 1
+                await asyncio.sleep(CYCLE_DELAY)
+                
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in async task loop: {e}", exc_info=True)
+            if clicker.flight_recorder is not None:
+                await self._run_blocking(clicker.dump_flight_recorder, f"error: {e!r}", False)
+        finally:
+            clicker.is_running = False
+            # Wake consumers so `async for` ends
+            if self._events.full():
+                self._events.get_nowait()
+            self._events.put_nowait(None)
+    
+    async def events(self) -> AsyncIterator[MatchEvent]:
+        """
+        Iterate over match events until the clicker stops
+        
+        Yields:
+            MatchEvent for every evaluated task
+        """
+        if self._events is None:
+            return
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+    
+    def __aiter__(self) -> AsyncIterator[MatchEvent]:
+        return self.events()
@@ -5,17 +5,34 @@ High-performance Python game auto-clicker with image recognition
 import os
 import sys
 import time
+import signal
 import logging
 import threading
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set, Tuple, Union
+
+import numpy as np
 
 from window_manager import WindowManager
+from window_index import WindowIndex
 from screen_capture import ScreenCapture
 from image_matcher import ImageMatcher, MatchResult
 from mouse_controller import MouseController
+from input_backend import InputBackend, create_input_backend, INPUT_BACKENDS
 from action_handler import ActionHandler
+from action_executor import ActionExecutor, StepKind, POLICY_DROP
 from config_loader import ConfigLoader
+from task_plan import CompiledIconGroup, CompiledTask, ProcessPlan
+from task_matcher import match_icon_group, match_task
+from cycle_budget import CycleScheduler
+from match_stats import MatchStats
+from scale_detector import ScaleDetector
+from screen_state import ScreenClassifier
+from frame_source import FrameSource, WindowFrameSource, ReplayFrameSource
+from profiler import CycleProfiler, PHASE_CAPTURE, PHASE_MATCH, PHASE_ACTION, PHASE_DELAY, PROFILE_MODES
+from config_watcher import FileWatcher, content_hash
+from template_pack import TemplatePack
+from flight_recorder import FlightRecorder
 
 # Configure logging
 logging.basicConfig(
@@ -33,27 +50,78 @@ logger = logging.getLogger(__name__)
 class AutoClicker:
     """Main auto-clicker application"""
     
-    def __init__(self, config_path: str, capture_method: str = "win32"):
+    def __init__(self,
+                 config_path: str,
+                 capture_method: str = "win32",
+                 hot_reload: bool = False,
+                 input_backend: Union[str, InputBackend] = "auto",
+                 window_index: Optional[WindowIndex] = None,
+                 frame_source: Optional[FrameSource] = None,
+                 profile_mode: Optional[str] = None,
+                 profile_dir: str = "profiles",
+                 cycle_limit: int = 0):
         """
         Initialize auto-clicker
         
         Args:
             config_path: Path to configuration file
             capture_method: Screen capture method ('win32' or 'mss')
+            hot_reload: Reload config and templates on change while running
+            input_backend: Input backend ('auto', 'win32', 'xtest' or 'recording'), or an
+                           InputBackend instance such as a game simulator's input sink
+            window_index: Shared, already started window index (default: own index)
+            frame_source: Frames to run on instead of the target window, e.g. a replay
+            profile_mode: Profile the task loop ('sample' or 'deterministic'; default: off)
+            profile_dir: Directory profile reports are saved to
+            cycle_limit: Stop after this many task cycles (0 = no limit)
         """
         self.config_path = config_path
         self.config_dir = os.path.dirname(os.path.abspath(config_path))
         self.config: Optional[Dict[str, Any]] = None
         self.process_config: Optional[Dict[str, Any]] = None
         
-        self.window_manager = WindowManager()
+        self._owns_window_index = window_index is None
+        self.window_index = window_index or WindowIndex()
+        self.window_manager = WindowManager(index=self.window_index)
         self.screen_capture = ScreenCapture(method=capture_method)
-        self.mouse_controller = MouseController()
+        # Without a window there is nothing to find or activate
+        self.live = frame_source is None
+        self.frame_source = frame_source or WindowFrameSource(self.window_manager, self.screen_capture)
+        if not isinstance(input_backend, InputBackend):
+            input_backend = create_input_backend(input_backend)
+        self.mouse_controller = MouseController(backend=input_backend)
         self.action_handler = ActionHandler(self.mouse_controller)
         self.image_matcher: Optional[ImageMatcher] = None
+        self.plan: Optional[ProcessPlan] = None
+        
+        self.action_executor: Optional[ActionExecutor] = None
+        self.cycle_scheduler: Optional[CycleScheduler] = None
+        self.match_stats: Optional[MatchStats] = None
+        self.scale_detector: Optional[ScaleDetector] = None
+        self.screen_classifier: Optional[ScreenClassifier] = None
+        
+        self.profile_mode = profile_mode
+        self.profile_dir = profile_dir
+        self.profiler: Optional[CycleProfiler] = None
+        self.cycle_limit = cycle_limit
+        self.cycles = 0
+        
+        # Recent frames, matches and actions kept in memory for post-mortems
+        self.flight_recorder: Optional[FlightRecorder] = None
+        self.flight_dir = ''
+        self.flight_triggers: Set[int] = set()
+        self._next_triggered_dump = 0.0
         
         self.is_running = False
         self.worker_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        
+        # Hot reload state; the worker applies pending reloads between cycles
+        self.hot_reload = hot_reload
+        self.file_watcher: Optional[FileWatcher] = None
+        self.template_hashes: Dict[str, Optional[str]] = {}
+        self._pending_reload: Optional[Tuple[ProcessPlan, Dict[str, np.ndarray]]] = None
+        self._reload_lock = threading.Lock()
         
         logger.info(f"AutoClicker initialized with config: {config_path}")
     
@@ -72,25 +140,212 @@ class AutoClicker:
         if not self.config:
             logger.error("Failed to load configuration")
             return False
-        
+            
         # Validate config
         if not ConfigLoader.validate_config(self.config):
             logger.error("Configuration validation failed")
             return False
-        
+            
         # Get process-specific config
         self.process_config = ConfigLoader.get_process_config(self.config, process_name)
         if not self.process_config:
             logger.error(f"No configuration found for process: {process_name}")
             return False
-        
+            
         # Initialize image matcher with threshold
         match_value = self.process_config.get('MatchValue', 0.8)
-        self.image_matcher = ImageMatcher(threshold=match_value)
-        logger.info(f"Image matcher initialized with threshold: {match_value}")
+        cache_mb = self.process_config.get('TemplateCacheMB', 256)
+        self.image_matcher = ImageMatcher(threshold=match_value, cache_bytes=int(cache_mb * 1024 * 1024))
+        logger.info(f"Image matcher initialized with threshold: {match_value}, cache budget: {cache_mb} MB")
+        
+        # Actions play on their own thread so matching never blocks on delays
+        policy = self.process_config.get('ActionPolicy', POLICY_DROP)
+        try:
+            self.action_executor = ActionExecutor(self.mouse_controller, policy=policy)
+        except ValueError as e:
+            logger.error(f"Invalid 'ActionPolicy': {e}")
+            return False
+            
+        recorder_config = self.process_config.get('FlightRecorder')
+        if recorder_config:
+            options = recorder_config if isinstance(recorder_config, dict) else {}
+            try:
+                self.flight_recorder = FlightRecorder(
+                    max_bytes=int(float(options.get('MemoryMB', 64)) * 1024 * 1024),
+                    seconds=float(options.get('Seconds', 30)),
+                    downscale=int(options.get('Downscale', 2)),
+                    keyframe_interval=int(options.get('KeyframeInterval', 60)))
+                self.flight_triggers = {int(index) for index in options.get('DumpOnTasks', [])}
+            except (ValueError, TypeError) as e:
+                logger.error(f"Invalid 'FlightRecorder': {e}")
+                return False
+            self.flight_dir = os.path.join(self.config_dir, options.get('Directory', 'flight_records'))
+            logger.info(f"Flight recorder keeps {self.flight_recorder.seconds:g}s of frames "
+                        f"in up to {self.flight_recorder.max_bytes // (1024 * 1024)} MB")
+        
+        # Compile once so the task loop never touches config dicts
+        self.plan = ConfigLoader.compile_process(self.process_config, self.config_dir)
+        if not self.plan:
+            logger.error("Failed to compile configuration")
+            return False
+            
+        # Map preprocessed templates instead of decoding every PNG
+        if self.process_config.get('TemplatePack', False):
+            pack = TemplatePack.load_or_build(self.plan.resource_dir)
+            if pack:
+                self.image_matcher.attach_pack(pack)
+                
+        # Warm the template cache
+        for template_path in self.plan.template_paths():
+            self.image_matcher.load_template_gray(template_path)
+        for engine, paths in self.plan.feature_templates().items():
+            indexed = self.image_matcher.index_features(paths, engine)
+            logger.info(f"Indexed {indexed}/{len(paths)} templates for the {engine} engine")
+            
+        if self.plan.multi_scale is not None:
+            self.scale_detector = ScaleDetector(self.image_matcher, self.plan.multi_scale)
+            self.scale_detector.precompute(self.plan.template_paths())
+        
+        if self.plan.screen_states:
+            self.screen_classifier = ScreenClassifier(self.image_matcher, self.plan)
+        
+        # Learned hit rates and costs carry over between runs
+        if self.plan.adaptive_order:
+            self.match_stats = MatchStats(self.plan.resource_dir)
+            self.match_stats.load(self.plan.stats_file)
+            self.match_stats.update_orders(self.plan)
+        
+        # Profiling collects its own match stats; it only reorders if the run would
+        if self.profile_mode:
+            self.profiler = CycleProfiler(self.plan, self.profile_mode, self.match_stats)
+        
+        self.update_capture_regions(self.plan)
+        
+        if self.hot_reload:
+            self.template_hashes = {path: content_hash(path) for path in self.plan.template_paths()}
         
         return True
     
+    def update_capture_regions(self, plan: ProcessPlan):
+        """
+        Capture only the regions a plan reads when it sets 'RegionCapture'
+        
+        Args:
+            plan: Plan being run
+        """
+        regions = None
+        if plan.region_capture:
+            regions = plan.capture_regions()
+            if regions is None:
+                logger.warning("'RegionCapture' needs a 'SearchRegion' on every icon, window-anchored "
+                               "probes, template matching and no 'MultiScale'; capturing whole windows")
+        self.frame_source.set_regions(regions)
+    
+    def reload_changed_files(self, changed: Set[str]):
+        """
+        Recompile the plan and reload templates affected by changed files
+        
+        Runs on the watcher thread; the result is swapped in by the worker
+        between cycles.
+        
+        Args:
+            changed: Absolute paths of changed files
+        """
+        with self._reload_lock:
+            plan = self._pending_reload[0] if self._pending_reload else self.plan
+        new_plan = plan
+        
+        if os.path.abspath(self.config_path) in changed:
+            config = ConfigLoader.load(self.config_path)
+            if not config or not ConfigLoader.validate_config(config):
+                logger.error("Reloaded configuration is invalid, keeping current plan")
+                return
+                
+            process_config = ConfigLoader.get_process_config(config, plan.process_name)
+            if not process_config:
+                logger.error(f"Reloaded configuration has no entry for {plan.process_name}, keeping current plan")
+                return
+                
+            new_plan = ConfigLoader.compile_process(process_config, self.config_dir, previous=plan)
+            if not new_plan:
+                logger.error("Failed to compile reloaded configuration, keeping current plan")
+                return
+                
+            self.config = config
+            self.process_config = process_config
+            
+            if new_plan.resource_dir != plan.resource_dir and self.file_watcher:
+                self.file_watcher.watch(new_plan.resource_dir)
+                
+        # Only templates whose content actually changed are decoded again
+        templates: Dict[str, np.ndarray] = {}
+        for path in new_plan.template_paths():
+            if path not in changed and path in self.template_hashes:
+                continue
+                
+            digest = content_hash(path)
+            if digest is None or digest == self.template_hashes.get(path):
+                continue
+                
+            template = self.image_matcher.load_template(path, use_cache=False)
+            if template is not None:
+                templates[path] = template
+                self.template_hashes[path] = digest
+                
+        if new_plan is plan and not templates:
+            return
+            
+        with self._reload_lock:
+            if self._pending_reload is not None:
+                # Merge with a reload the worker has not applied yet
+                templates = {**self._pending_reload[1], **templates}
+            self._pending_reload = (new_plan, templates)
+            
+        logger.info(f"Reload scheduled: {len(templates)} templates changed, "
+                    f"plan {'updated' if new_plan is not plan else 'unchanged'}")
+    
+    def apply_pending_reload(self):
+        """Swap in a pending plan and templates; called by the worker between cycles"""
+        with self._reload_lock:
+            pending, self._pending_reload = self._pending_reload, None
+            
+        if pending is None:
+            return
+            
+        plan, templates = pending
+        for path, template in templates.items():
+            self.image_matcher.replace_template(path, template)
+        self.image_matcher.threshold = plan.match_value
+        if self.cycle_scheduler is not None:
+            self.cycle_scheduler.update(plan.tasks, plan.cycle_budget)
+        if plan.adaptive_order:
+            if self.match_stats is None:
+                # The stats file is only written when the run ends, so this is still the start-time snapshot
+                self.match_stats = MatchStats(plan.resource_dir)
+                self.match_stats.load(plan.stats_file)
+            self.match_stats.update_orders(plan)
+        if self.profiler is not None:
+            self.profiler.stats.orders = self.match_stats if plan.adaptive_order else None
+        if plan.multi_scale != self.plan.multi_scale:
+            self.scale_detector = None
+            if plan.multi_scale is not None:
+                self.scale_detector = ScaleDetector(self.image_matcher, plan.multi_scale)
+        if self.scale_detector is not None and (templates or plan.multi_scale != self.plan.multi_scale):
+            # Replaced templates lost their scaled variants, and the anchor may have changed
+            self.scale_detector.reset()
+            self.scale_detector.precompute(plan.template_paths())
+        if plan.region_capture or self.plan.region_capture:
+            self.update_capture_regions(plan)
+        if plan.screen_states or self.screen_classifier is not None:
+            # Task lists per state are rebuilt; a state that still exists stays current
+            previous = self.screen_classifier
+            self.screen_classifier = ScreenClassifier(self.image_matcher, plan) if plan.screen_states else None
+            if previous is not None and self.screen_classifier is not None \
+                    and previous.state in self.screen_classifier.states:
+                self.screen_classifier.state = previous.state
+        self.plan = plan
+        logger.info(f"Applied reloaded plan: {len(plan.tasks)} tasks")
+    
     def activate_target_window(self, process_name: str) -> bool:
         """
         Find and activate target window
@@ -106,120 +361,323 @@ class AutoClicker:
     
     def process_icon_group(self,
                           screenshot: Any,
-                          icon_group: list,
-                          resource_path: str) -> Optional[MatchResult]:
+                          icon_group: CompiledIconGroup) -> Optional[MatchResult]:
         """
         Process a group of icons and check if all match
         
         Args:
             screenshot: Screenshot image
-            icon_group: List of icon filenames
-            resource_path: Path to resource directory
+            icon_group: Compiled icon group
             
         Returns:
             MatchResult if all icons matched, None otherwise
         """
-        target_result = None
+        return match_icon_group(self.image_matcher, screenshot, icon_group)
+    
+    def capture_frame(self) -> Optional[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+        """
+        Capture the target window, or take the next frame of the frame source
         
-        for idx, icon_file in enumerate(icon_group):
-            icon_path = os.path.join(self.config_dir, resource_path, icon_file)
+        Returns:
+            Tuple of (screenshot, window rect) or None if no frame is available
+        """
+        if self.profiler is None and self.flight_recorder is None:
+            return self.frame_source.grab()
+        
+        started = time.perf_counter()
+        frame = self.frame_source.grab()
+        if frame is not None and self.flight_recorder is not None:
+            self.flight_recorder.record_frame(frame[0])
+        if self.profiler is not None:
+            self.profiler.add_phase(PHASE_CAPTURE, time.perf_counter() - started)
+        return frame
+    
+    def dump_flight_recorder(self, reason: str = 'manual', background: bool = True) -> Optional[str]:
+        """
+        Write the flight recorder's frames and events to its 'Directory'
+        
+        Args:
+            reason: Why the dump was taken
+            background: Write on a separate thread
             
-            # Match template
-            match_result = self.image_matcher.match_template_from_file(screenshot, icon_path)
+        Returns:
+            Path of the dump directory, or None if nothing was dumped
+        """
+        if self.flight_recorder is None:
+            logger.warning("Flight recorder is not enabled, set 'FlightRecorder' in the process config")
+            return None
+        return self.flight_recorder.dump(self.flight_dir, reason, background)
+    
+    def match_scale(self, screenshot: np.ndarray) -> float:
+        """
+        Get the template scale for a frame, detecting it on first use
+        
+        Args:
+            screenshot: Captured frame
             
-            if match_result.matched:
-                logger.info(f"Matched: {icon_file}, confidence: {match_result.confidence:.3f}")
-                target_result = match_result
-                
-                # If this is the last icon in the group, all matched
-                if idx == len(icon_group) - 1:
-                    return target_result
-            else:
-                logger.debug(f"Not matched: {icon_file}, confidence: {match_result.confidence:.3f}")
-                return None
-        
-        return None
+        Returns:
+            Template resize factor (1.0 unless 'MultiScale' is configured)
+        """
+        if self.scale_detector is None:
+            return 1.0
+        return self.scale_detector.update(screenshot)
+    
+    def state_tasks(self, screenshot: np.ndarray, gray: np.ndarray, scale: float) -> Tuple[CompiledTask, ...]:
+        """
+        Get the tasks to evaluate on a frame
+        
+        Args:
+            screenshot: Captured frame
+            gray: Frame converted once with image_matcher.to_gray
+            scale: Template resize factor
+            
+        Returns:
+            Tasks of the current screen state, or every task without 'ScreenStates'
+        """
+        if self.screen_classifier is None:
+            return self.plan.tasks
+        
+        started = time.perf_counter()
+        tasks = self.screen_classifier.update(screenshot, gray, scale)
+        if self.profiler is not None:
+            self.profiler.add_phase(PHASE_MATCH, time.perf_counter() - started)
+        return tasks
+    
+    def cycle_tasks(self) -> Tuple[CompiledTask, ...]:
+        """
+        Get the tasks of a per-task cycle, classifying a fresh frame when 'ScreenStates' is set
+        
+        Returns:
+            Tasks to run this cycle; empty if no frame could be classified
+        """
+        if self.screen_classifier is None:
+            return self.plan.tasks
+        
+        frame = self.capture_frame()
+        if frame is None:
+            return ()
+        screenshot, _ = frame
+        gray = self.image_matcher.to_gray(screenshot, self.frame_source.regions)
+        return self.state_tasks(screenshot, gray, self.match_scale(gray))
     
-    def process_task(self, task: Dict[str, Any], resource_path: str) -> bool:
+    def process_task(self, task: CompiledTask) -> bool:
         """
         Process a single task
         
         Args:
-            task: Task configuration
-            resource_path: Path to resource directory
+            task: Compiled task
             
         Returns:
             True if task executed, False otherwise
         """
-        hwnd = self.window_manager.hwnd
-        if not hwnd:
-            logger.error("No window handle available")
+        frame = self.capture_frame()
+        if frame is None:
             return False
+        screenshot, window_rect = frame
+        gray = self.image_matcher.to_gray(screenshot, self.frame_source.regions)
         
-        # Capture screenshot
-        screenshot = self.screen_capture.capture_window(hwnd)
-        if screenshot is None:
-            logger.error("Failed to capture screenshot")
-            return False
+        _, submitted = self.evaluate_task(task, screenshot, window_rect, self.match_scale(gray), gray)
+        return submitted
+    
+    def task_stats(self) -> Optional[MatchStats]:
+        """Stats match_task records into and takes evaluation orders from"""
+        if self.profiler is not None:
+            return self.profiler.stats
+        return self.match_stats if self.plan.adaptive_order else None
+    
+    def evaluate_task(self,
+                      task: CompiledTask,
+                      screenshot: np.ndarray,
+                      window_rect: Tuple[int, int, int, int],
+                      scale: float,
+                      gray: Optional[np.ndarray] = None,
+                      owner: Optional[str] = None) -> Tuple[Optional[MatchResult], bool]:
+        """
+        Match a task against a captured frame and submit its actions
         
-        # Get window rect for absolute positioning
-        window_rect = self.window_manager.get_window_rect(hwnd)
-        if not window_rect:
-            logger.error("Failed to get window rect")
-            return False
+        Args:
+            task: Compiled task
+            screenshot: Captured frame
+            window_rect: Window rectangle at capture time
+            scale: Template resize factor
+            gray: Frame converted once with image_matcher.to_gray (optional)
+            owner: Action executor conflict key (default: process name)
+            
+        Returns:
+            Tuple of (match result or None, True if its actions were accepted)
+        """
+        started = time.perf_counter()
+        target_result = match_task(self.image_matcher, screenshot, task,
+                                   stop_event=self._stop_event, stats=self.task_stats(), scale=scale,
+                                   gray=gray)
+        if self.profiler is not None:
+            elapsed = time.perf_counter() - started
+            self.profiler.add_phase(PHASE_MATCH, elapsed)
+            self.profiler.record_task(task.index, target_result is not None, elapsed)
+        if self.flight_recorder is not None:
+            self.record_match(task, target_result)
+        if not target_result:
+            return None, False
         
-        # Process icon groups
-        icon_groups = task.get('IconGroups', [])
-        target_index = task.get('TargetIndex', 0)
-        actions = task.get('Actions', [])
+        # Execute actions
+        started = time.perf_counter()
+        submitted = self.submit_actions(task, target_result, window_rect, owner)
+        if self.profiler is not None:
+            self.profiler.add_phase(PHASE_ACTION, time.perf_counter() - started)
         
-        for icon_group in icon_groups:
-            if not self.is_running:
-                return False
+        # One dump per recorder window, so a trigger seen every cycle does not flood the disk
+        if task.index in self.flight_triggers and time.monotonic() >= self._next_triggered_dump:
+            self._next_triggered_dump = time.monotonic() + self.flight_recorder.seconds
+            self.dump_flight_recorder(f"task {task.index} matched")
+        return target_result, submitted
+    
+    def record_match(self, task: CompiledTask, match_result: Optional[MatchResult]):
+        """
+        Add a task evaluation to the flight recorder
+        
+        Args:
+            task: Evaluated task
+            match_result: Result of match_task
+        """
+        if match_result is None:
+            self.flight_recorder.record_event('match', task=task.index, matched=False)
+            return
+        
+        location = list(match_result.location) if match_result.location is not None else None
+        self.flight_recorder.record_event('match', task=task.index, matched=True, location=location,
+                                          confidence=round(float(match_result.confidence), 4))
+    
+    def wait(self, seconds: float) -> bool:
+        """
+        Sleep on the worker unless stopped
+        
+        Args:
+            seconds: Time to wait
+            
+        Returns:
+            True if stop was requested during the wait
+        """
+        if self.profiler is None:
+            return self._stop_event.wait(seconds)
+        started = time.perf_counter()
+        stopped = self._stop_event.wait(seconds)
+        self.profiler.add_phase(PHASE_DELAY, time.perf_counter() - started)
+        return stopped
+    
+    def end_cycle(self):
+        """Finish a task cycle: count it and stop at the cycle limit or end of a replay"""
+        self.cycles += 1
+        if self.profiler is not None:
+            self.profiler.end_cycle()
+        
+        if self.cycle_limit and self.cycles >= self.cycle_limit:
+            logger.info(f"Reached cycle limit: {self.cycle_limit}")
+            self.is_running = False
+        elif self.frame_source.exhausted:
+            self.is_running = False
+    
+    def submit_actions(self,
+                       task: CompiledTask,
+                       match_result: MatchResult,
+                       window_rect: Tuple[int, int, int, int],
+                       owner: Optional[str] = None) -> bool:
+        """
+        Hand a matched task's actions to the executor as a timeline
+        
+        Args:
+            task: Compiled task
+            match_result: Match result for position reference
+            window_rect: Window rectangle at capture time
+            owner: Action executor conflict key (default: process name)
             
-            # Check if all icons in group match
-            target_result = self.process_icon_group(screenshot, icon_group, resource_path)
+        Returns:
+            True if the timeline was accepted
+        """
+        timeline = self.action_handler.build_timeline(task.actions, match_result, window_rect,
+                                                      owner=owner or self.plan.process_name,
+                                                      label=f"task {task.index}")
+        submitted = self.action_executor.submit(timeline)
+        if self.flight_recorder is not None:
+            clicks = [[step.x, step.y, step.button] for step in timeline.steps if step.kind == StepKind.DOWN]
+            self.flight_recorder.record_event('action', task=task.index, submitted=submitted,
+                                              window=list(window_rect), clicks=clicks)
+        return submitted
+    
+    def run_budgeted_cycle(self):
+        """Capture once and evaluate tasks in priority order until the cycle budget is spent"""
+        # The budget covers capture too: it bounds how stale the frame gets
+        started = time.monotonic()
+        frame = self.capture_frame()
+        if frame is None:
+            if self.frame_source.exhausted:
+                self.is_running = False
+            self.wait(0.01)
+            return
+        screenshot, window_rect = frame
+        
+        # One grayscale conversion serves every task of the cycle
+        gray = self.image_matcher.to_gray(screenshot, self.frame_source.regions)
+        scale = self.match_scale(gray)
+        tasks = self.state_tasks(screenshot, gray, scale) if self.screen_classifier is not None else None
+        scheduler = self.cycle_scheduler
+        scheduler.start_cycle(started, tasks)
+        while self.is_running:
+            task = scheduler.next_task()
+            if task is None:
+                break
             
-            if target_result:
-                logger.info(f"All icons matched in group: {icon_group}")
-                # Execute actions
-                self.action_handler.execute_actions(actions, target_result, window_rect)
-                return True
-            else:
-                logger.debug(f"Icon group not fully matched: {icon_group}")
+            self.evaluate_task(task, screenshot, window_rect, scale, gray)
+            
+            # Task delay
+            if task.delay > 0 and self.wait(task.delay):
+                break
+        scheduler.end_cycle()
+        self.end_cycle()
         
-        return False
+        # Small delay between task cycles to prevent excessive CPU usage
+        self.wait(0.01)
     
     def run_tasks(self):
         """Main task execution loop"""
+        if self.profiler is not None:
+            self.profiler.start()
         try:
-            process_name = self.process_config.get('ProcessName')
-            resource_path = self.process_config.get('ResourcePath', 'resources')
-            tasks = self.process_config.get('Tasks', [])
-            
-            logger.info(f"Starting task loop for process: {process_name}")
-            logger.info(f"Total tasks: {len(tasks)}")
+            logger.info(f"Starting task loop for process: {self.plan.process_name}")
+            logger.info(f"Total tasks: {len(self.plan.tasks)}")
             
             while self.is_running:
-                for task in tasks:
+                self.apply_pending_reload()
+                
+                if self.plan.cycle_budget > 0:
+                    if self.cycle_scheduler is None:
+                        self.cycle_scheduler = CycleScheduler(self.plan.tasks, self.plan.cycle_budget)
+                    self.run_budgeted_cycle()
+                    continue
+                
+                for task in self.cycle_tasks():
                     if not self.is_running:
                         break
-                    
+                        
                     # Process task
-                    self.process_task(task, resource_path)
+                    self.process_task(task)
                     
                     # Task delay
-                    task_delay = task.get('Delay', 0)
-                    if task_delay > 0:
-                        time.sleep(task_delay / 1000.0)
+                    if task.delay > 0 and self.wait(task.delay):
+                        break
                 
-                # Small delay between task cycles to prevent excessive CPU usage
-                time.sleep(0.01)
+                self.end_cycle()
                 
+                # Small delay between task cycles to prevent excessive CPU usage
+                self.wait(0.01)
+        
         except Exception as e:
             logger.error(f"Error in task loop: {e}", exc_info=True)
+            if self.flight_recorder is not None:
+                self.dump_flight_recorder(f"error: {e!r}", background=False)
         finally:
             self.is_running = False
+            if self.profiler is not None:
+                self.profiler.stop()
             logger.info("Task loop stopped")
     
     def start(self, process_name: str) -> bool:
@@ -235,41 +693,96 @@ class AutoClicker:
         if self.is_running:
             logger.warning("Auto-clicker is already running")
             return False
-        
+            
         # Load configuration
         if not self.load_config(process_name):
             return False
-        
-        # Activate target window
-        if not self.activate_target_window(process_name):
-            logger.error("Failed to activate target window")
-            return False
-        
-        # Small delay to ensure window is ready
-        time.sleep(0.5)
-        
+            
+        if self.live:
+            # Index processes and windows in the background
+            if self._owns_window_index:
+                self.window_index.start()
+            
+            # Activate target window
+            if not self.activate_target_window(process_name):
+                logger.error("Failed to activate target window")
+                if self._owns_window_index:
+                    self.window_index.stop()
+                return False
+            
+            # Small delay to ensure window is ready
+            time.sleep(0.5)
+            
         # Start task loop in separate thread
+        self._stop_event.clear()
+        self.action_executor.start()
         self.is_running = True
         self.worker_thread = threading.Thread(target=self.run_tasks, daemon=True)
         self.worker_thread.start()
         
+        if self.hot_reload:
+            self.file_watcher = FileWatcher([self.config_dir, self.plan.resource_dir],
+                                            self.reload_changed_files)
+            self.file_watcher.start()
+            
         logger.info("Auto-clicker started")
         return True
     
     def stop(self):
-        """Stop auto-clicker"""
-        if not self.is_running:
+        """Stop auto-clicker; also cleans up after the task loop ended on its own"""
+        if self.worker_thread is None:
             logger.warning("Auto-clicker is not running")
             return
-        
+            
         logger.info("Stopping auto-clicker...")
         self.is_running = False
+        self._stop_event.set()
+        self.action_executor.cancel()
+        
+        if self.file_watcher:
+            self.file_watcher.stop()
+            self.file_watcher = None
+            
+        self.worker_thread.join(timeout=5.0)
+        self.worker_thread = None
         
-        if self.worker_thread:
-            self.worker_thread.join(timeout=5.0)
+        self.action_executor.stop()
+        if self.live and self._owns_window_index:
+            self.window_index.stop()
+        self.frame_source.close()
         
+        self.report_stats()
         logger.info("Auto-clicker stopped")
     
+    def report_stats(self):
+        """Log the stats of a finished run and save learned match stats and profile reports"""
+        if self.image_matcher:
+            logger.info(f"Template cache stats: {self.image_matcher.cache_stats()}")
+        logger.info(f"Input latency stats: {self.mouse_controller.latency_stats()}")
+        logger.info(f"Window index stats: {self.window_index.stats()}")
+        if self.cycle_scheduler is not None:
+            logger.info(f"Cycle budget stats: {self.cycle_scheduler.stats()}")
+        if self.scale_detector is not None:
+            logger.info(f"Scale detection stats: {self.scale_detector.stats()}")
+        if self.screen_classifier is not None:
+            logger.info(f"Screen state stats: {self.screen_classifier.stats()}")
+        if self.flight_recorder is not None:
+            logger.info(f"Flight recorder stats: {self.flight_recorder.stats()}")
+        if self.match_stats is not None and self.plan.adaptive_order:
+            for line in self.match_stats.summary(self.plan):
+                logger.info(f"Adaptive order: {line}")
+            # Replayed or simulated frames would skew the orders of the next live run
+            if not self.live:
+                logger.info("Match stats of a replayed or simulated run are not saved")
+            elif self.match_stats.save(self.plan.stats_file):
+                logger.info(f"Saved match stats to {self.plan.stats_file}")
+        if self.profiler is not None:
+            print(CycleProfiler.format_report(self.profiler.report(self.plan)))
+            prefix = self.profiler.save(self.profile_dir, self.plan)
+            if prefix:
+                logger.info(f"Saved profile report to {prefix}.txt/.json, "
+                            f"flame graph stacks to {prefix}.folded")
+    
     def is_active(self) -> bool:
         """Check if auto-clicker is running"""
         return self.is_running
@@ -286,21 +799,51 @@ def main():
                        help='Screen capture method (default: win32)')
     parser.add_argument('--duration', '-d', type=int, default=0,
                        help='Auto-stop after duration in seconds (0 = run indefinitely)')
-    
+    parser.add_argument('--watch', '-w', action='store_true',
+                       help='Reload config and templates on change without restarting')
+    parser.add_argument('--input', choices=INPUT_BACKENDS, default='auto',
+                       help='Input backend (default: auto)')
+    parser.add_argument('--profile', type=int, nargs='?', const=0, metavar='CYCLES',
+                       help='Profile the run, or only this many task cycles, then print and save '
+                            'a cost report')
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES, default='sample',
+                       help='Stack sampling, or cProfile plus sampling (default: sample)')
+    parser.add_argument('--profile-out', default='profiles',
+                       help='Directory for profile reports (default: profiles)')
+    parser.add_argument('--replay',
+                       help='Run on recorded frames (image directory or video) instead of the window; '
+                            'clicks are recorded, not sent')
+                       
     args = parser.parse_args()
     
     # Check if config file exists
     if not os.path.exists(args.config):
         logger.error(f"Config file not found: {args.config}")
         sys.exit(1)
-    
+        
     # Create auto-clicker
-    clicker = AutoClicker(args.config, capture_method=args.capture)
-    
+    frame_source = None
+    input_backend = args.input
+    if args.replay:
+        if not os.path.exists(args.replay):
+            logger.error(f"Replay not found: {args.replay}")
+            sys.exit(1)
+        frame_source = ReplayFrameSource(args.replay)
+        input_backend = 'recording'
+    clicker = AutoClicker(args.config, capture_method=args.capture, hot_reload=args.watch,
+                          input_backend=input_backend, frame_source=frame_source,
+                          profile_mode=args.profile_mode if args.profile is not None else None,
+                          profile_dir=args.profile_out, cycle_limit=args.profile or 0)
+                          
     # Start auto-clicker
     if not clicker.start(args.process):
         logger.error("Failed to start auto-clicker")
         sys.exit(1)
+        
+    # Ctrl+Break (Windows) or SIGUSR1 dumps the flight recorder without stopping
+    dump_signal = getattr(signal, 'SIGBREAK', None) or getattr(signal, 'SIGUSR1', None)
+    if clicker.flight_recorder is not None and dump_signal is not None:
+        signal.signal(dump_signal, lambda signum, frame: clicker.dump_flight_recorder('signal'))
     
     try:
         # Run for specified duration or indefinitely
@@ -311,11 +854,13 @@ def main():
         else:
             logger.info("Running indefinitely. Press Ctrl+C to stop.")
             while clicker.is_active():
-                time.sleep(1)
+                time.sleep(0.1)
+            # The loop ended by itself: cycle limit reached or replay finished
+            clicker.stop()
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received")
         clicker.stop()
-    
+        
     logger.info("Program terminated")
 
 
@@ -86,6 +86,9 @@ class AutoClickerGUI:
         self.stop_button = ttk.Button(button_frame, text="Stop", command=self.stop_clicker, width=15, state=tk.DISABLED)
         self.stop_button.pack(side=tk.LEFT, padx=5)
         
+        self.dump_button = ttk.Button(button_frame, text="Dump Recording", command=self.dump_recording, width=15, state=tk.DISABLED)
+        self.dump_button.pack(side=tk.LEFT, padx=5)
+        
         # Log area
         ttk.Label(main_frame, text="Log:").grid(row=5, column=0, sticky=tk.W, pady=5)
         
@@ -157,11 +160,17 @@ class AutoClickerGUI:
             self.clicker.stop()
         self.update_stopped_state()
     
+    def dump_recording(self):
+        """Write the flight recorder's recent frames to disk"""
+        if self.clicker:
+            self.clicker.dump_flight_recorder('gui')
+    
     def update_running_state(self):
         """Update UI for running state"""
         self.status_label.config(text="Running", foreground="green")
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
+        self.dump_button.config(state=tk.NORMAL)
         self.config_entry.config(state=tk.DISABLED)
         self.process_entry.config(state=tk.DISABLED)
     
@@ -170,6 +179,7 @@ class AutoClickerGUI:
         self.status_label.config(text="Stopped", foreground="red")
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
+        self.dump_button.config(state=tk.DISABLED)
         self.config_entry.config(state=tk.NORMAL)
         self.process_entry.config(state=tk.NORMAL)
     
@@ -0,0 +1,477 @@
+"""
+Batch Match Module
+Stream a directory or archive of screenshots through a compiled config and record what matches
+"""
+import os
+import csv
+import sys
+import json
+import time
+import tarfile
+import posixpath
+import zipfile
+import logging
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from config_loader import ConfigLoader
+from image_matcher import ImageMatcher, MatchResult
+from pixel_probe import ANCHOR_MATCH
+from screen_state import ScreenClassifier
+from task_matcher import match_icon
+from task_plan import ProcessPlan, TemplateRef
+from template_pack import TemplatePack
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+
+# Images sent to the pool but not written yet, per worker
+IN_FLIGHT_PER_WORKER = 4
+
+# Per-worker state set up by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def plan_icons(plan: ProcessPlan) -> Dict[str, Tuple[TemplateRef, str]]:
+    """
+    Collect every icon the tasks of a plan match, in config order
+    
+    An icon is labelled by its file name; the same file with other
+    IconOptions or engine in a later task is labelled name@task<index>.
+    
+    Returns:
+        Dictionary mapping label to (icon, engine)
+    """
+    icons: Dict[str, Tuple[TemplateRef, str]] = {}
+    for task in plan.tasks:
+        for group in task.icon_groups:
+            for icon in group.icons:
+                label = icon.name
+                if label in icons and icons[label] != (icon, task.engine):
+                    label = f"{icon.name}@task{task.index}"
+                icons.setdefault(label, (icon, task.engine))
+    return icons
+
+
+def result_columns(plan: ProcessPlan) -> List[str]:
+    """CSV columns of a plan: image fields, then each task's outcome, then each icon's confidence"""
+    columns = ['image', 'width', 'height', 'scale', 'state', 'ms', 'error']
+    for task in plan.tasks:
+        columns += [f"task{task.index}", f"task{task.index}_x", f"task{task.index}_y",
+                    f"task{task.index}_confidence"]
+    return columns + list(plan_icons(plan))
+
+
+def iter_images(source: str, skip: Set[str] = frozenset()) -> Iterator[Tuple[str, bytes]]:
+    """
+    Read encoded images from a directory tree, a zip file or a tar file
+    
+    Images are read one at a time, so a corpus never has to fit in memory
+    or be extracted first. Compressed tar files are read as a stream.
+    
+    Args:
+        source: Directory or archive
+        skip: Names not to read, e.g. already recorded ones
+        
+    Yields:
+        Tuple of (name, encoded image); names are paths relative to the
+        directory, or member names, with '/' separators
+        
+    Raises:
+        ValueError: If source is neither a directory nor a readable archive
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                filepath = os.path.join(root, filename)
+                name = os.path.relpath(filepath, source).replace(os.sep, '/')
+                if name in skip:
+                    continue
+                try:
+                    with open(filepath, 'rb') as f:
+                        data = f.read()
+                except OSError as e:
+                    logger.warning(f"Skipping unreadable image {filepath}: {e}")
+                    continue
+                yield name, data
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                if info.filename not in skip:
+                    yield info.filename, archive.read(info)
+    elif os.path.isfile(source) and tarfile.is_tarfile(source):
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                # Archives made with 'tar -C dir .' prefix every member with ./
+                name = posixpath.normpath(member.name)
+                if name not in skip:
+                    yield name, archive.extractfile(member).read()
+    else:
+        raise ValueError(f"Not a directory, zip or tar file: {source}")
+
+
+def evaluate_tasks(plan: ProcessPlan,
+                   screenshot: np.ndarray,
+                   icon_results: Dict[Tuple[TemplateRef, str], MatchResult]) -> List[Dict[str, Any]]:
+    """
+    Decide each task from icon results computed once per image
+    
+    Follows match_task: window-anchored probes gate the task, the first
+    group whose icons all match triggers it at its last icon, and
+    match-anchored probes are checked at that location.
+    
+    Args:
+        plan: Compiled plan
+        screenshot: BGR frame, for pixel probes
+        icon_results: Result of every (icon, engine) of the plan
+        
+    Returns:
+        One dictionary per task with 'task', 'matched', 'confidence' and 'x', 'y'
+    """
+    outcomes = []
+    for task in plan.tasks:
+        target: Optional[MatchResult] = None
+        probes = task.probes
+        if probes is None or probes.anchor == ANCHOR_MATCH or probes.evaluate(screenshot).matched:
+            if not task.icon_groups and probes is not None:
+                target = probes.evaluate(screenshot)
+            for group in task.icon_groups:
+                results = [icon_results[(icon, task.engine)] for icon in group.icons]
+                if not all(r.matched for r in results):
+                    continue
+                if (probes is not None and probes.anchor == ANCHOR_MATCH
+                        and not probes.evaluate(screenshot, results[-1].location).matched):
+                    continue
+                target = results[-1]
+                break
+        
+        location = target.location if target is not None else None
+        outcomes.append({
+            'task': task.index,
+            'matched': target is not None,
+            'confidence': round(float(target.confidence), 4) if target is not None else None,
+            'x': location[0] if location else None,
+            'y': location[1] if location else None,
+        })
+    return outcomes
+
+
+def _init_worker(plan: ProcessPlan, use_pack: bool):
+    """Map the template pack and preload every template once per worker"""
+    # Parallelism comes from the pool; OpenCV's own threads would oversubscribe cores
+    cv2.setNumThreads(1)
+    
+    matcher = ImageMatcher(threshold=plan.match_value)
+    if use_pack:
+        # The parent built the pack, so workers only map it and share its pages
+        pack = TemplatePack.load_or_build(plan.resource_dir)
+        if pack:
+            matcher.attach_pack(pack)
+    for template_path in plan.template_paths():
+        matcher.load_template_gray(template_path)
+    for engine, paths in plan.feature_templates().items():
+        matcher.index_features(paths, engine)
+    if plan.multi_scale is not None:
+        matcher.precompute_scales(plan.template_paths(), plan.multi_scale.scales)
+    
+    _worker['plan'] = plan
+    _worker['matcher'] = matcher
+    _worker['icons'] = plan_icons(plan)
+    _worker['classifier'] = ScreenClassifier(matcher, plan) if plan.screen_states else None
+
+
+def _match_image(name: str, data: bytes) -> Dict[str, Any]:
+    """Evaluate one image in a worker; a failure becomes an error row instead of ending the run"""
+    try:
+        return _evaluate_image(name, data)
+    except Exception as e:
+        logger.error(f"Failed to match {name}: {e}", exc_info=True)
+        return {'image': name, 'error': f"{type(e).__name__}: {e}"}
+
+
+def _evaluate_image(name: str, data: bytes) -> Dict[str, Any]:
+    """Decode one image and evaluate the plan on it"""
+    started = time.perf_counter()
+    plan: ProcessPlan = _worker['plan']
+    matcher: ImageMatcher = _worker['matcher']
+    row: Dict[str, Any] = {'image': name}
+    
+    screenshot = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if screenshot is None:
+        row['error'] = 'unreadable image'
+        return row
+    
+    gray = matcher.to_gray(screenshot)
+    scale = 1.0
+    if plan.multi_scale is not None:
+        # Corpora mix resolutions, so the scale is detected per image
+        detected = matcher.detect_scale(gray, plan.multi_scale.anchor.path, plan.multi_scale.scales,
+                                        plan.match_value)
+        if detected.matched:
+            scale = detected.scale
+    
+    icon_results = {}
+    icons = {}
+    for label, (icon, engine) in _worker['icons'].items():
+        result = icon_results.get((icon, engine))
+        if result is None:
+            result = icon_results[(icon, engine)] = match_icon(matcher, gray, icon, plan.match_value,
+                                                               scale, engine)
+        icons[label] = {
+            'matched': bool(result.matched),
+            'confidence': round(float(result.confidence), 4),
+            'x': result.location[0] if result.location else None,
+            'y': result.location[1] if result.location else None,
+        }
+    
+    classifier: Optional[ScreenClassifier] = _worker['classifier']
+    height, width = screenshot.shape[:2]
+    row.update({
+        'width': width,
+        'height': height,
+        'scale': scale,
+        'state': classifier.classify(screenshot, gray, scale) if classifier else None,
+        'tasks': evaluate_tasks(plan, screenshot, icon_results),
+        'icons': icons,
+    })
+    row['ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return row
+
+
+class ResultWriter:
+    """
+    Append result rows to a JSONL or CSV file, one flushed line per image
+    
+    A run that is interrupted leaves at most one partial line, which is cut
+    off when the file is opened to resume.
+    """
+    
+    def __init__(self, filepath: str, fmt: str, columns: List[str]):
+        """
+        Initialize result writer
+        
+        Args:
+            filepath: Output file
+            fmt: 'jsonl' or 'csv'
+            columns: CSV columns (see result_columns)
+        """
+        self.filepath = filepath
+        self.format = fmt
+        self.columns = columns
+        self.rows = 0
+        self._file = None
+        self._csv = None
+    
+    def recorded(self) -> Set[str]:
+        """
+        Read the images already in the output file and drop a trailing partial line
+        
+        Returns:
+            Names of the recorded images
+            
+        Raises:
+            ValueError: If a CSV file was written with other columns
+        """
+        if not os.path.exists(self.filepath):
+            return set()
+        
+        with open(self.filepath, 'rb+') as f:
+            content = f.read()
+            end = content.rfind(b'\n') + 1
+            if end < len(content):
+                logger.warning(f"Dropping a partial line at the end of {self.filepath}")
+                f.truncate(end)
+            content = content[:end].decode('utf-8')
+        
+        names = set()
+        if self.format == FORMAT_CSV:
+            rows = csv.reader(content.splitlines())
+            header = next(rows, None)
+            if header is not None and header != self.columns:
+                raise ValueError(f"{self.filepath} has other columns; it was written for another config")
+            names.update(row[0] for row in rows if row)
+        else:
+            for line in content.splitlines():
+                try:
+                    names.add(json.loads(line)['image'])
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Ignoring malformed line in {self.filepath}")
+        return names
+    
+    def open(self, append: bool):
+        """Open the output file, writing the CSV header unless appending to one"""
+        directory = os.path.dirname(os.path.abspath(self.filepath))
+        os.makedirs(directory, exist_ok=True)
+        fresh = not append or not os.path.exists(self.filepath) or os.path.getsize(self.filepath) == 0
+        self._file = open(self.filepath, 'w' if not append else 'a', encoding='utf-8', newline='')
+        if self.format == FORMAT_CSV:
+            self._csv = csv.writer(self._file)
+            if fresh:
+                self._csv.writerow(self.columns)
+    
+    def write(self, row: Dict[str, Any]):
+        """Write one image's row and flush it"""
+        if self.format == FORMAT_CSV:
+            self._csv.writerow(self.flatten(row))
+        else:
+            self._file.write(json.dumps(row) + '\n')
+        self._file.flush()
+        self.rows += 1
+    
+    def flatten(self, row: Dict[str, Any]) -> List[Any]:
+        """Lay a result row out in CSV columns; icons are reduced to their confidence"""
+        values = {key: row.get(key) for key in ('image', 'width', 'height', 'scale', 'state', 'ms', 'error')}
+        for task in row.get('tasks', ()):
+            prefix = f"task{task['task']}"
+            values[prefix] = int(task['matched'])
+            values[f"{prefix}_x"] = task['x']
+            values[f"{prefix}_y"] = task['y']
+            values[f"{prefix}_confidence"] = task['confidence']
+        for label, icon in row.get('icons', {}).items():
+            values[label] = icon['confidence']
+        return ['' if values.get(column) is None else values[column] for column in self.columns]
+    
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def run_batch(plan: ProcessPlan,
+              source: str,
+              writer: ResultWriter,
+              workers: int = 0,
+              skip: Set[str] = frozenset(),
+              use_pack: bool = True) -> Dict[str, Any]:
+    """
+    Match every image of a source in a process pool, writing rows as they complete
+    
+    At most a few images per worker are in flight, so memory stays flat for
+    any corpus size. Rows are written in completion order.
+    
+    Args:
+        plan: Compiled plan
+        source: Directory or archive of images
+        writer: Opened result writer
+        workers: Worker processes (0 = one per CPU)
+        skip: Image names already recorded
+        use_pack: Share templates between workers through a memory-mapped pack
+        
+    Returns:
+        Dictionary with images, errors, per-task trigger counts, seconds and images per second
+    """
+    workers = workers or os.cpu_count() or 4
+    if use_pack and not TemplatePack.load_or_build(plan.resource_dir):
+        logger.warning("Template pack unavailable, every worker decodes the templates itself")
+        use_pack = False
+    
+    triggered = {task.index: 0 for task in plan.tasks}
+    summary = {'images': 0, 'errors': 0, 'triggered': triggered}
+    
+    def record(future: Future):
+        row = future.result()
+        writer.write(row)
+        summary['images'] += 1
+        if 'error' in row:
+            summary['errors'] += 1
+        for task in row.get('tasks', ()):
+            triggered[task['task']] += task['matched']
+    
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(plan, use_pack))
+    pending: Set[Future] = set()
+    try:
+        for name, data in iter_images(source, skip):
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future)
+            pending.add(executor.submit(_match_image, name, data))
+        for future in pending:
+            record(future)
+        pending = set()
+    finally:
+        # On Ctrl+C or a failed worker, rows already written stay for --resume
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+    
+    summary['seconds'] = time.perf_counter() - started
+    summary['images_per_second'] = summary['images'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
+
+
+def main():
+    """Match a screenshot corpus from the command line"""
+    parser = argparse.ArgumentParser(description='Match a directory or archive of screenshots against a config')
+    parser.add_argument('-c', '--config', required=True, help='Configuration file (JSON or YAML)')
+    parser.add_argument('-p', '--process', required=True, help='Process name in the config')
+    parser.add_argument('--input', required=True, help='Directory, zip or tar file (optionally compressed) of images')
+    parser.add_argument('--out', required=True, help='Result file (.jsonl or .csv)')
+    parser.add_argument('--format', choices=[FORMAT_JSONL, FORMAT_CSV],
+                        help='Result format (default: from the --out extension)')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip images already in the result file and append to it')
+    parser.add_argument('--no-pack', action='store_true',
+                        help='Decode templates in every worker instead of sharing a template pack')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    
+    config = ConfigLoader.load(args.config)
+    if not config or not ConfigLoader.validate_config(config):
+        sys.exit(1)
+    process_config = ConfigLoader.get_process_config(config, args.process)
+    if not process_config:
+        sys.exit(1)
+    plan = ConfigLoader.compile_process(process_config, os.path.dirname(os.path.abspath(args.config)))
+    if plan is None:
+        sys.exit(1)
+    
+    fmt = args.format or (FORMAT_CSV if args.out.lower().endswith('.csv') else FORMAT_JSONL)
+    writer = ResultWriter(args.out, fmt, result_columns(plan))
+    try:
+        skip = writer.recorded() if args.resume else set()
+        writer.open(append=args.resume)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot use result file {args.out}: {e}")
+        sys.exit(1)
+    if skip:
+        print(f"Resuming: {len(skip)} images already recorded")
+    
+    try:
+        summary = run_batch(plan, args.input, writer, args.workers, skip, not args.no_pack)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print(f"Interrupted after {writer.rows} images; run again with --resume to continue")
+        sys.exit(130)
+    finally:
+        writer.close()
+    
+    print(f"{summary['images']} images in {summary['seconds']:.1f}s "
+          f"({summary['images_per_second']:.1f} images/s), {summary['errors']} errors")
+    for task in plan.tasks:
+        print(f"  task {task.index}: triggered on {summary['triggered'][task.index]} images")
+    print(f"Results written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""
+Benchmark Script
+Measure matching throughput and allocations on synthetic frames: in-process, thread pool, process pool and engines
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import argparse
+import dataclasses
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import mss
+import numpy as np
+
+from config_loader import ConfigLoader
+from image_matcher import ImageMatcher
+from match_pool import MatchPool
+from task_matcher import match_task
+from task_plan import ProcessPlan
+from feature_matcher import ENGINES, ENGINE_TEMPLATE, engine_available
+from flight_recorder import FlightRecorder
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_ui_frame(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """
+    Draw a frame of random boxes, discs and labels
+    
+    Blurred noise suits correlation but has no stable keypoints, so engine
+    comparisons use UI-like frames instead.
+    """
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (40, 30, 20)
+    for _ in range(width * height // 1500):
+        x = int(rng.integers(0, width))
+        y = int(rng.integers(0, height))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        kind = int(rng.integers(0, 3))
+        if kind == 0:
+            cv2.rectangle(frame, (x, y), (x + int(rng.integers(10, 80)), y + int(rng.integers(10, 50))),
+                          color, -1)
+        elif kind == 1:
+            cv2.circle(frame, (x, y), int(rng.integers(4, 30)), color, -1)
+        else:
+            label = ''.join(chr(int(c)) for c in rng.integers(65, 91, 4))
+            cv2.putText(frame, label, (x, y), cv2.FONT_HERSHEY_SIMPLEX, float(rng.uniform(0.5, 1.5)), color, 2)
+    return frame
+
+
+def build_scenario(workdir: str,
+                   width: int,
+                   height: int,
+                   tasks: int,
+                   icons: int,
+                   template_size: int = 48,
+                   engine: str = ENGINE_TEMPLATE,
+                   structured: bool = False) -> Tuple[ProcessPlan, List[np.ndarray]]:
+    """
+    Write synthetic templates and compile a plan that uses them
+    
+    Every task has one group of `icons` templates cut from the frames, so
+    every icon is found and every task runs its full group.
+    
+    Args:
+        workdir: Directory for templates
+        width: Frame width
+        height: Frame height
+        tasks: Number of tasks
+        icons: Icons per task group
+        template_size: Template side length in pixels
+        engine: Matching engine of every task
+        structured: Draw UI-like frames instead of blurred noise
+        
+    Returns:
+        Tuple of (plan, frames); frames are BGRA like captured ones
+    """
+    rng = np.random.default_rng(0)
+    if structured:
+        frame = synthetic_ui_frame(rng, width, height)
+    else:
+        frame = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (5, 5), 0)
+    frames = [np.roll(frame, shift, axis=1) for shift in range(4)]
+    
+    task_configs = []
+    for t in range(tasks):
+        names = []
+        for i in range(icons):
+            name = f"icon_{t}_{i}.png"
+            x = int(rng.integers(0, width - template_size))
+            y = int(rng.integers(0, height - template_size))
+            cv2.imwrite(os.path.join(workdir, name), frame[y:y + template_size, x:x + template_size])
+            names.append(name)
+        task_configs.append({
+            "IconGroups": [names],
+            "Actions": [{"Type": "click", "Offset": {"X": 0, "Y": 0}}],
+            "Delay": 0,
+            "Engine": engine,
+        })
+        
+    process_config = {
+        "ProcessName": "benchmark",
+        "ResourcePath": ".",
+        "MatchValue": 0.5,
+        "Tasks": task_configs,
+    }
+    plan = ConfigLoader.compile_process(process_config, workdir)
+    return plan, [cv2.cvtColor(f, cv2.COLOR_BGR2BGRA) for f in frames]
+
+
+def run_timed(label: str, count: int, run: Callable[[], None]) -> float:
+    """Run a workload and print frames per second"""
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed
+    print(f"{label:<24} {count:>6} frames  {elapsed:>7.2f}s  {rate:>8.1f} frames/s")
+    return rate
+
+
+def bench_inline(plan: ProcessPlan, frames: List[np.ndarray], count: int, label: str = "inline") -> float:
+    matcher = ImageMatcher()
+    for path in plan.template_paths():
+        matcher.load_template_gray(path)
+    for engine, paths in plan.feature_templates().items():
+        matcher.index_features(paths, engine)
+    matched = []
+    
+    def run():
+        for n in range(count):
+            for task in plan.tasks:
+                result = match_task(matcher, frames[n % len(frames)], task, threshold=plan.match_value)
+                matched.append(result is not None)
+    
+    rate = run_timed(label, count, run)
+    print(f"{'':<24} found {sum(matched) / max(len(matched), 1):.0%} of icons")
+    return rate
+
+
+def bench_allocations(plan: ProcessPlan, frames: List[np.ndarray], count: int) -> float:
+    """
+    Measure the bytes matching allocates per frame
+    
+    tracemalloc traces numpy and OpenCV output arrays. Each frame is traced
+    on its own after a warm-up frame, so the peak is what one frame allocates
+    at once beyond the reused buffers.
+    """
+    matcher = ImageMatcher()
+    for path in plan.template_paths():
+        matcher.load_template_gray(path)
+    for engine, paths in plan.feature_templates().items():
+        matcher.index_features(paths, engine)
+    
+    def match_frame(frame):
+        gray = matcher.to_gray(frame)
+        for task in plan.tasks:
+            match_task(matcher, frame, task, threshold=plan.match_value, gray=gray)
+    
+    match_frame(frames[0])
+    peaks = []
+    for n in range(count):
+        tracemalloc.start()
+        match_frame(frames[n % len(frames)])
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    
+    mean = sum(peaks) / len(peaks)
+    print(f"{'allocations':<24} {mean / 1024:>8.1f} KiB per frame (peak), frames are "
+          f"{frames[0].nbytes / 1024:.0f} KiB")
+    return mean
+
+
+def bench_capture(width: int, height: int, count: int) -> Optional[float]:
+    """
+    Measure the bytes an mss grab allocates
+    
+    mss returns every grab in a new buffer, which ScreenCapture wraps without
+    copying, so a grab allocates about one frame. Needs a display; the Win32
+    BitBlt path is not measured here.
+    """
+    try:
+        sct = mss.mss()
+    except Exception as e:
+        print(f"{'mss capture':<24} skipped: {e}")
+        return None
+        
+    with sct:
+        screen = sct.monitors[1]
+        region = {'left': screen['left'], 'top': screen['top'],
+                  'width': min(width, screen['width']), 'height': min(height, screen['height'])}
+        sct.grab(region)
+        peaks = []
+        for _ in range(count):
+            tracemalloc.start()
+            shot = sct.grab(region)
+            frame = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            
+    mean = sum(peaks) / len(peaks)
+    print(f"{'mss capture':<24} {mean / 1024:>8.1f} KiB per grab (peak), frames are "
+          f"{frame.nbytes / 1024:.0f} KiB")
+    return mean
+
+
+def bench_exact(plan: ProcessPlan, frames: List[np.ndarray], count: int) -> float:
+    """Run the inline workload with every icon switched to exact matching"""
+    tasks = tuple(
+        dataclasses.replace(task, icon_groups=tuple(
+            dataclasses.replace(group, icons=tuple(dataclasses.replace(icon, exact_tolerance=0)
+                                                   for icon in group.icons))
+            for group in task.icon_groups))
+        for task in plan.tasks
+    )
+    return bench_inline(dataclasses.replace(plan, tasks=tasks), frames, count, label="inline exact")
+
+
+def bench_flight_recorder(frames: List[np.ndarray], count: int) -> float:
+    """
+    Measure the flight recorder's cost and memory per frame
+    
+    A static frame with one moving box stands in for a game screen; the
+    scenario frames themselves shift as a whole, so every one would be a
+    keyframe.
+    """
+    recorder = FlightRecorder(seconds=3600)
+    for n in range(count):
+        frame = frames[0].copy()
+        x = (n * 7) % (frame.shape[1] - 64)
+        frame[100:164, x:x + 64] = 255
+        recorder.record_frame(frame)
+    
+    stats = recorder.stats()
+    print(f"{'flight recorder':<24} {stats['mean_record_ms']:>8.2f} ms per frame, "
+          f"{stats['bytes_per_frame'] / 1024:.0f} KiB held per frame, "
+          f"{stats['keyframe_ratio']:.0%} keyframes")
+    return stats['mean_record_ms']
+
+
+def bench_engines(workdir: str,
+                  width: int,
+                  height: int,
+                  counts: List[int],
+                  template_size: int,
+                  frames: int,
+                  frame_scale: float = 1.0):
+    """
+    Compare correlation against feature engines as the template count grows
+    
+    Correlation cost is frame area x template count; feature cost is one
+    frame description plus a descriptor match against all templates at once.
+    A frame_scale other than 1.0 resizes the frames after the templates are
+    cut, as a UI scale change would.
+    """
+    print(f"Engines: {width}x{height} frames scaled {frame_scale:g}, {template_size}px templates, "
+          f"single-icon tasks")
+    for count in counts:
+        for engine in ENGINES:
+            if not engine_available(engine):
+                print(f"{engine:<24} not available in OpenCV {cv2.__version__}")
+                continue
+            engine_dir = os.path.join(workdir, f"{engine}_{count}")
+            os.makedirs(engine_dir, exist_ok=True)
+            plan, scenario_frames = build_scenario(engine_dir, width, height, count, 1,
+                                                   template_size, engine, structured=True)
+            if frame_scale != 1.0:
+                scenario_frames = [cv2.resize(f, None, fx=frame_scale, fy=frame_scale) for f in scenario_frames]
+            bench_inline(plan, scenario_frames, frames, f"{engine} x{count} templates")
+
+
+def bench_threads(plan: ProcessPlan, frames: List[np.ndarray], count: int, workers: int) -> float:
+    matcher = ImageMatcher()
+    for path in plan.template_paths():
+        matcher.load_template_gray(path)
+    
+    def one(n):
+        for task in plan.tasks:
+            match_task(matcher, frames[n % len(frames)], task, threshold=plan.match_value)
+    
+    def run():
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(count)))
+            
+    return run_timed(f"threads x{workers}", count, run)
+
+
+def bench_processes(plan: ProcessPlan, frames: List[np.ndarray], count: int, workers: int) -> float:
+    pool = MatchPool([plan], workers=workers,
+                     slot_bytes=max(f.nbytes for f in frames))
+    pool.start()
+    
+    def run():
+        futures = []
+        for n in range(count):
+            for task in plan.tasks:
+                future = pool.submit(frames[n % len(frames)], plan, task)
+                if future is not None:
+                    futures.append(future)
+        for future in futures:
+            future.result()
+            
+    try:
+        return run_timed(f"processes x{workers}", count, run)
+    finally:
+        pool.close()
+
+
+def main():
+    """Run the benchmark suite"""
+    parser = argparse.ArgumentParser(description='Matching throughput benchmark')
+    parser.add_argument('--frames', type=int, default=200, help='Frames per run (default: 200)')
+    parser.add_argument('--size', default='1280x720', help='Frame size WxH (default: 1280x720)')
+    parser.add_argument('--tasks', type=int, default=4, help='Tasks per frame (default: 4)')
+    parser.add_argument('--icons', type=int, default=2, help='Icons per task group (default: 2)')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 4}),
+                        help='Worker counts to compare')
+    parser.add_argument('--engines', type=int, nargs='*', metavar='TEMPLATES',
+                        help='Compare matching engines at these template counts instead '
+                             '(default counts: 1 4 16 64)')
+    parser.add_argument('--template-size', type=int, default=48,
+                        help='Template side length in pixels (default: 48)')
+    parser.add_argument('--frame-scale', type=float, default=1.0,
+                        help='Resize frames in the engine comparison (default: 1.0)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.engines is not None:
+            bench_engines(workdir, width, height, args.engines or [1, 4, 16, 64],
+                          args.template_size, args.frames, args.frame_scale)
+            return
+        
+        plan, frames = build_scenario(workdir, width, height, args.tasks, args.icons, args.template_size)
+        if plan is None:
+            sys.exit(1)
+            
+        print(f"{args.size} frames, {args.tasks} tasks x {args.icons} icons, {os.cpu_count()} CPUs")
+        base = bench_inline(plan, frames, args.frames)
+        rate = bench_exact(plan, frames, args.frames)
+        print(f"{'':<24} speedup {rate / base:.2f}x")
+        bench_allocations(plan, frames, min(args.frames, 50))
+        bench_capture(width, height, min(args.frames, 50))
+        bench_flight_recorder(frames, args.frames)
+        for workers in args.workers:
+            rate = bench_threads(plan, frames, args.frames, workers)
+            print(f"{'':<24} speedup {rate / base:.2f}x")
+        for workers in args.workers:
+            rate = bench_processes(plan, frames, args.frames, workers)
+            print(f"{'':<24} speedup {rate / base:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
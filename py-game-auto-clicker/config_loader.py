@@ -5,10 +5,17 @@ Load and parse configuration files (JSON/YAML)
 import json
 import yaml
 import os
+import hashlib
+import dataclasses
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pathlib import Path
 
+from pixel_probe import PixelProbeSet, ANCHOR_MATCH
+from feature_matcher import ENGINES, ENGINE_TEMPLATE
+from task_plan import (ActionOp, CompiledAction, CompiledIconGroup, CompiledTask,
+                       ProcessPlan, ScaleSpec, ScreenState, TemplateRef)
+
 logger = logging.getLogger(__name__)
 
 
@@ -123,10 +130,21 @@ class ConfigLoader:
                     return False
                 
                 for task_idx, task in enumerate(process['Tasks']):
-                    if 'IconGroups' not in task:
-                        logger.error(f"Task {task_idx} in {process['ProcessName']} missing 'IconGroups'")
+                    if 'IconGroups' not in task and 'PixelProbes' not in task:
+                        logger.error(f"Task {task_idx} in {process['ProcessName']} missing 'IconGroups' or 'PixelProbes'")
                         return False
                     
+                    if 'PixelProbes' in task:
+                        try:
+                            probes = PixelProbeSet.from_config(task['PixelProbes'])
+                        except ValueError as e:
+                            logger.error(f"Task {task_idx} in {process['ProcessName']} has invalid 'PixelProbes': {e}")
+                            return False
+                        
+                        if probes.anchor == ANCHOR_MATCH and not task.get('IconGroups'):
+                            logger.error(f"Task {task_idx} in {process['ProcessName']} anchors probes to a match but has no 'IconGroups'")
+                            return False
+                    
                     if 'Actions' not in task:
                         logger.error(f"Task {task_idx} in {process['ProcessName']} missing 'Actions'")
                         return False
@@ -159,3 +177,294 @@ class ConfigLoader:
         
         logger.warning(f"No config found for process: {process_name}")
         return None
+    
+    @staticmethod
+    def compile_action(action: Dict[str, Any]) -> CompiledAction:
+        """
+        Compile an action dictionary into a CompiledAction
+        
+        Args:
+            action: Action dictionary with 'Type' and other parameters
+            
+        Returns:
+            CompiledAction instance
+            
+        Raises:
+            ValueError: If the action type or button is unknown
+        """
+        action_type = action.get('Type', '').lower()
+        
+        if action_type in ('move', 'click'):
+            offset = action.get('Offset', {'X': 0, 'Y': 0})
+            offset_xy = (int(offset.get('X', 0)), int(offset.get('Y', 0)))
+            
+            if action_type == 'move':
+                return CompiledAction(op=ActionOp.MOVE, offset=offset_xy)
+            
+            button = action.get('Button', 'left').lower()
+            if button not in ('left', 'right', 'middle'):
+                raise ValueError(f"Unknown button: {button}")
+            return CompiledAction(op=ActionOp.CLICK, offset=offset_xy, button=button)
+        
+        if action_type == 'delay':
+            return CompiledAction(op=ActionOp.DELAY, delay=action.get('Delay', 0) / 1000.0)
+        
+        raise ValueError(f"Unknown action type: {action_type}")
+    
+    @staticmethod
+    def compile_icon(icon: str, options: Dict[str, Any], resource_dir: str) -> TemplateRef:
+        """
+        Compile an icon name and its 'IconOptions' entry into a TemplateRef
+        
+        Args:
+            icon: Icon file name
+            options: Dictionary with optional 'SearchRegion', 'Origin' and 'ExactTolerance'
+            resource_dir: Absolute path to the template directory
+            
+        Returns:
+            TemplateRef instance
+            
+        Raises:
+            ValueError: If the search region is empty or the tolerance out of range
+        """
+        region = None
+        if 'SearchRegion' in options:
+            r = options['SearchRegion']
+            region = (int(r['X']), int(r['Y']), int(r['Width']), int(r['Height']))
+            if region[2] <= 0 or region[3] <= 0:
+                raise ValueError(f"empty 'SearchRegion' for {icon}")
+        origin = options.get('Origin', {'X': 0, 'Y': 0})
+        
+        exact_tolerance = None
+        if 'ExactTolerance' in options:
+            exact_tolerance = int(options['ExactTolerance'])
+            if not 0 <= exact_tolerance <= 255:
+                raise ValueError(f"'ExactTolerance' of {icon} must be 0-255, got {exact_tolerance}")
+        
+        return TemplateRef(name=icon,
+                           path=os.path.normpath(os.path.join(resource_dir, icon)),
+                           region=region,
+                           origin=(int(origin.get('X', 0)), int(origin.get('Y', 0))),
+                           exact_tolerance=exact_tolerance)
+    
+    @staticmethod
+    def compile_task(task: Dict[str, Any], index: int, resource_dir: str) -> CompiledTask:
+        """
+        Compile a task dictionary into a CompiledTask
+        
+        Args:
+            task: Task configuration
+            index: Position of the task in the process config
+            resource_dir: Absolute path to the template directory
+            
+        Returns:
+            CompiledTask instance
+            
+        Raises:
+            ValueError: If any part of the task is malformed
+        """
+        icon_options = task.get('IconOptions', {})
+        icon_groups = tuple(
+            CompiledIconGroup(icons=tuple(
+                ConfigLoader.compile_icon(icon, icon_options.get(icon, {}), resource_dir)
+                for icon in group
+            ))
+            for group in task.get('IconGroups', [])
+        )
+        
+        probes = None
+        if 'PixelProbes' in task:
+            probes = PixelProbeSet.from_config(task['PixelProbes'])
+        
+        engine = str(task.get('Engine', ENGINE_TEMPLATE)).lower()
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        if engine != ENGINE_TEMPLATE and any(icon.exact_tolerance is not None
+                                             for group in icon_groups for icon in group.icons):
+            raise ValueError(f"'ExactTolerance' needs the {ENGINE_TEMPLATE} engine, task uses {engine}")
+        
+        return CompiledTask(
+            index=index,
+            icon_groups=icon_groups,
+            target_index=task.get('TargetIndex', 0),
+            actions=tuple(ConfigLoader.compile_action(a) for a in task.get('Actions', [])),
+            delay=task.get('Delay', 0) / 1000.0,
+            probes=probes,
+            priority=int(task.get('Priority', 0)),
+            independent_groups=bool(task.get('IndependentGroups', False)),
+            engine=engine,
+            states=tuple(str(state) for state in task.get('States', [])),
+            fingerprint=ConfigLoader.task_fingerprint(task)
+        )
+    
+    @staticmethod
+    def task_fingerprint(task: Dict[str, Any]) -> str:
+        """
+        Compute a stable hash of a task configuration
+        
+        Args:
+            task: Task configuration
+            
+        Returns:
+            Hex digest identifying the task content
+        """
+        canonical = json.dumps(task, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def compile_scales(multi_scale: Dict[str, Any],
+                       resource_dir: str,
+                       tasks: List[CompiledTask]) -> ScaleSpec:
+        """
+        Compile a 'MultiScale' section into a ScaleSpec
+        
+        Args:
+            multi_scale: Dictionary with 'MinScale', 'MaxScale', 'Step' and 'Anchor'
+            resource_dir: Absolute path to the template directory
+            tasks: Compiled tasks; the first icon is the anchor if none is given
+            
+        Returns:
+            ScaleSpec instance
+            
+        Raises:
+            ValueError: If the range is invalid or no anchor is available
+        """
+        min_scale = float(multi_scale.get('MinScale', 0.75))
+        max_scale = float(multi_scale.get('MaxScale', 1.5))
+        step = float(multi_scale.get('Step', 0.05))
+        if min_scale <= 0 or max_scale < min_scale or step <= 0:
+            raise ValueError(f"invalid scale range {min_scale}-{max_scale} step {step}")
+        
+        count = int(round((max_scale - min_scale) / step))
+        scales = {round(min_scale + i * step, 3) for i in range(count + 1)}
+        scales.add(1.0)
+        
+        anchor = multi_scale.get('Anchor')
+        if anchor:
+            anchor_ref = TemplateRef(name=anchor, path=os.path.normpath(os.path.join(resource_dir, anchor)))
+        else:
+            icons = [icon for task in tasks for group in task.icon_groups for icon in group.icons]
+            if not icons:
+                raise ValueError("no 'Anchor' given and no icons to use as anchor")
+            anchor_ref = icons[0]
+        
+        return ScaleSpec(scales=tuple(sorted(scales)), anchor=anchor_ref)
+    
+    @staticmethod
+    def compile_states(screen_states: Dict[str, Any], resource_dir: str) -> List[ScreenState]:
+        """
+        Compile a 'ScreenStates' section into ScreenState anchors
+        
+        Args:
+            screen_states: Dictionary mapping state name to 'PixelProbes', 'Icons' and 'IconOptions'
+            resource_dir: Absolute path to the template directory
+            
+        Returns:
+            List of ScreenState in config order
+            
+        Raises:
+            ValueError: If a state has no anchors or match-anchored probes
+        """
+        states = []
+        for name, state in screen_states.items():
+            probes = None
+            if 'PixelProbes' in state:
+                probes = PixelProbeSet.from_config(state['PixelProbes'])
+                if probes.anchor == ANCHOR_MATCH:
+                    raise ValueError(f"state '{name}' probes must be anchored to the window")
+            
+            icon_options = state.get('IconOptions', {})
+            icons = tuple(ConfigLoader.compile_icon(icon, icon_options.get(icon, {}), resource_dir)
+                          for icon in state.get('Icons', []))
+            if probes is None and not icons:
+                raise ValueError(f"state '{name}' has no 'PixelProbes' or 'Icons'")
+            states.append(ScreenState(name=str(name), probes=probes, icons=icons))
+        return states
+    
+    @staticmethod
+    def compile_process(process_config: Dict[str, Any],
+                        config_dir: str,
+                        previous: Optional[ProcessPlan] = None) -> Optional[ProcessPlan]:
+        """
+        Compile a validated process configuration into an immutable plan
+        
+        Args:
+            process_config: Process configuration dictionary
+            config_dir: Directory containing the config file
+            previous: Earlier plan whose unchanged tasks are reused (optional)
+            
+        Returns:
+            ProcessPlan or None if compilation failed
+        """
+        resource_dir = os.path.abspath(
+            os.path.join(config_dir, process_config.get('ResourcePath', 'resources')))
+        
+        # Unchanged tasks are reused only when templates resolve to the same directory
+        reusable = {}
+        if previous is not None and previous.resource_dir == resource_dir:
+            reusable = {task.fingerprint: task for task in previous.tasks}
+        
+        tasks = []
+        recompiled = 0
+        for idx, task in enumerate(process_config.get('Tasks', [])):
+            cached = reusable.get(ConfigLoader.task_fingerprint(task))
+            if cached is not None:
+                tasks.append(cached if cached.index == idx else dataclasses.replace(cached, index=idx))
+                continue
+            
+            try:
+                tasks.append(ConfigLoader.compile_task(task, idx, resource_dir))
+                recompiled += 1
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Failed to compile task {idx} in {process_config.get('ProcessName')}: {e}")
+                return None
+        
+        try:
+            cycle_budget = float(process_config.get('CycleBudgetMs', 0)) / 1000.0
+        except (ValueError, TypeError):
+            cycle_budget = -1.0
+        if cycle_budget < 0:
+            logger.error(f"Invalid 'CycleBudgetMs' in {process_config.get('ProcessName')}: "
+                         f"{process_config.get('CycleBudgetMs')}")
+            return None
+        
+        multi_scale = None
+        if 'MultiScale' in process_config:
+            try:
+                multi_scale = ConfigLoader.compile_scales(process_config['MultiScale'], resource_dir, tasks)
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Invalid 'MultiScale' in {process_config.get('ProcessName')}: {e}")
+                return None
+        
+        screen_states = []
+        try:
+            state_hysteresis = int(process_config.get('StateHysteresis', 2))
+            screen_states = ConfigLoader.compile_states(process_config.get('ScreenStates', {}), resource_dir)
+            if state_hysteresis < 1:
+                raise ValueError(f"'StateHysteresis' must be at least 1, got {state_hysteresis}")
+            names = {state.name for state in screen_states}
+            for task in tasks:
+                unknown = set(task.states) - names
+                if unknown:
+                    raise ValueError(f"task {task.index} uses unknown states {sorted(unknown)}")
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Invalid 'ScreenStates' in {process_config.get('ProcessName')}: {e}")
+            return None
+        
+        plan = ProcessPlan(
+            process_name=process_config.get('ProcessName', ''),
+            resource_dir=resource_dir,
+            match_value=process_config.get('MatchValue', 0.8),
+            tasks=tuple(tasks),
+            cycle_budget=cycle_budget,
+            adaptive_order=bool(process_config.get('AdaptiveOrder', False)),
+            stats_file=os.path.normpath(os.path.join(
+                resource_dir, process_config.get('MatchStatsFile', 'match_stats.json'))),
+            multi_scale=multi_scale,
+            region_capture=bool(process_config.get('RegionCapture', False)),
+            screen_states=tuple(screen_states),
+            state_hysteresis=state_hysteresis
+        )
+        logger.info(f"Compiled plan for {plan.process_name}: {len(plan.tasks)} tasks "
+                    f"({recompiled} recompiled)")
+        return plan
@@ -0,0 +1,223 @@
+"""
+Config Watcher Module
+Watch config and template directories for changes (inotify with polling fallback)
+"""
+import os
+import sys
+import select
+import struct
+import hashlib
+import logging
+import threading
+import ctypes
+import ctypes.util
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify constants (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def content_hash(filepath: str) -> Optional[str]:
+    """
+    Compute SHA-1 of a file's content
+
+    Args:
+        filepath: Path to file
+
+    Returns:
+        Hex digest or None if the file cannot be read
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class FileWatcher:
+    """Report changed files in a set of directories to a callback"""
+
+    def __init__(self,
+                 directories: Iterable[str],
+                 callback: Callable[[Set[str]], None],
+                 poll_interval: float = 1.0,
+                 debounce: float = 0.2,
+                 use_inotify: Optional[bool] = None):
+        """
+        Initialize file watcher
+
+        Args:
+            directories: Directories to watch (non-recursive)
+            callback: Called from the watcher thread with a set of changed absolute paths
+            poll_interval: Seconds between scans in polling mode
+            debounce: Seconds to collect further events before firing the callback
+            use_inotify: Force inotify on/off (default: inotify on Linux when available)
+        """
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.directories: Set[str] = set()
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Polling state: path -> (mtime_ns, size)
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+        # inotify state
+        self._libc = None
+        self._fd: Optional[int] = None
+        self._wd_to_dir: Dict[int, str] = {}
+
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith('linux')
+        if use_inotify:
+            self._init_inotify()
+
+        for directory in directories:
+            self.watch(directory)
+
+    @property
+    def mode(self) -> str:
+        """Active backend name ('inotify' or 'polling')"""
+        return 'inotify' if self._fd is not None else 'polling'
+
+    def _init_inotify(self):
+        """Set up inotify, leaving the watcher in polling mode on failure"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            self._libc = libc
+            self._fd = fd
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable, falling back to polling: {e}")
+
+    def watch(self, directory: str):
+        """
+        Add a directory to the watch set
+
+        Args:
+            directory: Directory path
+        """
+        directory = os.path.abspath(directory)
+        with self._lock:
+            if directory in self.directories:
+                return
+            self.directories.add(directory)
+
+            if self._fd is not None:
+                wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+                if wd < 0:
+                    logger.warning(f"Failed to watch {directory} (errno {ctypes.get_errno()})")
+                else:
+                    self._wd_to_dir[wd] = directory
+
+            self._snapshot.update(self._scan(directory))
+
+        logger.info(f"Watching {directory} ({self.mode})")
+
+    @staticmethod
+    def _scan(directory: str) -> Dict[str, Tuple[int, int]]:
+        """Snapshot (mtime_ns, size) of every file in a directory"""
+        snapshot = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            logger.debug(f"Failed to scan {directory}: {e}")
+        return snapshot
+
+    def _poll_changes(self) -> Set[str]:
+        """Compare a fresh scan against the last snapshot"""
+        with self._lock:
+            current = {}
+            for directory in self.directories:
+                current.update(self._scan(directory))
+            previous, self._snapshot = self._snapshot, current
+
+        changed = {path for path, stat in current.items() if previous.get(path) != stat}
+        changed.update(path for path in previous if path not in current)
+        return changed
+
+    def _read_inotify(self, timeout: float) -> Set[str]:
+        """Wait up to timeout for inotify events and decode them"""
+        changed: Set[str] = set()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changed
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(data):
+            wd, _mask, _cookie, name_len = _EVENT_HEADER.unpack_from(data, pos)
+            pos += _EVENT_HEADER.size
+            name = data[pos:pos + name_len].rstrip(b'\0')
+            pos += name_len
+
+            directory = self._wd_to_dir.get(wd)
+            if directory and name:
+                changed.add(os.path.join(directory, os.fsdecode(name)))
+        return changed
+
+    def _run(self):
+        """Watcher thread body"""
+        while not self._stop_event.is_set():
+            if self._fd is not None:
+                changed = self._read_inotify(self.poll_interval)
+                # Editors write in several steps; collect the burst
+                while changed and not self._stop_event.is_set():
+                    more = self._read_inotify(self.debounce)
+                    if not more:
+                        break
+                    changed |= more
+            else:
+                if self._stop_event.wait(self.poll_interval):
+                    break
+                changed = self._poll_changes()
+
+            if changed and not self._stop_event.is_set():
+                logger.debug(f"Files changed: {sorted(changed)}")
+                try:
+                    self.callback(changed)
+                except Exception as e:
+                    logger.error(f"Error in file change callback: {e}", exc_info=True)
+
+    def start(self):
+        """Start watcher thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watcher thread and release inotify resources"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1.0)
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._wd_to_dir.clear()
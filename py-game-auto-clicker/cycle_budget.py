@@ -0,0 +1,131 @@
+"""
+Cycle Budget Module
+Priority-ordered task scheduling within a per-cycle time budget
+"""
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from task_plan import CompiledTask
+
+logger = logging.getLogger(__name__)
+
+
+class CycleScheduler:
+    """
+    Hand out a cycle's tasks in priority order until the budget is spent
+    
+    Tasks left over when the budget runs out are deferred: they run first
+    in the next cycle, so low-priority work is delayed but never starved.
+    The first task of a cycle always runs.
+    """
+    
+    def __init__(self, tasks: Sequence[CompiledTask], budget: float):
+        """
+        Initialize scheduler
+        
+        Args:
+            tasks: Compiled tasks
+            budget: Seconds per cycle (0 = unlimited)
+        """
+        # Stable sort keeps config order among equal priorities
+        self.tasks: List[CompiledTask] = sorted(tasks, key=lambda t: -t.priority)
+        self.budget = budget
+        
+        self._deferred: List[CompiledTask] = []
+        self._queue: List[CompiledTask] = []
+        self._position = 0
+        self._cycle_start = 0.0
+        
+        self.cycles = 0
+        self.overruns = 0
+        self.evaluated = 0
+        self.deferred = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+    
+    def update(self, tasks: Sequence[CompiledTask], budget: float):
+        """
+        Switch to a reloaded plan, keeping metrics
+        
+        Args:
+            tasks: Compiled tasks
+            budget: Seconds per cycle (0 = unlimited)
+        """
+        self.tasks = sorted(tasks, key=lambda t: -t.priority)
+        self.budget = budget
+        self._deferred = []
+    
+    def start_cycle(self, started: Optional[float] = None, tasks: Optional[Sequence[CompiledTask]] = None):
+        """
+        Begin a cycle
+        
+        Args:
+            started: time.monotonic() the budget clock starts at (default: now)
+            tasks: Tasks eligible this cycle, e.g. those of the current screen
+                   state (default: all); deferred tasks outside them are dropped
+        """
+        eligible = self.tasks if tasks is None else sorted(tasks, key=lambda t: -t.priority)
+        if tasks is not None:
+            indices = set(t.index for t in eligible)
+            self._deferred = [t for t in self._deferred if t.index in indices]
+        deferred = set(t.index for t in self._deferred)
+        self._queue = self._deferred + [t for t in eligible if t.index not in deferred]
+        self._deferred = []
+        self._position = 0
+        self._cycle_start = time.monotonic() if started is None else started
+    
+    def elapsed(self) -> float:
+        """Seconds since the cycle started"""
+        return time.monotonic() - self._cycle_start
+    
+    def next_task(self) -> Optional[CompiledTask]:
+        """
+        Get the next task to evaluate
+        
+        Returns:
+            Task or None when the cycle is complete or the budget is spent
+        """
+        if self._position >= len(self._queue):
+            return None
+        
+        if self._position > 0 and self.budget > 0 and self.elapsed() >= self.budget:
+            remaining = self._queue[self._position:]
+            self._deferred = sorted(remaining, key=lambda t: -t.priority)
+            self.deferred += len(remaining)
+            logger.debug(f"Cycle budget spent after {self._position} tasks, "
+                         f"deferring {len(remaining)}")
+            self._position = len(self._queue)
+            return None
+        
+        task = self._queue[self._position]
+        self._position += 1
+        self.evaluated += 1
+        return task
+    
+    def end_cycle(self):
+        """Finish a cycle and record its timing"""
+        elapsed = self.elapsed()
+        self.cycles += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if self.budget > 0 and elapsed > self.budget:
+            self.overruns += 1
+            logger.debug(f"Cycle overran budget: {elapsed * 1000:.1f} ms > {self.budget * 1000:.1f} ms")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get budget metrics
+        
+        Returns:
+            Dictionary with cycle count, overruns, evaluated/deferred tasks and cycle times
+        """
+        return {
+            'cycles': self.cycles,
+            'budget_ms': self.budget * 1000,
+            'overruns': self.overruns,
+            'evaluated': self.evaluated,
+            'deferred': self.deferred,
+            'mean_cycle_ms': self.total_time / self.cycles * 1000 if self.cycles else 0.0,
+            'max_cycle_ms': self.max_time * 1000,
+        }
@@ -0,0 +1,167 @@
+"""
+Exact Matcher Module
+Pixel-exact template search by integer SAD, rejecting positions early with sentinel pixels
+"""
+import math
+import logging
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from image_matcher import MatchResult
+
+logger = logging.getLogger(__name__)
+
+# Template pixels checked before full verification
+SENTINELS = 16
+# Sentinels checked with whole-frame passes; the rest only at surviving positions
+FRAME_SENTINELS = 2
+# Positions verified at once, bounding memory when a flat template passes its sentinels almost everywhere
+VERIFY_CHUNK = 4096
+
+
+def sentinel_variant(scale: float) -> str:
+    """Template cache variant name of the sentinels of a template resized by scale"""
+    return f"sentinels@{scale:g}"
+
+
+def select_sentinels(template: np.ndarray, count: int = SENTINELS) -> np.ndarray:
+    """
+    Pick the template pixels most likely to reject a wrong position
+    
+    Values that are rare within the template are unlikely to appear at a
+    given spot by chance, and one pixel per grid cell keeps the sentinels
+    apart, so a partly similar region still fails one of them.
+    
+    Args:
+        template: Grayscale template
+        count: Number of sentinels
+        
+    Returns:
+        int32 array of (y, x, value) rows, most selective first
+    """
+    height, width = template.shape
+    rarity = np.bincount(template.ravel(), minlength=256)[template]
+    cells = max(1, int(math.ceil(math.sqrt(count))))
+    picks = []
+    for row in range(cells):
+        y0, y1 = row * height // cells, (row + 1) * height // cells
+        for col in range(cells):
+            x0, x1 = col * width // cells, (col + 1) * width // cells
+            if y1 <= y0 or x1 <= x0:
+                continue
+            y, x = divmod(int(np.argmin(rarity[y0:y1, x0:x1])), x1 - x0)
+            picks.append((int(rarity[y0 + y, x0 + x]), y0 + y, x0 + x))
+    
+    picks.sort()
+    return np.array([(y, x, template[y, x]) for _, y, x in picks[:count]], dtype=np.int32).reshape(-1, 3)
+
+
+def mask_positions(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the (rows, cols) of nonzero entries of a sparse contiguous uint8 mask
+    
+    The mask is scanned eight bytes at a time and only nonzero words are
+    expanded, several times faster than np.nonzero on a mostly empty mask.
+    """
+    flat = mask.reshape(-1)
+    whole = len(flat) // 8 * 8
+    words = np.flatnonzero(flat[:whole].view(np.uint64))
+    indices = (words[:, None] * 8 + np.arange(8)).ravel()
+    indices = np.concatenate([indices[flat[indices] != 0], np.flatnonzero(flat[whole:]) + whole])
+    return np.divmod(indices, mask.shape[1])
+
+
+def verify_positions(source: np.ndarray,
+                     template: np.ndarray,
+                     ys: np.ndarray,
+                     xs: np.ndarray,
+                     tolerance: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the SAD of candidate positions row by row, dropping each at its first pixel over tolerance
+    
+    Returns:
+        Tuple of (ys, xs, sad) of the positions where every pixel is within tolerance
+    """
+    sad = np.zeros(len(ys), dtype=np.int64)
+    columns = np.arange(template.shape[1])
+    for r in range(template.shape[0]):
+        if not len(ys):
+            break
+        diff = np.abs(source[(ys + r)[:, None], xs[:, None] + columns].astype(np.int16) - template[r])
+        keep = diff.max(axis=1) <= tolerance
+        sad = sad[keep] + diff[keep].sum(axis=1)
+        ys, xs = ys[keep], xs[keep]
+    return ys, xs, sad
+
+
+def match_exact(source: np.ndarray, template: np.ndarray, sentinels: np.ndarray, tolerance: int = 0) -> MatchResult:
+    """
+    Find a position where every template pixel is within tolerance of the source
+    
+    Candidates are narrowed in stages: a few sentinels are compared at every
+    position with whole-frame passes, the other sentinels only at the
+    positions still left, and the survivors are verified row by row while
+    their sum of absolute differences (SAD) accumulates, dropping each as
+    soon as a pixel is off by more than the tolerance. Among full matches
+    the lowest SAD wins.
+    
+    Args:
+        source: Grayscale source image
+        template: Grayscale template
+        sentinels: Rows of (y, x, value) from select_sentinels
+        tolerance: Largest per-pixel gray level difference still accepted (0 = identical)
+        
+    Returns:
+        MatchResult; confidence is 1 - SAD / (255 * template pixels)
+    """
+    template_h, template_w = template.shape
+    rows = source.shape[0] - template_h + 1
+    cols = source.shape[1] - template_w + 1
+    if rows <= 0 or cols <= 0:
+        return MatchResult(matched=False, confidence=0.0)
+    
+    # Stage 1: whole-frame passes; position (y, x) reads source[y + sy, x + sx]
+    mask = None
+    for sy, sx, value in sentinels[:FRAME_SENTINELS]:
+        window = source[sy:sy + rows, sx:sx + cols]
+        hit = cv2.inRange(window, max(0, int(value) - tolerance), min(255, int(value) + tolerance))
+        mask = hit if mask is None else cv2.bitwise_and(mask, hit, dst=mask)
+    if mask is None:
+        mask = np.full((rows, cols), 255, dtype=np.uint8)
+    ys, xs = mask_positions(mask)
+    
+    # Stage 2: remaining sentinels, gathered at surviving positions only
+    for sy, sx, value in sentinels[FRAME_SENTINELS:]:
+        if not len(ys):
+            break
+        keep = np.abs(source[ys + sy, xs + sx].astype(np.int16) - value) <= tolerance
+        ys, xs = ys[keep], xs[keep]
+    
+    # Stage 3: full SAD with early termination, in row-major position order
+    chunks = []
+    for i in range(0, len(ys), VERIFY_CHUNK):
+        chunk = verify_positions(source, template, ys[i:i + VERIFY_CHUNK], xs[i:i + VERIFY_CHUNK], tolerance)
+        chunks.append(chunk)
+        # Nothing beats an identical position
+        if len(chunk[2]) and chunk[2].min() == 0:
+            break
+    if chunks:
+        ys, xs, sad = (np.concatenate(parts) for parts in zip(*chunks))
+    
+    if not len(ys):
+        return MatchResult(matched=False, confidence=0.0, template_size=(template_w, template_h))
+    
+    best = int(np.argmin(sad))
+    confidence = 1.0 - float(sad[best]) / (255.0 * template_h * template_w)
+    location = (int(xs[best]), int(ys[best]))
+    logger.debug(f"Exact match at {location}, SAD {int(sad[best])}, {len(ys)} full matches")
+    return MatchResult(
+        matched=True,
+        confidence=confidence,
+        location=location,
+        template_size=(template_w, template_h),
+        max_val=confidence,
+        max_loc=location
+    )
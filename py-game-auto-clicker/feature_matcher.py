@@ -0,0 +1,236 @@
+"""
+Feature Matcher Module
+Keypoint descriptor index over all templates, matched once per frame
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from image_matcher import MatchResult
+
+logger = logging.getLogger(__name__)
+
+ENGINE_TEMPLATE = 'template'
+ENGINE_ORB = 'orb'
+ENGINE_AKAZE = 'akaze'
+FEATURE_ENGINES = (ENGINE_ORB, ENGINE_AKAZE)
+ENGINES = (ENGINE_TEMPLATE,) + FEATURE_ENGINES
+
+# Lowe's ratio test: best descriptor match must clearly beat the second best
+RATIO = 0.75
+# Homography inliers needed to accept a template
+MIN_INLIERS = 8
+# RANSAC reprojection error in pixels
+RANSAC_THRESHOLD = 5.0
+
+
+def engine_available(engine: str) -> bool:
+    """Check if the installed OpenCV build provides an engine"""
+    if engine == ENGINE_TEMPLATE:
+        return True
+    # OpenCV 5 moved AKAZE out of the main package
+    factory = {ENGINE_ORB: 'ORB_create', ENGINE_AKAZE: 'AKAZE_create'}.get(engine)
+    return factory is not None and hasattr(cv2, factory)
+
+
+def create_detector(engine: str, max_features: int):
+    """
+    Create a keypoint detector/descriptor extractor
+    
+    Args:
+        engine: 'orb' or 'akaze'
+        max_features: Keypoint limit (ORB only)
+        
+    Returns:
+        OpenCV Feature2D instance
+        
+    Raises:
+        ValueError: If the engine is unknown or not in this OpenCV build
+    """
+    if not engine_available(engine) or engine == ENGINE_TEMPLATE:
+        raise ValueError(f"Feature engine not available: {engine}")
+    if engine == ENGINE_ORB:
+        return cv2.ORB_create(nfeatures=max_features, edgeThreshold=15, patchSize=15, fastThreshold=10)
+    return cv2.AKAZE_create()
+
+
+class FeatureIndex:
+    """
+    Descriptors of every indexed template, stacked into one matrix
+    
+    Each frame is described once and matched against the whole index in a
+    single k-nearest-neighbour pass; candidate templates are then verified
+    with a RANSAC homography. Results are kept for the last frame id, so the
+    other icons and tasks evaluated on the same frame cost a dict lookup.
+    Keypoints and homographies tolerate scale and rotation changes that
+    template correlation does not.
+    """
+    
+    def __init__(self,
+                 engine: str = ENGINE_ORB,
+                 template_features: int = 500,
+                 frame_features: int = 10000,
+                 min_inliers: int = MIN_INLIERS):
+        """
+        Initialize feature index
+        
+        Args:
+            engine: 'orb' or 'akaze'
+            template_features: Keypoint limit per template (ORB only)
+            frame_features: Keypoint limit per frame (ORB only)
+            min_inliers: Homography inliers needed for a match
+        """
+        self.engine = engine
+        self.min_inliers = min_inliers
+        self._template_detector = create_detector(engine, template_features)
+        self._frame_detector = create_detector(engine, frame_features)
+        # ORB and AKAZE both produce binary descriptors
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        
+        # path -> (descriptors, keypoint coordinates, (width, height))
+        self._templates: Dict[str, Tuple[Optional[np.ndarray], np.ndarray, Tuple[int, int]]] = {}
+        self._paths: List[str] = []
+        self._descriptors: Optional[np.ndarray] = None
+        self._owners = np.empty(0, dtype=np.int32)
+        self._points = np.empty((0, 2), dtype=np.float32)
+        
+        self._frame_id: Optional[int] = None
+        self._results: Dict[str, MatchResult] = {}
+        self._lock = threading.Lock()
+        
+        self.frames = 0
+    
+    def __contains__(self, path: str) -> bool:
+        return path in self._templates
+    
+    def __len__(self) -> int:
+        return len(self._templates)
+    
+    def add(self, path: str, template: np.ndarray) -> bool:
+        """
+        Extract a template's keypoints into the index, replacing earlier ones
+        
+        Args:
+            path: Template path
+            template: Grayscale template image
+            
+        Returns:
+            True if the template has enough keypoints to ever match
+        """
+        keypoints, descriptors = self._template_detector.detectAndCompute(template, None)
+        points = np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2)
+        height, width = template.shape[:2]
+        
+        with self._lock:
+            self._templates[path] = (descriptors, points, (width, height))
+            self._rebuild()
+        
+        if descriptors is None or len(descriptors) < self.min_inliers:
+            logger.warning(f"Template has too few {self.engine} keypoints to match: {path} "
+                           f"({len(keypoints)})")
+            return False
+        return True
+    
+    def _rebuild(self):
+        """Restack descriptors of all templates; caller holds the lock"""
+        self._paths = list(self._templates)
+        blocks, owners, points = [], [], []
+        for owner, path in enumerate(self._paths):
+            descriptors, template_points, _ = self._templates[path]
+            if descriptors is None:
+                continue
+            blocks.append(descriptors)
+            owners.append(np.full(len(descriptors), owner, dtype=np.int32))
+            points.append(template_points)
+        
+        self._descriptors = np.vstack(blocks) if blocks else None
+        self._owners = np.concatenate(owners) if owners else np.empty(0, dtype=np.int32)
+        self._points = np.vstack(points) if points else np.empty((0, 2), dtype=np.float32)
+        self._frame_id = None
+        self._results = {}
+    
+    def match(self, source: np.ndarray, path: str, frame_id: Optional[int] = None) -> MatchResult:
+        """
+        Look up a template in a frame, describing the frame on first use
+        
+        Args:
+            source: Grayscale source image (screenshot)
+            path: Indexed template path
+            frame_id: Id of the frame's content (ImageMatcher.frame_id); frames
+                      without one are always described again, since reused
+                      capture buffers keep their identity across frames
+                      
+        Returns:
+            MatchResult; confidence is the homography inlier ratio
+        """
+        with self._lock:
+            if frame_id is None or frame_id != self._frame_id:
+                self._results = self._match_frame(source)
+                self._frame_id = frame_id
+            result = self._results.get(path)
+        return result or MatchResult(matched=False, confidence=0.0)
+    
+    def _match_frame(self, source: np.ndarray) -> Dict[str, MatchResult]:
+        """Match every indexed template against a frame; caller holds the lock"""
+        self.frames += 1
+        if self._descriptors is None:
+            return {}
+        
+        keypoints, descriptors = self._frame_detector.detectAndCompute(source, None)
+        if descriptors is None or len(descriptors) < 2:
+            return {}
+        frame_points = np.array([kp.pt for kp in keypoints], dtype=np.float32)
+        
+        # One batched pass: every template descriptor against the frame
+        candidates: Dict[int, List[Tuple[int, int]]] = {}
+        for pair in self._matcher.knnMatch(self._descriptors, descriptors, k=2):
+            if len(pair) == 2 and pair[0].distance < RATIO * pair[1].distance:
+                owner = int(self._owners[pair[0].queryIdx])
+                candidates.setdefault(owner, []).append((pair[0].queryIdx, pair[0].trainIdx))
+        
+        results = {}
+        for owner, pairs in candidates.items():
+            if len(pairs) < self.min_inliers:
+                continue
+            path = self._paths[owner]
+            query, train = (np.array(idx) for idx in zip(*pairs))
+            results[path] = self._verify(self._points[query], frame_points[train],
+                                         self._templates[path][2])
+        return results
+    
+    def _verify(self,
+                template_points: np.ndarray,
+                frame_points: np.ndarray,
+                size: Tuple[int, int]) -> MatchResult:
+        """Fit a homography to candidate matches and place the template"""
+        homography, mask = cv2.findHomography(template_points, frame_points, cv2.RANSAC, RANSAC_THRESHOLD)
+        if homography is None:
+            return MatchResult(matched=False, confidence=0.0)
+        
+        inliers = int(mask.sum())
+        confidence = inliers / len(template_points)
+        if inliers < self.min_inliers:
+            return MatchResult(matched=False, confidence=confidence)
+        
+        width, height = size
+        corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]]).reshape(-1, 1, 2)
+        projected = cv2.perspectiveTransform(corners, homography)
+        # A twisted or collapsed outline is a false fit
+        area = cv2.contourArea(projected)
+        if not cv2.isContourConvex(projected) or area < 1.0:
+            return MatchResult(matched=False, confidence=confidence)
+        
+        projected = projected.reshape(-1, 2)
+        left, top = projected.min(axis=0)
+        right, bottom = projected.max(axis=0)
+        
+        return MatchResult(
+            matched=True,
+            confidence=confidence,
+            location=(int(round(left)), int(round(top))),
+            template_size=(int(round(right - left)), int(round(bottom - top))),
+            scale=float(np.sqrt(area / (width * height)))
+        )
@@ -0,0 +1,259 @@
+"""
+Flight Recorder Module
+Bounded in-memory ring of recent frames, match results and actions, dumped to disk on demand
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A frame differing from its keyframe in more than this share of pixels starts a new keyframe
+KEYFRAME_CHANGE = 0.25
+
+# Sums a pixel's channel differences, so any changed channel leaves it nonzero
+_CHANNEL_SUM = np.ones((1, 3), dtype=np.float32)
+
+
+class RecordedFrame:
+    """One frame of the ring: a keyframe, or the pixels that differ from one"""
+    
+    __slots__ = ('frame_id', 'time', 'keyframe', 'indices', 'values', 'events', 'nbytes')
+    
+    def __init__(self,
+                 frame_id: int,
+                 timestamp: float,
+                 keyframe: np.ndarray,
+                 indices: Optional[np.ndarray] = None,
+                 values: Optional[np.ndarray] = None):
+        self.frame_id = frame_id
+        self.time = timestamp
+        self.keyframe = keyframe  # shared by the deltas of one segment
+        self.indices = indices  # flat pixel indices that differ; None for a keyframe
+        self.values = values  # BGR values at those indices
+        self.events: List[Dict[str, Any]] = []
+        self.nbytes = keyframe.nbytes if indices is None else indices.nbytes + values.nbytes
+    
+    @property
+    def is_keyframe(self) -> bool:
+        return self.indices is None
+    
+    def decode(self) -> np.ndarray:
+        """Rebuild the downscaled BGR frame"""
+        if self.is_keyframe:
+            return self.keyframe
+        frame = self.keyframe.copy()
+        frame.reshape(-1, 3)[self.indices] = self.values
+        return frame
+
+
+class FlightRecorder:
+    """
+    Keep the last seconds of frames and what the runtime did with them
+    
+    Frames are downscaled and stored as a keyframe followed by the pixels
+    that differ from it, which for a mostly static game UI is a small
+    fraction of the frame. Match results and actions are attached to the
+    frame they came from. A keyframe and its deltas form a segment, and
+    whole segments are dropped once the ring exceeds its memory cap or
+    time window, so every frame left in the ring can be decoded.
+    """
+    
+    def __init__(self,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 seconds: float = 30.0,
+                 downscale: int = 2,
+                 keyframe_interval: int = 60):
+        """
+        Initialize flight recorder
+        
+        Args:
+            max_bytes: Memory cap of the stored frames
+            seconds: Frames older than this are dropped
+            downscale: Integer factor frames are shrunk by before storing
+            keyframe_interval: Frames per segment at most
+        """
+        if max_bytes <= 0 or seconds <= 0 or downscale < 1 or keyframe_interval < 1:
+            raise ValueError("flight recorder limits must be positive")
+        self.max_bytes = max_bytes
+        self.seconds = seconds
+        self.downscale = downscale
+        self.keyframe_interval = keyframe_interval
+        
+        self._frames: Deque[RecordedFrame] = deque()
+        self._keyframe: Optional[np.ndarray] = None
+        self._segment_length = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        
+        self.bytes = 0
+        self.recorded = 0
+        self.keyframes = 0
+        self.record_time = 0.0
+        self.dumps = 0
+    
+    def _shrink(self, frame: np.ndarray) -> np.ndarray:
+        """Downscale a captured frame into a new BGR array"""
+        # Capture buffers are reused, so the ring must own its pixels; resizing
+        # first leaves the color conversion a fraction of the pixels
+        if self.downscale > 1:
+            height, width = frame.shape[:2]
+            size = (max(1, width // self.downscale), max(1, height // self.downscale))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        elif frame.ndim == 3 and frame.shape[2] == 3:
+            frame = frame.copy()
+        
+        if frame.ndim == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        if frame.shape[2] == 4:
+            return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        return frame
+    
+    def record_frame(self, frame: np.ndarray) -> int:
+        """
+        Add a captured frame to the ring
+        
+        Args:
+            frame: Captured frame (BGRA, BGR or grayscale); it is copied
+            
+        Returns:
+            Id of the recorded frame, for attaching events
+        """
+        started = time.perf_counter()
+        small = self._shrink(frame)
+        now = time.time()
+        
+        with self._lock:
+            keyframe = self._keyframe
+            entry = None
+            if (keyframe is not None and keyframe.shape == small.shape
+                    and self._segment_length < self.keyframe_interval):
+                changed = np.flatnonzero(cv2.transform(cv2.absdiff(small, keyframe), _CHANNEL_SUM))
+                if len(changed) <= KEYFRAME_CHANGE * small.shape[0] * small.shape[1]:
+                    entry = RecordedFrame(self._next_id, now, keyframe, changed.astype(np.int32),
+                                          small.reshape(-1, 3)[changed])
+            if entry is None:
+                entry = RecordedFrame(self._next_id, now, small)
+                self._keyframe = small
+                self._segment_length = 0
+                self.keyframes += 1
+            
+            self._segment_length += 1
+            self._next_id += 1
+            self._frames.append(entry)
+            self.bytes += entry.nbytes
+            self.recorded += 1
+            self._evict(now)
+        
+        self.record_time += time.perf_counter() - started
+        return entry.frame_id
+    
+    def _evict(self, now: float):
+        """Drop the oldest segments while over the cap or window; caller holds the lock"""
+        while self._frames:
+            oldest = self._frames[0]
+            expired = self.bytes > self.max_bytes or oldest.time < now - self.seconds
+            if oldest.keyframe is self._keyframe:
+                # The newest frames stay; the next frame starts a segment that can replace them
+                if expired:
+                    self._segment_length = self.keyframe_interval
+                break
+            if not expired:
+                break
+            # Deltas are useless without their keyframe, so a segment goes as a whole
+            self.bytes -= self._frames.popleft().nbytes
+            while self._frames and not self._frames[0].is_keyframe:
+                self.bytes -= self._frames.popleft().nbytes
+    
+    def record_event(self, kind: str, frame_id: Optional[int] = None, **fields):
+        """
+        Attach an event to a recorded frame
+        
+        Args:
+            kind: Event type, e.g. 'match' or 'action'
+            frame_id: Frame the event belongs to (default: the latest frame)
+            **fields: JSON-serializable event data
+        """
+        with self._lock:
+            if not self._frames:
+                return
+            entry = self._frames[-1]
+            if frame_id is not None and frame_id != entry.frame_id:
+                entry = next((f for f in reversed(self._frames) if f.frame_id == frame_id), None)
+                if entry is None:
+                    return
+            entry.events.append({'type': kind, 'time': time.time(), **fields})
+    
+    def dump(self, directory: str, reason: str = 'manual', background: bool = False) -> Optional[str]:
+        """
+        Write the ring to a new directory as PNG frames and an events.jsonl index
+        
+        Args:
+            directory: Parent directory of the dump
+            reason: Why the dump was taken; written to the index
+            background: Write on a separate thread so the task loop keeps running
+            
+        Returns:
+            Path of the dump directory, or None if the ring is empty
+        """
+        with self._lock:
+            frames = list(self._frames)
+            # Later events of the latest frame must not change the snapshot
+            events = [list(f.events) for f in frames]
+        if not frames:
+            logger.warning("Flight recorder is empty, nothing to dump")
+            return None
+        
+        path = os.path.join(directory, f"flight-{time.strftime('%Y%m%d-%H%M%S')}-{frames[-1].frame_id}")
+        self.dumps += 1
+        if background:
+            threading.Thread(target=self._write, args=(path, reason, frames, events), daemon=True).start()
+        else:
+            self._write(path, reason, frames, events)
+        return path
+    
+    def _write(self, path: str, reason: str, frames: List[RecordedFrame], events: List[List[Dict[str, Any]]]):
+        started = time.perf_counter()
+        try:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, 'events.jsonl'), 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'reason': reason, 'downscale': self.downscale,
+                                    'frames': len(frames)}) + '\n')
+                for entry, frame_events in zip(frames, events):
+                    name = f"frame-{entry.frame_id:06d}.png"
+                    if not cv2.imwrite(os.path.join(path, name), entry.decode()):
+                        raise OSError(f"cannot write {name}")
+                    f.write(json.dumps({'frame': entry.frame_id, 'time': entry.time, 'file': name,
+                                        'events': frame_events}) + '\n')
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Failed to dump flight recorder to {path}: {e}")
+            return
+        logger.info(f"Dumped {len(frames)} frames to {path} ({reason}, "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms)")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get recorder metrics
+        
+        Returns:
+            Dictionary with frames held, memory, keyframe share and mean recording cost per frame
+        """
+        with self._lock:
+            held = len(self._frames)
+            span = self._frames[-1].time - self._frames[0].time if held else 0.0
+        return {
+            'frames': held,
+            'seconds': span,
+            'bytes': self.bytes,
+            'bytes_per_frame': self.bytes / held if held else 0.0,
+            'keyframe_ratio': self.keyframes / self.recorded if self.recorded else 0.0,
+            'mean_record_ms': self.record_time / self.recorded * 1000 if self.recorded else 0.0,
+            'dumps': self.dumps,
+        }
@@ -0,0 +1,181 @@
+"""
+Frame Source Module
+Where the task loop gets its frames: a live window or a recorded replay
+"""
+import os
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from window_manager import WindowManager
+from screen_capture import Region, ScreenCapture, merge_regions
+
+logger = logging.getLogger(__name__)
+
+Frame = Tuple[np.ndarray, Tuple[int, int, int, int]]  # (screenshot, window rect)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class FrameSource:
+    """Base class for frame sources"""
+    
+    # Window regions holding fresh pixels; None = the whole frame
+    regions: Optional[List[Region]] = None
+    
+    @property
+    def exhausted(self) -> bool:
+        """True once no more frames will come; live sources never run out"""
+        return False
+    
+    def grab(self) -> Optional[Frame]:
+        """
+        Get the next frame
+        
+        Returns:
+            Tuple of (screenshot, window rect) or None if no frame is available
+        """
+        raise NotImplementedError
+    
+    def set_regions(self, regions: Optional[Sequence[Region]]):
+        """
+        Restrict capture to window regions; recorded frames are always whole
+        
+        Args:
+            regions: Window-relative (x, y, width, height) regions, or None for whole frames
+        """
+    
+    def close(self):
+        """Release resources"""
+
+
+class WindowFrameSource(FrameSource):
+    """Capture the target window of a WindowManager"""
+    
+    def __init__(self, window_manager: WindowManager, screen_capture: ScreenCapture):
+        """
+        Initialize window frame source
+        
+        Args:
+            window_manager: WindowManager tracking the target window
+            screen_capture: ScreenCapture instance
+        """
+        self.window_manager = window_manager
+        self.screen_capture = screen_capture
+    
+    def set_regions(self, regions: Optional[Sequence[Region]]):
+        self.regions = merge_regions(regions) if regions else None
+        if self.regions:
+            pixels = sum(w * h for _, _, w, h in self.regions)
+            logger.info(f"Capturing {len(self.regions)} regions ({pixels} pixels) instead of whole windows")
+    
+    def grab(self) -> Optional[Frame]:
+        # Lost windows are re-found with backoff; the manager logs loss and recovery
+        hwnd = self.window_manager.ensure_window()
+        if not hwnd:
+            return None
+        
+        # Capture screenshot
+        screenshot = self.screen_capture.capture_window(hwnd, self.regions)
+        if screenshot is None:
+            logger.error("Failed to capture screenshot")
+            return None
+        
+        # Get window rect for absolute positioning
+        window_rect = self.window_manager.get_window_rect(hwnd)
+        if not window_rect:
+            logger.error("Failed to get window rect")
+            return None
+        
+        return screenshot, window_rect
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    Play back recorded frames from an image directory or a video file
+    
+    Images are read in file name order. The window rect is the frame size at
+    the given origin, so actions resolve to the coordinates they would have
+    had on a window there.
+    """
+    
+    def __init__(self, path: str, loop: bool = False, origin: Tuple[int, int] = (0, 0)):
+        """
+        Initialize replay frame source
+        
+        Args:
+            path: Directory of frame images or a video file
+            loop: Start over after the last frame
+            origin: Screen position of the replayed window's top-left corner
+        """
+        self.path = path
+        self.loop = loop
+        self.origin = origin
+        self.frames_read = 0
+        
+        self._files: List[str] = []
+        self._position = 0
+        self._video: Optional[cv2.VideoCapture] = None
+        self._exhausted = False
+        
+        if os.path.isdir(path):
+            self._files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                 if name.lower().endswith(IMAGE_EXTENSIONS))
+            if not self._files:
+                logger.error(f"No frame images in replay directory: {path}")
+                self._exhausted = True
+        else:
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                logger.error(f"Failed to open replay video: {path}")
+                self._exhausted = True
+        logger.info(f"Replaying frames from {path}")
+    
+    @property
+    def exhausted(self) -> bool:
+        return self._exhausted
+    
+    def _read(self) -> Optional[np.ndarray]:
+        """Read the next frame in order, or None at the end"""
+        if self._video is not None:
+            ok, frame = self._video.read()
+            return frame if ok else None
+        
+        while self._position < len(self._files):
+            filepath = self._files[self._position]
+            self._position += 1
+            frame = cv2.imread(filepath, cv2.IMREAD_COLOR)
+            if frame is not None:
+                return frame
+            logger.warning(f"Skipping unreadable replay frame: {filepath}")
+        return None
+    
+    def _rewind(self):
+        self._position = 0
+        if self._video is not None:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    
+    def grab(self) -> Optional[Frame]:
+        if self._exhausted:
+            return None
+        
+        frame = self._read()
+        if frame is None and self.loop and self.frames_read > 0:
+            self._rewind()
+            frame = self._read()
+        if frame is None:
+            logger.info(f"Replay finished after {self.frames_read} frames")
+            self._exhausted = True
+            return None
+        
+        self.frames_read += 1
+        height, width = frame.shape[:2]
+        left, top = self.origin
+        return frame, (left, top, left + width, top + height)
+    
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
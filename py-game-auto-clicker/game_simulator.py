@@ -0,0 +1,470 @@
+"""
+Game Simulator Module
+Headless synthetic game: a config's icons drawn as buttons that appear, move and react to clicks
+"""
+import os
+import sys
+import math
+import time
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from config_loader import ConfigLoader
+from frame_source import Frame, FrameSource
+from input_backend import EventKind, InputBackend, InputEvent
+from task_plan import CompiledTask, ProcessPlan
+
+logger = logging.getLogger(__name__)
+
+# Pixels between the icons of one button
+ICON_GAP = 8
+# Fill behind icons cropped from a larger image (IconOptions 'Origin')
+BUTTON_FILL = (40, 40, 40, 255)
+
+MODE_SINGLE = 'single'
+MODE_MULTI = 'multi'
+MODE_PROCESSES = 'processes'
+MODES = (MODE_SINGLE, MODE_MULTI, MODE_PROCESSES)
+
+
+class SimulatedButton:
+    """One task's first icon group, drawn side by side, bouncing around the scene until clicked"""
+    
+    __slots__ = ('task_index', 'image', 'anchor', 'x', 'y', 'vx', 'vy', 'since',
+                 'visible', 'due', 'shown', 'clicked', 'expired', 'reactions')
+    
+    def __init__(self, task_index: int, image: np.ndarray, anchor: Optional[Tuple[int, int]] = None):
+        self.task_index = task_index
+        self.image = image  # BGRA
+        self.anchor = anchor  # fixed position, so icons with a search region stay inside it
+        self.x = self.y = 0.0  # position at time `since`
+        self.vx = self.vy = 0.0  # pixels per second
+        self.since = 0.0
+        self.visible = False
+        self.due = 0.0  # appears (hidden) or expires (visible) at this time; 0 = never expires
+        self.shown = 0
+        self.clicked = 0
+        self.expired = 0
+        self.reactions: List[float] = []  # seconds from appearing to being clicked
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.shape[1], self.image.shape[0]
+
+
+def _bounce(start: float, distance: float, span: int) -> int:
+    """Position after moving `distance` from `start` between walls 0 and span"""
+    if span <= 0:
+        return 0
+    p = (start + distance) % (2 * span)
+    return int(2 * span - p if p > span else p)
+
+
+class GameSimulator(FrameSource):
+    """
+    A scripted scene rendered into frames, standing in for a game window
+    
+    Every task with icon groups gets a button made of its first group's
+    templates. Buttons appear after a random delay at a random position,
+    drift and bounce off the edges, and vanish when clicked or when their
+    lifetime runs out, then come back elsewhere. Icons with a search region
+    stay put inside it. Positions follow wall-clock time, so a click lands
+    where the button is when the click arrives, not where it was on the
+    matched frame. Frames are BGRA like window captures and are written
+    into a reused buffer.
+    """
+    
+    def __init__(self,
+                 plan: ProcessPlan,
+                 width: int = 1280,
+                 height: int = 720,
+                 origin: Tuple[int, int] = (0, 0),
+                 speed: float = 30.0,
+                 lifetime: float = 5.0,
+                 respawn: float = 1.0,
+                 seed: int = 0):
+        """
+        Initialize game simulator
+        
+        Args:
+            plan: Compiled plan whose templates become buttons
+            width: Frame width
+            height: Frame height
+            origin: Screen position of the simulated window's top-left corner
+            speed: Button speed in pixels per second (0 = buttons stand still)
+            lifetime: Seconds a button stays unclicked before it vanishes (0 = until clicked)
+            respawn: Mean seconds before a vanished button comes back
+            seed: Random seed of the scene
+        """
+        self.width = width
+        self.height = height
+        self.origin = origin
+        self.speed = speed
+        self.lifetime = lifetime
+        self.respawn = respawn
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        
+        # Blurred noise gives correlation nothing to lock onto outside the buttons
+        noise = self._rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        self._background = cv2.cvtColor(cv2.GaussianBlur(noise, (5, 5), 0), cv2.COLOR_BGR2BGRA)
+        self._frame = self._background.copy()
+        
+        self.buttons = [button for button in (self._build_button(task) for task in plan.tasks)
+                        if button is not None]
+        now = time.monotonic()
+        for button in self.buttons:
+            button.due = now + self._rng.uniform(0.0, respawn)
+        
+        self.frames = 0
+        self.misclicks = 0
+        self._started: Optional[float] = None
+    
+    def _build_button(self, task: CompiledTask) -> Optional[SimulatedButton]:
+        """Lay out a task's first icon group as one button image"""
+        if not task.icon_groups:
+            return None
+        
+        boxes = []
+        for icon in task.icon_groups[0].icons:
+            template = cv2.imread(icon.path, cv2.IMREAD_COLOR)
+            if template is None:
+                logger.error(f"Failed to load template: {icon.path}")
+                return None
+            boxes.append((template, icon.origin))
+        
+        width = sum(ox + t.shape[1] for t, (ox, _) in boxes) + ICON_GAP * (len(boxes) - 1)
+        height = max(oy + t.shape[0] for t, (_, oy) in boxes)
+        if width > self.width or height > self.height:
+            logger.warning(f"Task {task.index} icons do not fit a {self.width}x{self.height} frame")
+            return None
+        
+        image = np.empty((height, width, 4), dtype=np.uint8)
+        image[:] = BUTTON_FILL
+        x = 0
+        for template, (ox, oy) in boxes:
+            h, w = template.shape[:2]
+            image[oy:oy + h, x + ox:x + ox + w] = cv2.cvtColor(template, cv2.COLOR_BGR2BGRA)
+            x += ox + w + ICON_GAP
+        
+        # Pin the button so its first regioned icon lies inside the region it is searched in
+        anchor = None
+        x = 0
+        for icon, (template, (ox, oy)) in zip(task.icon_groups[0].icons, boxes):
+            if icon.region is not None:
+                anchor = (min(max(icon.region[0] - x - ox, 0), self.width - width),
+                          min(max(icon.region[1] - oy, 0), self.height - height))
+                break
+            x += ox + template.shape[1] + ICON_GAP
+        return SimulatedButton(task.index, image, anchor)
+    
+    def _place(self, button: SimulatedButton, now: float):
+        """Show a button at a new position; caller holds the lock"""
+        width, height = button.size
+        if button.anchor is not None:
+            button.x, button.y = button.anchor
+        else:
+            button.x = float(self._rng.uniform(0, self.width - width))
+            button.y = float(self._rng.uniform(0, self.height - height))
+            angle = float(self._rng.uniform(0, 2 * math.pi))
+            button.vx, button.vy = self.speed * math.cos(angle), self.speed * math.sin(angle)
+        button.since = now
+        button.visible = True
+        button.due = now + self.lifetime if self.lifetime > 0 else 0.0
+        button.shown += 1
+    
+    def _hide(self, button: SimulatedButton, now: float):
+        """Take a button off screen until its respawn; caller holds the lock"""
+        button.visible = False
+        button.due = now + self.respawn * float(self._rng.uniform(0.5, 1.5))
+    
+    def _position(self, button: SimulatedButton, now: float) -> Tuple[int, int]:
+        """Where a visible button is at a given time"""
+        if button.anchor is not None or self.speed <= 0:
+            return int(button.x), int(button.y)
+        width, height = button.size
+        elapsed = now - button.since
+        return (_bounce(button.x, button.vx * elapsed, self.width - width),
+                _bounce(button.y, button.vy * elapsed, self.height - height))
+    
+    def _advance(self, now: float):
+        """Bring due buttons in and let expired ones go; caller holds the lock"""
+        for button in self.buttons:
+            if not button.visible and now >= button.due:
+                self._place(button, now)
+            elif button.visible and button.due and now >= button.due:
+                button.expired += 1
+                self._hide(button, now)
+    
+    def grab(self) -> Optional[Frame]:
+        now = time.monotonic()
+        with self._lock:
+            if self._started is None:
+                self._started = now
+            self._advance(now)
+            np.copyto(self._frame, self._background)
+            for button in self.buttons:
+                if button.visible:
+                    x, y = self._position(button, now)
+                    width, height = button.size
+                    self._frame[y:y + height, x:x + width] = button.image
+            self.frames += 1
+        
+        left, top = self.origin
+        return self._frame, (left, top, left + self.width, top + self.height)
+    
+    def contains(self, x: int, y: int) -> bool:
+        """Check if a screen point lies in the simulated window"""
+        left, top = self.origin
+        return left <= x < left + self.width and top <= y < top + self.height
+    
+    def click(self, x: int, y: int) -> bool:
+        """
+        Press whatever button is at a window position now
+        
+        Args:
+            x: Window x coordinate
+            y: Window y coordinate
+            
+        Returns:
+            True if a button was hit
+        """
+        now = time.monotonic()
+        with self._lock:
+            # Later buttons are drawn on top
+            for button in reversed(self.buttons):
+                if not button.visible:
+                    continue
+                bx, by = self._position(button, now)
+                width, height = button.size
+                if bx <= x < bx + width and by <= y < by + height:
+                    button.clicked += 1
+                    button.reactions.append(now - button.since)
+                    self._hide(button, now)
+                    return True
+            self.misclicks += 1
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get scene metrics
+        
+        Returns:
+            Dictionary with frames, frame rate, buttons shown, clicked and expired,
+            misclicks and reaction time percentiles from appearing to being clicked
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            reactions = sorted(r for button in self.buttons for r in button.reactions)
+            shown = sum(button.shown for button in self.buttons)
+            clicked = sum(button.clicked for button in self.buttons)
+            expired = sum(button.expired for button in self.buttons)
+        n = len(reactions)
+        return {
+            'frames': self.frames,
+            'fps': self.frames / elapsed if elapsed > 0 else 0.0,
+            'shown': shown,
+            'clicked': clicked,
+            'expired': expired,
+            'misclicks': self.misclicks,
+            'reaction_p50_ms': reactions[n // 2] * 1000 if n else 0.0,
+            'reaction_p99_ms': reactions[min(n - 1, int(n * 0.99))] * 1000 if n else 0.0,
+        }
+
+
+class SimulatorInput(InputBackend):
+    """Input sink that delivers clicks to the simulated window under the cursor"""
+    
+    name = "simulator"
+    
+    def __init__(self, games: Sequence[GameSimulator], latency_window: int = 1024):
+        """
+        Initialize simulator input
+        
+        Args:
+            games: Simulated windows, at distinct origins
+            latency_window: Number of recent batch latencies kept for statistics
+        """
+        super().__init__(latency_window)
+        self.games = list(games)
+        self.position = (0, 0)
+        self.stray_clicks = 0
+        self._lock = threading.Lock()
+    
+    def _submit(self, events: Sequence[InputEvent]) -> bool:
+        with self._lock:
+            for event in events:
+                if event.kind == EventKind.MOVE:
+                    self.position = (event.x, event.y)
+                elif event.kind == EventKind.UP:
+                    # A click completes on release, at the cursor's position
+                    self._deliver(*self.position)
+        return True
+    
+    def _deliver(self, x: int, y: int):
+        for game in self.games:
+            if game.contains(x, y):
+                game.click(x - game.origin[0], y - game.origin[1])
+                return
+        self.stray_clicks += 1
+    
+    def get_position(self) -> Tuple[int, int]:
+        return self.position
+
+
+def spawn_games(plan: ProcessPlan,
+                count: int,
+                width: int = 1280,
+                height: int = 720,
+                **scene) -> List[GameSimulator]:
+    """
+    Create simulated windows tiled across a virtual screen
+    
+    Args:
+        plan: Compiled plan whose templates become buttons
+        count: Number of windows
+        width: Frame width
+        height: Frame height
+        **scene: speed, lifetime, respawn and seed passed to GameSimulator;
+                 each window gets its own seed
+                 
+    Returns:
+        List of GameSimulator
+    """
+    columns = max(1, int(math.ceil(math.sqrt(count))))
+    seed = scene.pop('seed', 0)
+    return [GameSimulator(plan, width, height, origin=((i % columns) * width, (i // columns) * height),
+                          seed=seed + i, **scene)
+            for i in range(count)]
+
+
+def run_load_test(config_path: str,
+                  plan: ProcessPlan,
+                  games: List[GameSimulator],
+                  mode: str = MODE_SINGLE,
+                  duration: float = 10.0,
+                  workers: int = 0) -> bool:
+    """
+    Drive simulated windows with the real runtimes for a while
+    
+    Args:
+        config_path: Configuration file the runtimes load
+        plan: Compiled plan of the simulated process
+        games: Simulated windows
+        mode: 'single' (one AutoClicker per window), 'multi' (one MultiAutoClicker
+              with matching threads) or 'processes' (MultiAutoClicker with a match pool)
+        duration: Seconds to run
+        workers: Matching threads or processes of the multi modes (0 = one per CPU)
+        
+    Returns:
+        True if the runtimes started
+    """
+    # Runtimes are imported here, so embedding the simulator does not set up their logging
+    from auto_clicker import AutoClicker
+    from multi_clicker import MultiAutoClicker
+    from window_index import WindowIndex
+    
+    sink = SimulatorInput(games)
+    if mode == MODE_SINGLE:
+        window_index = WindowIndex()
+        clickers = [AutoClicker(config_path, input_backend=sink, window_index=window_index, frame_source=game)
+                    for game in games]
+        started = [clicker for clicker in clickers if clicker.start(plan.process_name)]
+        if len(started) == len(clickers):
+            time.sleep(duration)
+        for clicker in started:
+            clicker.stop()
+        ok = len(started) == len(clickers)
+    else:
+        clicker = MultiAutoClicker(config_path, [plan.process_name], input_backend=sink, workers=workers,
+                                   match_processes=mode == MODE_PROCESSES,
+                                   frame_sources={plan.process_name: games})
+        ok = clicker.start()
+        if ok:
+            time.sleep(duration)
+            clicker.stop()
+    
+    if sink.stray_clicks:
+        logger.warning(f"{sink.stray_clicks} clicks landed outside every simulated window")
+    return ok
+
+
+def format_report(games: List[GameSimulator], duration: float) -> str:
+    """Format per-window and total scene metrics as a table"""
+    lines = [f"{'window':>6} {'frames':>7} {'fps':>7} {'shown':>6} {'clicked':>7} {'expired':>7} "
+             f"{'misclick':>8} {'p50 ms':>8} {'p99 ms':>8}"]
+    totals = {'frames': 0, 'shown': 0, 'clicked': 0, 'expired': 0, 'misclicks': 0}
+    for i, game in enumerate(games):
+        s = game.stats()
+        for key in totals:
+            totals[key] += s[key]
+        lines.append(f"{i + 1:>6} {s['frames']:>7} {s['fps']:>7.1f} {s['shown']:>6} {s['clicked']:>7} "
+                     f"{s['expired']:>7} {s['misclicks']:>8} {s['reaction_p50_ms']:>8.0f} "
+                     f"{s['reaction_p99_ms']:>8.0f}")
+    lines.append(f"{'total':>6} {totals['frames']:>7} {totals['frames'] / duration:>7.1f} {totals['shown']:>6} "
+                 f"{totals['clicked']:>7} {totals['expired']:>7} {totals['misclicks']:>8}")
+    lines.append(f"{totals['clicked'] / duration:.1f} buttons clicked per second, "
+                 f"{totals['clicked'] / max(totals['shown'], 1):.0%} of buttons shown")
+    return '\n'.join(lines)
+
+
+def main():
+    """Load-test the runtimes against simulated game windows"""
+    parser = argparse.ArgumentParser(description='Run the auto-clicker against simulated game windows')
+    parser.add_argument('-c', '--config', required=True, help='Configuration file (JSON or YAML)')
+    parser.add_argument('-p', '--process', required=True, help='Process name in the config')
+    parser.add_argument('--instances', '-n', type=int, default=1, help='Simulated windows (default: 1)')
+    parser.add_argument('--mode', choices=MODES, default=MODE_SINGLE,
+                        help='single: one AutoClicker per window; multi: one MultiAutoClicker; '
+                             'processes: MultiAutoClicker with a match pool (default: single)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Matching threads or processes of the multi modes (default: one per CPU)')
+    parser.add_argument('--duration', '-d', type=float, default=10.0, help='Seconds to run (default: 10)')
+    parser.add_argument('--size', default='1280x720', help='Window size WxH (default: 1280x720)')
+    parser.add_argument('--speed', type=float, default=30.0, help='Button speed in pixels/s (default: 30)')
+    parser.add_argument('--lifetime', type=float, default=5.0,
+                        help='Seconds an unclicked button stays (default: 5, 0 = until clicked)')
+    parser.add_argument('--respawn', type=float, default=1.0,
+                        help='Mean seconds before a button comes back (default: 1)')
+    parser.add_argument('--seed', type=int, default=0, help='Scene random seed (default: 0)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Keep the runtimes\' info logging')
+    args = parser.parse_args()
+    
+    # Configured before the runtimes are imported, whose own logging setup then stays out;
+    # per-match info lines would swamp the report with many windows
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(levelname)s - %(message)s')
+    
+    config = ConfigLoader.load(args.config)
+    if not config or not ConfigLoader.validate_config(config):
+        sys.exit(1)
+    process_config = ConfigLoader.get_process_config(config, args.process)
+    if not process_config:
+        sys.exit(1)
+    plan = ConfigLoader.compile_process(process_config, os.path.dirname(os.path.abspath(args.config)))
+    if plan is None:
+        sys.exit(1)
+    
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    games = spawn_games(plan, args.instances, width, height, speed=args.speed, lifetime=args.lifetime,
+                        respawn=args.respawn, seed=args.seed)
+    if not games[0].buttons:
+        logger.error("No task has icons that fit the simulated window")
+        sys.exit(1)
+    
+    print(f"{args.process}: {len(games)} simulated {args.size} windows, {len(games[0].buttons)} buttons each, "
+          f"mode {args.mode}, {args.duration:g}s")
+    started = time.monotonic()
+    if not run_load_test(args.config, plan, games, args.mode, args.duration, args.workers):
+        logger.error("Failed to start the runtime")
+        sys.exit(1)
+    print(format_report(games, time.monotonic() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,9 +5,14 @@ Template matching using OpenCV
 import cv2
 import numpy as np
 import logging
-from typing import Optional, Tuple, Dict
+import itertools
+import threading
+from typing import Optional, Tuple, Dict, List, Sequence, Set
 from dataclasses import dataclass
 
+from template_pack import TemplatePack
+from template_cache import TemplateCache, DEFAULT_CACHE_BYTES, VARIANT_COLOR, VARIANT_GRAY
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,20 +27,106 @@ class MatchResult:
     max_val: float = 0.0
     min_loc: Optional[Tuple[int, int]] = None
     max_loc: Optional[Tuple[int, int]] = None
+    scale: float = 1.0  # template scale the match was found at
+
+
+def scaled_variant(scale: float) -> str:
+    """Cache variant name of a grayscale template resized by scale"""
+    return f"{VARIANT_GRAY}@{scale:g}"
 
 
 class ImageMatcher:
     """Image matching using OpenCV template matching"""
     
-    def __init__(self, threshold: float = 0.8):
+    def __init__(self, threshold: float = 0.8, cache_bytes: int = DEFAULT_CACHE_BYTES):
         """
         Initialize image matcher
         
         Args:
             threshold: Matching confidence threshold (0.0-1.0)
+            cache_bytes: Byte budget for cached templates
         """
         self.threshold = threshold
-        self.template_cache: Dict[str, np.ndarray] = {}
+        self.template_cache = TemplateCache(max_bytes=cache_bytes)
+        self.template_packs: List[TemplatePack] = []
+        self._pack_overrides: Set[str] = set()  # replaced templates whose packed pixels are stale
+        self.feature_indexes: Dict[str, 'FeatureIndex'] = {}  # engine -> index
+        
+        # Per-thread grayscale frame and score map buffers, and the id of the frame held
+        self._local = threading.local()
+        self._frame_ids = itertools.count(1)
+    
+    def to_gray(self,
+                source: np.ndarray,
+                regions: Optional[Sequence[Tuple[int, int, int, int]]] = None) -> np.ndarray:
+        """
+        Convert a BGRA or BGR frame to grayscale in one pass
+        
+        The result is written into a buffer owned by the calling thread and
+        reused for its next frame, so no array is allocated per frame. Keep a
+        copy if the grayscale frame must outlive the next conversion.
+        
+        Args:
+            source: Frame (BGRA, BGR or already grayscale)
+            regions: Only convert these (x, y, width, height) regions, e.g. the
+                     captured ones; the rest of the result is stale (optional)
+                     
+        Returns:
+            Grayscale frame; a grayscale source is returned unchanged
+        """
+        if len(source.shape) == 2:
+            return source
+        
+        code = cv2.COLOR_BGRA2GRAY if source.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        gray = getattr(self._local, 'gray', None)
+        if gray is None or gray.shape != source.shape[:2]:
+            gray = self._local.gray = np.empty(source.shape[:2], dtype=np.uint8)
+        if regions:
+            for x, y, width, height in regions:
+                x, y = max(0, x), max(0, y)
+                region = source[y:y + height, x:x + width]
+                if region.size:
+                    cv2.cvtColor(region, code, dst=gray[y:y + height, x:x + width])
+        else:
+            cv2.cvtColor(source, code, dst=gray)
+        self._local.frame_id = next(self._frame_ids)
+        return gray
+    
+    def _score_buffer(self, rows: int, cols: int) -> np.ndarray:
+        """Get a rows x cols float32 view of the calling thread's score map buffer"""
+        scores = getattr(self._local, 'scores', None)
+        if scores is None or scores.size < rows * cols:
+            scores = self._local.scores = np.empty(rows * cols, dtype=np.float32)
+        return scores[:rows * cols].reshape(rows, cols)
+    
+    def frame_id(self, gray: np.ndarray) -> Optional[int]:
+        """
+        Identify the frame held by the calling thread's grayscale buffer
+        
+        Args:
+            gray: Grayscale frame
+            
+        Returns:
+            Id unique to the conversion that produced gray, or None if gray is
+            not the calling thread's buffer
+        """
+        if gray is not getattr(self._local, 'gray', None):
+            return None
+        return self._local.frame_id
+    
+    def attach_pack(self, pack: TemplatePack):
+        """
+        Serve templates from a memory-mapped pack before decoding image files
+        
+        Args:
+            pack: TemplatePack instance
+        """
+        self.template_packs.append(pack)
+        logger.info(f"Attached template pack: {pack.pack_path}")
+    
+    def _packs_for(self, template_path: str) -> List[TemplatePack]:
+        """Packs that may serve a template; none once it was replaced, so evictions reload the file"""
+        return [] if template_path in self._pack_overrides else self.template_packs
     
     def load_template(self, template_path: str, use_cache: bool = True) -> Optional[np.ndarray]:
         """
@@ -43,14 +134,25 @@ class ImageMatcher:
         
         Args:
             template_path: Path to template image
-            use_cache: Whether to cache loaded templates
+            use_cache: Whether to use the cache and attached packs; when False the
+                       image file is always decoded
             
         Returns:
-            Template image as numpy array or None if failed
+            Template image as numpy array (grayscale when served from a pack)
+            or None if failed
         """
-        if use_cache and template_path in self.template_cache:
-            logger.debug(f"Using cached template: {template_path}")
-            return self.template_cache[template_path]
+        if use_cache:
+            template = self.template_cache.get(template_path, VARIANT_COLOR)
+            if template is not None:
+                logger.debug(f"Using cached template: {template_path}")
+                return template
+            
+            for pack in self._packs_for(template_path):
+                template = pack.get(template_path)
+                if template is not None:
+                    self.template_cache.put(template_path, template, VARIANT_GRAY)
+                    logger.debug(f"Template mapped from pack: {template_path}")
+                    return template
         
         try:
             template = cv2.imread(template_path, cv2.IMREAD_COLOR)
@@ -59,7 +161,7 @@ class ImageMatcher:
                 return None
             
             if use_cache:
-                self.template_cache[template_path] = template
+                self.template_cache.put(template_path, template, VARIANT_COLOR)
                 logger.debug(f"Template cached: {template_path}")
             
             return template
@@ -67,10 +169,214 @@ class ImageMatcher:
             logger.error(f"Error loading template {template_path}: {e}")
             return None
     
+    def load_template_gray(self, template_path: str, scale: float = 1.0) -> Optional[np.ndarray]:
+        """
+        Load the grayscale variant of a template, caching the conversion
+        
+        Args:
+            template_path: Path to template image
+            scale: Resize factor; scaled variants are cached separately
+            
+        Returns:
+            Grayscale template or None if failed
+        """
+        if scale != 1.0:
+            variant = scaled_variant(scale)
+            template = self.template_cache.get(template_path, variant)
+            if template is not None:
+                return template
+            
+            base = self.load_template_gray(template_path)
+            if base is None:
+                return None
+            
+            height, width = base.shape[:2]
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            # Area averaging avoids aliasing when shrinking
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            template = cv2.resize(base, size, interpolation=interpolation)
+            self.template_cache.put(template_path, template, variant)
+            return template
+        
+        template = self.template_cache.get(template_path, VARIANT_GRAY)
+        if template is not None:
+            return template
+        
+        for pack in self._packs_for(template_path):
+            template = pack.get(template_path)
+            if template is not None:
+                self.template_cache.put(template_path, template, VARIANT_GRAY)
+                return template
+        
+        # Only the grayscale variant is kept for matching
+        template = self.load_template(template_path, use_cache=False)
+        if template is None:
+            return None
+        
+        template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        self.template_cache.put(template_path, template, VARIANT_GRAY)
+        return template
+    
+    def precompute_scales(self, template_paths: Sequence[str], scales: Sequence[float]) -> int:
+        """
+        Build every scaled variant of the given templates ahead of matching
+        
+        Args:
+            template_paths: Template paths
+            scales: Resize factors
+            
+        Returns:
+            Number of variants built
+        """
+        built = 0
+        for template_path in template_paths:
+            for scale in scales:
+                if self.load_template_gray(template_path, scale) is not None:
+                    built += 1
+        return built
+    
+    def detect_scale(self,
+                     source: np.ndarray,
+                     anchor_path: str,
+                     scales: Sequence[float],
+                     threshold: Optional[float] = None) -> MatchResult:
+        """
+        Find the scale at which an anchor template matches best
+        
+        Args:
+            source: Source image (screenshot)
+            anchor_path: Path to the anchor template
+            scales: Resize factors to try
+            threshold: Confidence threshold (default: matcher threshold)
+            
+        Returns:
+            Best MatchResult over all scales; its scale field holds the winner
+        """
+        source = self.to_gray(source)
+        source_h, source_w = source.shape[:2]
+        
+        best = MatchResult(matched=False, confidence=0.0)
+        for scale in scales:
+            template = self.load_template_gray(anchor_path, scale)
+            if template is None:
+                return best
+            if template.shape[0] > source_h or template.shape[1] > source_w:
+                continue
+            
+            result = self.match_template(source, template, threshold=threshold)
+            if result.confidence > best.confidence:
+                result.scale = scale
+                best = result
+        return best
+    
+    def replace_template(self, template_path: str, template: np.ndarray):
+        """
+        Replace every cached variant of a template with a freshly loaded image
+        
+        Args:
+            template_path: Path to template image
+            template: New template image (BGR or grayscale)
+        """
+        if len(template.shape) == 3:
+            template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        self.template_cache.invalidate(template_path)
+        self.template_cache.put(template_path, template, VARIANT_GRAY)
+        if self.template_packs:
+            self._pack_overrides.add(template_path)
+        for index in self.feature_indexes.values():
+            if template_path in index:
+                index.add(template_path, template)
+    
+    def index_features(self, template_paths: Sequence[str], engine: str) -> int:
+        """
+        Extract keypoints of templates into the index of a feature engine
+        
+        Args:
+            template_paths: Template paths
+            engine: Feature engine ('orb' or 'akaze')
+            
+        Returns:
+            Number of templates indexed with enough keypoints to match
+        """
+        # Imported here: feature_matcher builds on this module's MatchResult
+        from feature_matcher import FeatureIndex
+        
+        index = self.feature_indexes.get(engine)
+        if index is None:
+            try:
+                index = self.feature_indexes[engine] = FeatureIndex(engine)
+            except ValueError as e:
+                logger.error(f"Cannot index templates: {e}")
+                return 0
+        
+        indexed = 0
+        for template_path in template_paths:
+            template = self.load_template_gray(template_path)
+            if template is not None and index.add(template_path, template):
+                indexed += 1
+        return indexed
+    
+    def match_features(self, source: np.ndarray, template_path: str, engine: str) -> MatchResult:
+        """
+        Find a template with a feature engine, indexing it on first use
+        
+        Args:
+            source: Source image (screenshot)
+            template_path: Path to template image
+            engine: Feature engine ('orb' or 'akaze')
+            
+        Returns:
+            MatchResult object
+        """
+        index = self.feature_indexes.get(engine)
+        if index is None or template_path not in index:
+            self.index_features([template_path], engine)
+            index = self.feature_indexes.get(engine)
+            if index is None:
+                return MatchResult(matched=False, confidence=0.0)
+        gray = self.to_gray(source)
+        return index.match(gray, template_path, self.frame_id(gray))
+    
+    def match_exact(self,
+                    source: np.ndarray,
+                    template_path: str,
+                    tolerance: int = 0,
+                    scale: float = 1.0) -> MatchResult:
+        """
+        Find a template pixel for pixel instead of by correlation
+        
+        Args:
+            source: Source image (screenshot)
+            template_path: Path to template image
+            tolerance: Largest per-pixel gray level difference still accepted (0 = identical)
+            scale: Template resize factor
+            
+        Returns:
+            MatchResult object
+        """
+        # Imported here: exact_matcher builds on this module's MatchResult
+        from exact_matcher import match_exact, select_sentinels, sentinel_variant
+        
+        template = self.load_template_gray(template_path, scale)
+        if template is None:
+            return MatchResult(matched=False, confidence=0.0)
+        
+        # Sentinels live next to the template, so replacing it drops them too
+        variant = sentinel_variant(scale)
+        sentinels = self.template_cache.get(template_path, variant)
+        if sentinels is None:
+            sentinels = select_sentinels(template)
+            self.template_cache.put(template_path, sentinels, variant)
+        
+        result = match_exact(self.to_gray(source), template, sentinels, tolerance)
+        result.scale = scale
+        return result
+    
     def match_template(self, 
                       source: np.ndarray, 
                       template: np.ndarray,
-                      method: int = cv2.TM_CCOEFF_NORMED) -> MatchResult:
+                      method: int = cv2.TM_CCOEFF_NORMED,
+                      threshold: Optional[float] = None) -> MatchResult:
         """
         Perform template matching
         
@@ -78,24 +384,28 @@ class ImageMatcher:
             source: Source image (screenshot)
             template: Template image to find
             method: OpenCV matching method
+            threshold: Confidence threshold (default: matcher threshold)
             
         Returns:
             MatchResult object
         """
         try:
             # Convert to grayscale for faster matching
-            if len(source.shape) == 3:
-                source_gray = cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
-            else:
-                source_gray = source
+            source_gray = self.to_gray(source)
             
             if len(template.shape) == 3:
                 template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
             else:
                 template_gray = template
             
-            # Perform template matching
-            result = cv2.matchTemplate(source_gray, template_gray, method)
+            # Perform template matching into the reused score map
+            rows = source_gray.shape[0] - template_gray.shape[0] + 1
+            cols = source_gray.shape[1] - template_gray.shape[1] + 1
+            if rows <= 0 or cols <= 0:
+                logger.debug(f"Template {template_gray.shape} larger than source {source_gray.shape}")
+                return MatchResult(matched=False, confidence=0.0)
+            result = cv2.matchTemplate(source_gray, template_gray, method,
+                                       result=self._score_buffer(rows, cols))
             
             # Find best match location
             min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
@@ -109,7 +419,7 @@ class ImageMatcher:
                 confidence = max_val
                 location = max_loc
             
-            matched = confidence >= self.threshold
+            matched = confidence >= (self.threshold if threshold is None else threshold)
             
             template_h, template_w = template_gray.shape
             
@@ -134,7 +444,9 @@ class ImageMatcher:
     def match_template_from_file(self,
                                 source: np.ndarray,
                                 template_path: str,
-                                method: int = cv2.TM_CCOEFF_NORMED) -> MatchResult:
+                                method: int = cv2.TM_CCOEFF_NORMED,
+                                threshold: Optional[float] = None,
+                                scale: float = 1.0) -> MatchResult:
         """
         Perform template matching with template loaded from file
         
@@ -142,15 +454,19 @@ class ImageMatcher:
             source: Source image (screenshot)
             template_path: Path to template image
             method: OpenCV matching method
+            threshold: Confidence threshold (default: matcher threshold)
+            scale: Template resize factor
             
         Returns:
             MatchResult object
         """
-        template = self.load_template(template_path)
+        template = self.load_template_gray(template_path, scale)
         if template is None:
             return MatchResult(matched=False, confidence=0.0)
         
-        return self.match_template(source, template, method)
+        result = self.match_template(source, template, method, threshold)
+        result.scale = scale
+        return result
     
     def match_multiple(self,
                       source: np.ndarray,
@@ -205,3 +521,7 @@ class ImageMatcher:
         """Clear template cache"""
         self.template_cache.clear()
         logger.info("Template cache cleared")
+    
+    def cache_stats(self) -> Dict[str, float]:
+        """Get template cache hit/miss/eviction statistics"""
+        return self.template_cache.stats()
@@ -0,0 +1,346 @@
+"""
+Input Backend Module
+Submit batches of mouse events (SendInput on Windows, XTest on X11, recording fake)
+"""
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import logging
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EventKind(IntEnum):
+    """Primitive input operations"""
+    MOVE = 1
+    DOWN = 2
+    UP = 3
+
+
+@dataclass(frozen=True)
+class InputEvent:
+    """Single mouse event; x and y are absolute screen coordinates"""
+    kind: EventKind
+    x: int = 0
+    y: int = 0
+    button: str = "left"
+
+
+BUTTONS = ("left", "right", "middle")
+
+
+class InputBackend:
+    """Base class: submits whole event sequences and records per-batch latency"""
+    
+    name = "base"
+    
+    def __init__(self, latency_window: int = 1024):
+        """
+        Initialize backend
+        
+        Args:
+            latency_window: Number of recent batch latencies kept for statistics
+        """
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+    
+    def submit(self, events: Sequence[InputEvent]) -> bool:
+        """
+        Submit a sequence of events as one batch
+        
+        Args:
+            events: Events in order
+            
+        Returns:
+            True if successful
+        """
+        if not events:
+            return True
+            
+        for event in events:
+            if event.kind != EventKind.MOVE and event.button not in BUTTONS:
+                logger.error(f"Unknown button: {event.button}")
+                return False
+                
+        start = time.perf_counter()
+        try:
+            ok = self._submit(events)
+        except Exception as e:
+            logger.error(f"{self.name} input submission failed: {e}")
+            ok = False
+        self.latencies.append(time.perf_counter() - start)
+        return ok
+    
+    def _submit(self, events: Sequence[InputEvent]) -> bool:
+        raise NotImplementedError
+    
+    def get_position(self) -> Tuple[int, int]:
+        """Get current cursor position"""
+        raise NotImplementedError
+    
+    def latency_stats(self) -> Dict[str, float]:
+        """
+        Get submission latency statistics over the recent window
+        
+        Returns:
+            Dictionary with count and mean/p50/p99/max in milliseconds
+        """
+        samples = sorted(self.latencies)
+        if not samples:
+            return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        n = len(samples)
+        return {
+            'count': n,
+            'mean_ms': sum(samples) / n * 1000,
+            'p50_ms': samples[n // 2] * 1000,
+            'p99_ms': samples[min(n - 1, int(n * 0.99))] * 1000,
+            'max_ms': samples[-1] * 1000,
+        }
+    
+    def close(self):
+        """Release backend resources"""
+
+
+class RecordingInputBackend(InputBackend):
+    """Fake backend that records batches instead of moving the real cursor"""
+    
+    name = "recording"
+    
+    def __init__(self, latency_window: int = 1024):
+        super().__init__(latency_window)
+        self.batches: List[Tuple[float, Tuple[InputEvent, ...]]] = []
+        self.position = (0, 0)
+    
+    def _submit(self, events: Sequence[InputEvent]) -> bool:
+        self.batches.append((time.monotonic(), tuple(events)))
+        for event in events:
+            if event.kind == EventKind.MOVE:
+                self.position = (event.x, event.y)
+        return True
+    
+    @property
+    def events(self) -> List[InputEvent]:
+        """All recorded events in submission order"""
+        return [event for _, batch in self.batches for event in batch]
+    
+    def get_position(self) -> Tuple[int, int]:
+        return self.position
+
+
+# --- Win32 SendInput -------------------------------------------------------
+
+INPUT_MOUSE = 0
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_LEFTDOWN = 0x0002
+MOUSEEVENTF_LEFTUP = 0x0004
+MOUSEEVENTF_RIGHTDOWN = 0x0008
+MOUSEEVENTF_RIGHTUP = 0x0010
+MOUSEEVENTF_MIDDLEDOWN = 0x0020
+MOUSEEVENTF_MIDDLEUP = 0x0040
+MOUSEEVENTF_VIRTUALDESK = 0x4000
+MOUSEEVENTF_ABSOLUTE = 0x8000
+SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 76, 77, 78, 79
+
+_WIN32_BUTTON_FLAGS = {
+    "left": (MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+    "right": (MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP),
+    "middle": (MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP),
+}
+
+
+class _MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", ctypes.c_long),
+                ("dy", ctypes.c_long),
+                ("mouseData", ctypes.c_ulong),
+                ("dwFlags", ctypes.c_ulong),
+                ("time", ctypes.c_ulong),
+                ("dwExtraInfo", ctypes.c_void_p)]
+
+
+class _INPUTUNION(ctypes.Union):
+    # KEYBDINPUT/HARDWAREINPUT are never sent, but the union must be full size
+    _fields_ = [("mi", _MOUSEINPUT), ("_pad", ctypes.c_byte * 32)]
+
+
+class _INPUT(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_ulong), ("u", _INPUTUNION)]
+
+
+class Win32InputBackend(InputBackend):
+    """SendInput with one INPUT array per batch"""
+    
+    name = "win32"
+    
+    def __init__(self, latency_window: int = 1024):
+        super().__init__(latency_window)
+        self.user32 = ctypes.windll.user32
+    
+    def _to_absolute(self, x: int, y: int) -> Tuple[int, int]:
+        """Map screen pixels to the 0..65535 virtual desktop range"""
+        left = self.user32.GetSystemMetrics(SM_XVIRTUALSCREEN)
+        top = self.user32.GetSystemMetrics(SM_YVIRTUALSCREEN)
+        width = max(1, self.user32.GetSystemMetrics(SM_CXVIRTUALSCREEN) - 1)
+        height = max(1, self.user32.GetSystemMetrics(SM_CYVIRTUALSCREEN) - 1)
+        return ((x - left) * 65535 // width, (y - top) * 65535 // height)
+    
+    def _submit(self, events: Sequence[InputEvent]) -> bool:
+        inputs = (_INPUT * len(events))()
+        for i, event in enumerate(events):
+            mi = inputs[i].u.mi
+            inputs[i].type = INPUT_MOUSE
+            if event.kind == EventKind.MOVE:
+                mi.dx, mi.dy = self._to_absolute(event.x, event.y)
+                mi.dwFlags = MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK
+            else:
+                down, up = _WIN32_BUTTON_FLAGS[event.button]
+                mi.dwFlags = down if event.kind == EventKind.DOWN else up
+                
+        sent = self.user32.SendInput(len(events), inputs, ctypes.sizeof(_INPUT))
+        if sent != len(events):
+            logger.error(f"SendInput injected {sent}/{len(events)} events")
+            return False
+        return True
+    
+    def get_position(self) -> Tuple[int, int]:
+        class POINT(ctypes.Structure):
+            _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+        point = POINT()
+        self.user32.GetCursorPos(ctypes.byref(point))
+        return (point.x, point.y)
+
+
+# --- X11 XTest -------------------------------------------------------------
+
+_XTEST_BUTTONS = {"left": 1, "middle": 2, "right": 3}
+
+
+class XTestInputBackend(InputBackend):
+    """XTest fake events, flushed to the X server once per batch"""
+    
+    name = "xtest"
+    
+    def __init__(self, display: Optional[str] = None, latency_window: int = 1024):
+        """
+        Open the X display
+        
+        Args:
+            display: Display name (default: $DISPLAY)
+            latency_window: Number of recent batch latencies kept for statistics
+            
+        Raises:
+            OSError: If libX11/libXtst or the display are unavailable
+        """
+        super().__init__(latency_window)
+        x11_path = ctypes.util.find_library('X11')
+        xtst_path = ctypes.util.find_library('Xtst')
+        if not x11_path or not xtst_path:
+            raise OSError("libX11 and libXtst are required for the XTest backend")
+            
+        self.xlib = ctypes.CDLL(x11_path)
+        self.xtst = ctypes.CDLL(xtst_path)
+        self.xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self.xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.xlib.XFlush.argtypes = [ctypes.c_void_p]
+        self.xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xtst.XTestFakeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                                   ctypes.c_int, ctypes.c_ulong]
+        self.xtst.XTestFakeButtonEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                                   ctypes.c_ulong]
+                                                   
+        # The executor and task threads may both submit input
+        self.xlib.XInitThreads()
+        name = (display or os.environ.get('DISPLAY', '')).encode() or None
+        self.display = self.xlib.XOpenDisplay(name)
+        if not self.display:
+            raise OSError(f"Cannot open X display {display or os.environ.get('DISPLAY')!r}")
+    
+    def _submit(self, events: Sequence[InputEvent]) -> bool:
+        for event in events:
+            if event.kind == EventKind.MOVE:
+                self.xtst.XTestFakeMotionEvent(self.display, -1, event.x, event.y, 0)
+            else:
+                self.xtst.XTestFakeButtonEvent(self.display, _XTEST_BUTTONS[event.button],
+                                               1 if event.kind == EventKind.DOWN else 0, 0)
+        self.xlib.XFlush(self.display)
+        return True
+    
+    def get_position(self) -> Tuple[int, int]:
+        root = ctypes.c_ulong()
+        child = ctypes.c_ulong()
+        root_x, root_y, win_x, win_y = (ctypes.c_int() for _ in range(4))
+        mask = ctypes.c_uint()
+        self.xlib.XQueryPointer(ctypes.c_void_p(self.display),
+                                ctypes.c_ulong(self.xlib.XDefaultRootWindow(self.display)),
+                                ctypes.byref(root), ctypes.byref(child),
+                                ctypes.byref(root_x), ctypes.byref(root_y),
+                                ctypes.byref(win_x), ctypes.byref(win_y), ctypes.byref(mask))
+        return (root_x.value, root_y.value)
+    
+    def close(self):
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+INPUT_BACKENDS = ('auto', 'win32', 'xtest', 'recording')
+
+
+def create_input_backend(name: str = 'auto') -> InputBackend:
+    """
+    Create an input backend by name
+    
+    Args:
+        name: 'auto', 'win32', 'xtest' or 'recording'; 'auto' picks win32 on
+              Windows and xtest elsewhere
+              
+    Returns:
+        InputBackend instance
+        
+    Raises:
+        ValueError: If the name is unknown
+        OSError: If the platform libraries are unavailable
+    """
+    if name == 'auto':
+        name = 'win32' if sys.platform == 'win32' else 'xtest'
+        
+    if name == 'win32':
+        return Win32InputBackend()
+    if name == 'xtest':
+        return XTestInputBackend()
+    if name == 'recording':
+        return RecordingInputBackend()
+    raise ValueError(f"Unknown input backend: {name}")
+
+
+def main():
+    """Measure per-batch input latency, e.g. under xvfb-run"""
+    import argparse
+    
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description='Measure input backend latency')
+    parser.add_argument('--backend', choices=INPUT_BACKENDS, default='auto')
+    parser.add_argument('--count', '-n', type=int, default=200, help='Number of click batches')
+    args = parser.parse_args()
+    
+    backend = create_input_backend(args.backend)
+    try:
+        for i in range(args.count):
+            x, y = 100 + i % 50, 100 + i % 30
+            backend.submit([InputEvent(EventKind.MOVE, x, y),
+                            InputEvent(EventKind.DOWN, x, y),
+                            InputEvent(EventKind.UP, x, y)])
+        print(f"{backend.name}: {backend.latency_stats()}")
+    finally:
+        backend.close()
+
+
+if __name__ == '__main__':
+    main()
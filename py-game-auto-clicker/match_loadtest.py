@@ -0,0 +1,127 @@
+"""
+Match Service Load Test
+Drive a MatchService with concurrent clients and report throughput and latency
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from typing import List
+
+import cv2
+import numpy as np
+
+from match_service import MatchClient, MatchService, DEFAULT_ADDRESS
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_clients(address: str,
+                template_set: str,
+                frame: np.ndarray,
+                clients: int,
+                requests: int,
+                use_shared_memory: bool,
+                binary: bool) -> List[float]:
+    """
+    Send requests from concurrent clients
+    
+    Returns:
+        Latencies in seconds
+    """
+    latencies: List[float] = []
+    lock = threading.Lock()
+    errors = []
+    
+    def client_loop():
+        client = MatchClient(address)
+        local = []
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.match(frame, template_set, binary=binary, use_shared_memory=use_shared_memory)
+                local.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            client.close()
+        with lock:
+            latencies.extend(local)
+            
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        logger.error(f"{len(errors)} clients failed, first error: {errors[0]}")
+    return latencies
+
+
+def main():
+    """Run the load test"""
+    parser = argparse.ArgumentParser(description='Match service load test')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS,
+                        help='Service address; a local service is started unless --external is given')
+    parser.add_argument('--external', action='store_true', help='Use an already running service')
+    parser.add_argument('--set', default='loadtest', help='Template set ID (default: loadtest)')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16],
+                        help='Concurrent client counts (default: 1 4 16)')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per client (default: 50)')
+    parser.add_argument('--size', default='1280x720', help='Frame size WxH (default: 1280x720)')
+    parser.add_argument('--templates', type=int, default=8,
+                        help='Templates in the generated set (default: 8)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    
+    rng = np.random.default_rng(0)
+    frame = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (5, 5), 0)
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        service = None
+        if not args.external:
+            for i in range(args.templates):
+                x = int(rng.integers(0, width - 48))
+                y = int(rng.integers(0, height - 48))
+                cv2.imwrite(os.path.join(workdir, f"t{i}.png"), frame[y:y + 48, x:x + 48])
+            service = MatchService(args.address)
+            service.add_directory(args.set, workdir)
+            service.start()
+            
+        try:
+            print(f"{args.size} frames, set '{args.set}', {args.requests} requests per client")
+            print(f"{'mode':<14} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+            for use_shared_memory in (False, True):
+                mode = 'shared memory' if use_shared_memory else 'raw buffer'
+                for clients in args.clients:
+                    start = time.perf_counter()
+                    latencies = run_clients(args.address, args.set, frame, clients, args.requests,
+                                            use_shared_memory, binary=True)
+                    elapsed = time.perf_counter() - start
+                    print(f"{mode:<14} {clients:>7} {len(latencies) / elapsed:>8.1f} "
+                          f"{percentile(latencies, 0.5) * 1000:>8.2f} "
+                          f"{percentile(latencies, 0.99) * 1000:>8.2f}")
+            if service:
+                client = MatchClient(args.address)
+                stats = client.stats()
+                client.close()
+                print(f"Mean batch size: {stats['requests'] / max(stats['batches'], 1):.2f}")
+        finally:
+            if service:
+                service.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Match Pool Module
+Template matching in worker processes with frames passed through shared memory
+"""
+import os
+import queue
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from image_matcher import ImageMatcher, MatchResult
+from task_matcher import match_task
+from task_plan import CompiledTask, ProcessPlan
+from template_cache import DEFAULT_CACHE_BYTES
+from template_pack import TemplatePack
+
+logger = logging.getLogger(__name__)
+
+# Large enough for a 1920x1080 BGRA frame; the ring grows when a larger window shows up
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 4
+
+# Extra slot capacity allocated on growth, so a window being resized does not regrow every frame
+SLOT_HEADROOM = 0.25
+
+# (confidence, x, y, width, height) of the triggering match
+CompactMatch = Tuple[float, int, int, int, int]
+
+# Per-worker state set up by _init_worker
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(plans: List[ProcessPlan],
+                 cache_bytes: int,
+                 pack_dirs: List[str]):
+    """Preload every template once per worker"""
+    # Parallelism comes from the pool; OpenCV's own threads would oversubscribe cores
+    cv2.setNumThreads(1)
+    
+    matcher = ImageMatcher(cache_bytes=cache_bytes)
+    for resource_dir in pack_dirs:
+        pack = TemplatePack.load_or_build(resource_dir)
+        if pack:
+            matcher.attach_pack(pack)
+            
+    tasks = {}
+    for plan in plans:
+        for task in plan.tasks:
+            tasks[(plan.process_name, task.index)] = (task, plan.match_value)
+        for template_path in plan.template_paths():
+            matcher.load_template_gray(template_path)
+        for engine, paths in plan.feature_templates().items():
+            matcher.index_features(paths, engine)
+        if plan.multi_scale is not None:
+            matcher.precompute_scales(plan.template_paths(), plan.multi_scale.scales)
+            
+    _worker['matcher'] = matcher
+    _worker['tasks'] = tasks
+    _worker['ring'] = None
+
+
+def _attach_ring(name: str) -> shared_memory.SharedMemory:
+    """Map the frame ring a job refers to, dropping the mapping of a ring that was replaced"""
+    ring: Optional[shared_memory.SharedMemory] = _worker['ring']
+    if ring is None or ring.name != name:
+        if ring is not None:
+            ring.close()
+        ring = shared_memory.SharedMemory(name=name)
+        _worker['ring'] = ring
+    return ring
+
+
+def _match_job(ring_name: str,
+               slot_bytes: int,
+               slot: int,
+               shape: Tuple[int, ...],
+               process_name: str,
+               task_index: int,
+               scale: float) -> Optional[CompactMatch]:
+    """Match one task against the frame in a ring slot; runs in a worker"""
+    ring = _attach_ring(ring_name)
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=ring.buf, offset=slot * slot_bytes)
+    task, threshold = _worker['tasks'][(process_name, task_index)]
+    
+    result = match_task(_worker['matcher'], frame, task, threshold=threshold, scale=scale)
+    if result is None or result.location is None:
+        return None
+    width, height = result.template_size or (0, 0)
+    return (float(result.confidence), int(result.location[0]), int(result.location[1]),
+            int(width), int(height))
+
+
+def expand_match(compact: Optional[CompactMatch], scale: float = 1.0) -> Optional[MatchResult]:
+    """
+    Turn a worker's compact result back into a MatchResult
+    
+    Args:
+        compact: Result tuple returned by a worker
+        scale: Template resize factor the job was submitted with
+        
+    Returns:
+        MatchResult or None if the task did not trigger
+    """
+    if compact is None:
+        return None
+    confidence, x, y, width, height = compact
+    return MatchResult(matched=True, confidence=confidence, location=(x, y),
+                       template_size=(width, height), scale=scale)
+
+
+class SharedFrameRing:
+    """Fixed-size frame slots in one shared memory block"""
+    
+    def __init__(self, slots: int, slot_bytes: int = DEFAULT_SLOT_BYTES):
+        """
+        Allocate the ring
+        
+        Args:
+            slots: Number of frames that can be in flight at once
+            slot_bytes: Capacity of one slot
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free: 'queue.Queue[int]' = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._lock = threading.Lock()
+        self._retired = False
+        self._closed = False
+    
+    @property
+    def name(self) -> str:
+        return self.shm.name
+    
+    def write(self, frame: np.ndarray, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Copy a frame into a free slot, waiting for one if all are in flight
+        
+        Args:
+            frame: uint8 image
+            timeout: Seconds to wait for a free slot (default: forever)
+            
+        Returns:
+            Slot index or None if the frame does not fit or no slot freed up
+        """
+        if frame.dtype != np.uint8 or frame.nbytes > self.slot_bytes:
+            logger.error(f"Frame {frame.shape} {frame.dtype} does not fit a {self.slot_bytes} byte slot")
+            return None
+            
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            if self._closed:
+                return None
+                
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf,
+                          offset=slot * self.slot_bytes)
+        np.copyto(view, frame)
+        return slot
+    
+    def release(self, slot: int):
+        """Return a slot once its worker is done with it"""
+        self._free.put(slot)
+        if self._retired:
+            self._close_if_idle()
+    
+    def retire(self):
+        """Free the block as soon as every slot in flight has been released"""
+        self._retired = True
+        self._close_if_idle()
+    
+    def _close_if_idle(self):
+        with self._lock:
+            if not self._closed and self._free.qsize() == self.slots:
+                self._closed = True
+                self.shm.close()
+                self.shm.unlink()
+    
+    def close(self):
+        """Free the shared memory block"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.shm.close()
+        self.shm.unlink()
+
+
+class MatchPool:
+    """
+    Process pool that evaluates compiled tasks against shared-memory frames
+    
+    Each worker decodes the template bank once at startup. Per request only
+    a slot index, frame shape and task key are sent, and a five-number
+    tuple comes back. A frame larger than the slots replaces the ring with
+    a larger one; the old ring is freed once its frames are matched.
+    """
+    
+    def __init__(self,
+                 plans: Iterable[ProcessPlan],
+                 workers: int = 0,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES,
+                 pack_dirs: Iterable[str] = (),
+                 slots: int = 0,
+                 slot_bytes: int = DEFAULT_SLOT_BYTES):
+        """
+        Initialize match pool
+        
+        Args:
+            plans: Plans whose tasks workers can evaluate
+            workers: Worker processes (0 = one per CPU)
+            cache_bytes: Template cache budget of each worker
+            pack_dirs: Resource directories to load from template packs
+            slots: Frames in flight (0 = two per worker)
+            slot_bytes: Initial capacity of one frame slot
+        """
+        self.plans = list(plans)
+        self.workers = workers or os.cpu_count() or 4
+        self.cache_bytes = cache_bytes
+        self.pack_dirs = list(pack_dirs)
+        self.slots = slots or 2 * self.workers
+        self.slot_bytes = slot_bytes
+        
+        self.ring: Optional[SharedFrameRing] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._ring_lock = threading.Lock()
+    
+    def start(self):
+        """Allocate the frame ring and start worker processes"""
+        self.ring = SharedFrameRing(self.slots, self.slot_bytes)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.plans, self.cache_bytes, self.pack_dirs))
+            
+        # Start every worker now so template preloading is not paid by the first frames
+        warmups = [self.executor.submit(os.getpid) for _ in range(self.workers)]
+        for future in warmups:
+            future.result()
+            
+        logger.info(f"Match pool started: {self.workers} workers, {self.slots} frame slots "
+                    f"of {self.slot_bytes / (1024 * 1024):.1f} MB")
+    
+    def submit(self,
+               frame: np.ndarray,
+               plan: ProcessPlan,
+               task: CompiledTask,
+               scale: float = 1.0) -> Optional[Future]:
+        """
+        Queue a task evaluation against a frame
+        
+        Args:
+            frame: Screenshot; copied into the ring, so it may be reused afterwards
+            plan: Plan the task belongs to
+            task: Compiled task
+            scale: Template resize factor of the frame's window
+            
+        Returns:
+            Future of a CompactMatch (see expand_match) or None if the frame was rejected
+        """
+        with self._ring_lock:
+            if frame.nbytes > self.ring.slot_bytes:
+                self._grow_ring(frame.nbytes)
+            ring = self.ring
+            
+        slot = ring.write(frame)
+        if slot is None:
+            return None
+            
+        try:
+            future = self.executor.submit(_match_job, ring.name, ring.slot_bytes, slot,
+                                          frame.shape, plan.process_name, task.index, scale)
+        except RuntimeError:
+            ring.release(slot)
+            raise
+        future.add_done_callback(lambda _: ring.release(slot))
+        return future
+    
+    def _grow_ring(self, frame_bytes: int):
+        """Replace the ring with one whose slots hold frame_bytes; caller holds the ring lock"""
+        self.slot_bytes = int(frame_bytes * (1 + SLOT_HEADROOM))
+        old = self.ring
+        self.ring = SharedFrameRing(self.slots, self.slot_bytes)
+        old.retire()
+        logger.info(f"Frame of {frame_bytes / (1024 * 1024):.1f} MB exceeds the frame slots, "
+                    f"ring grown to {self.slots} slots of {self.slot_bytes / (1024 * 1024):.1f} MB")
+    
+    def match(self,
+              frame: np.ndarray,
+              plan: ProcessPlan,
+              task: CompiledTask,
+              scale: float = 1.0) -> Optional[MatchResult]:
+        """
+        Evaluate a task in a worker and wait for the result
+        
+        Args:
+            frame: Screenshot
+            plan: Plan the task belongs to
+            task: Compiled task
+            scale: Template resize factor of the frame's window
+            
+        Returns:
+            MatchResult used as position reference, or None if the task does not trigger
+        """
+        future = self.submit(frame, plan, task, scale)
+        if future is None:
+            return None
+        try:
+            return expand_match(future.result(), scale)
+        except Exception as e:
+            logger.error(f"Match worker failed: {e}")
+            return None
+    
+    def close(self):
+        """Stop workers and free the frame ring"""
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
@@ -0,0 +1,638 @@
+"""
+Match Service Module
+Local template matching service with request batching, plus its client library
+"""
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import struct
+import logging
+import threading
+import socketserver
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config_loader import ConfigLoader
+from image_matcher import ImageMatcher
+from template_pack import TemplatePack
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UNIX_ADDRESS = 'unix:/tmp/autoclick-match.sock'
+DEFAULT_TCP_ADDRESS = 'tcp:127.0.0.1:8765'
+DEFAULT_ADDRESS = DEFAULT_UNIX_ADDRESS if hasattr(socket, 'AF_UNIX') else DEFAULT_TCP_ADDRESS
+
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+
+# Every message: header length, payload length, JSON header, payload bytes
+_MESSAGE = struct.Struct('<II')
+
+# Binary result record: template index, matched, confidence, x, y, width, height
+_RECORD = struct.Struct('<HBfiiHH')
+
+# Segments created by clients in this process, which also owns their tracker entry
+_client_segments = set()
+
+
+@dataclass(frozen=True)
+class TemplateMatch:
+    """Match result for one template of a set"""
+    name: str
+    matched: bool
+    confidence: float
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """
+    Parse 'unix:/path' or 'tcp:host:port'
+    
+    Args:
+        address: Service address
+        
+    Returns:
+        Tuple of (socket family, socket address)
+        
+    Raises:
+        ValueError: If the address is malformed
+    """
+    scheme, _, rest = address.partition(':')
+    if scheme == 'unix' and rest:
+        return socket.AF_UNIX, rest
+    if scheme == 'tcp':
+        host, _, port = rest.rpartition(':')
+        if host and port.isdigit():
+            return socket.AF_INET, (host, int(port))
+    raise ValueError(f"Invalid service address: {address}")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read exactly size bytes, or None if the peer closed the connection"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return bytes(buffer)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], payload: bytes = b''):
+    """Send one framed message"""
+    header_bytes = json.dumps(header).encode('utf-8')
+    sock.sendall(_MESSAGE.pack(len(header_bytes), len(payload)) + header_bytes)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_message(sock: socket.socket) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """
+    Receive one framed message
+    
+    Returns:
+        Tuple of (header, payload) or None if the connection closed
+    """
+    prefix = _recv_exact(sock, _MESSAGE.size)
+    if prefix is None:
+        return None
+    header_len, payload_len = _MESSAGE.unpack(prefix)
+    header = _recv_exact(sock, header_len)
+    payload = _recv_exact(sock, payload_len) if payload_len else b''
+    if header is None or payload is None:
+        return None
+    return json.loads(header.decode('utf-8')), payload
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach a client's segment without letting this process unlink it at exit"""
+    shm = shared_memory.SharedMemory(name=name)
+    if name in _client_segments:
+        return shm
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+@dataclass
+class _PendingRequest:
+    """Request waiting in the batch queue"""
+    frame: np.ndarray
+    frame_key: Any  # requests with equal keys share one grayscale conversion
+    template_set: str
+    threshold: float
+    future: Future
+
+
+class MatchService:
+    """
+    Preloaded template bank served over a local socket
+    
+    Connection threads only parse requests. A batcher thread collects
+    requests arriving within a short window, converts each distinct frame
+    to grayscale once and matches all (request, template) pairs on a
+    thread pool.
+    """
+    
+    def __init__(self,
+                 address: str = DEFAULT_ADDRESS,
+                 threshold: float = 0.8,
+                 workers: int = 0,
+                 batch_window: float = 0.002,
+                 max_batch: int = 64):
+        """
+        Initialize match service
+        
+        Args:
+            address: 'unix:/path' or 'tcp:127.0.0.1:port'
+            threshold: Default confidence threshold
+            workers: Matching threads (0 = one per CPU)
+            batch_window: Seconds to wait for more requests after the first one
+            max_batch: Maximum requests per batch
+        """
+        self.address = address
+        self.threshold = threshold
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        
+        self.image_matcher = ImageMatcher(threshold=threshold)
+        self.template_sets: Dict[str, List[Tuple[str, str]]] = {}
+        self.set_thresholds: Dict[str, float] = {}
+        
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4,
+                                       thread_name_prefix='match')
+        self._requests: 'queue.Queue[_PendingRequest]' = queue.Queue()
+        # Client segments attached per connection, detached when it closes or reallocates
+        self._shared: Dict[int, Dict[str, shared_memory.SharedMemory]] = {}
+        self._shared_lock = threading.Lock()
+        self._stale_shared: List[shared_memory.SharedMemory] = []  # frames still viewed when detached
+        self._server: Optional[socketserver.BaseServer] = None
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        
+        self.batches = 0
+        self.requests = 0
+    
+    def add_template_set(self, set_id: str, template_paths: List[str], threshold: Optional[float] = None):
+        """
+        Register and preload a template set
+        
+        Args:
+            set_id: Name clients use to select the set
+            template_paths: Template image paths
+            threshold: Confidence threshold of the set (default: service threshold)
+        """
+        templates = []
+        for path in template_paths:
+            if self.image_matcher.load_template_gray(path) is not None:
+                templates.append((os.path.basename(path), path))
+        self.template_sets[set_id] = templates
+        if threshold is not None:
+            self.set_thresholds[set_id] = threshold
+        logger.info(f"Template set '{set_id}': {len(templates)} templates")
+    
+    def add_directory(self, set_id: str, resource_dir: str):
+        """
+        Register every template in a directory as a set
+        
+        Args:
+            set_id: Name clients use to select the set
+            resource_dir: Directory containing template images
+        """
+        self.add_template_set(set_id, TemplatePack.list_sources(resource_dir))
+    
+    def load_config(self, config_path: str) -> bool:
+        """
+        Register one template set per ProcessList entry, named after the process
+        
+        Args:
+            config_path: Path to configuration file
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        config = ConfigLoader.load(config_path)
+        if not config or not ConfigLoader.validate_config(config):
+            logger.error("Failed to load configuration")
+            return False
+            
+        config_dir = os.path.dirname(os.path.abspath(config_path))
+        for process_config in config.get('ProcessList', []):
+            plan = ConfigLoader.compile_process(process_config, config_dir)
+            if not plan:
+                return False
+            if process_config.get('TemplatePack', False):
+                pack = TemplatePack.load_or_build(plan.resource_dir)
+                if pack:
+                    self.image_matcher.attach_pack(pack)
+            self.add_template_set(plan.process_name, plan.template_paths(), plan.match_value)
+        return True
+    
+    def _frame_from_request(self,
+                            header: Dict[str, Any],
+                            payload: bytes,
+                            connection: int) -> Tuple[np.ndarray, Any]:
+        """Build the frame view of a request; raises ValueError if malformed"""
+        shape = tuple(int(v) for v in header['shape'])
+        size = int(np.prod(shape))
+        if len(shape) not in (2, 3):
+            raise ValueError(f"Unsupported frame shape: {shape}")
+            
+        if 'shm' in header:
+            name = header['shm']
+            offset = int(header.get('offset', 0))
+            with self._shared_lock:
+                segments = self._shared.setdefault(connection, {})
+                shm = segments.get(name)
+                if shm is None:
+                    shm = _attach_shared_memory(name)
+                    segments[name] = shm
+            if offset + size > shm.size:
+                raise ValueError("Frame exceeds shared memory segment")
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+            return frame, (name, offset, shape, header.get('frame_id'))
+            
+        if len(payload) != size:
+            raise ValueError(f"Payload has {len(payload)} bytes, expected {size}")
+        return np.frombuffer(payload, dtype=np.uint8).reshape(shape), None
+    
+    def submit(self, frame: np.ndarray, template_set: str,
+               threshold: Optional[float] = None, frame_key: Any = None) -> Future:
+        """
+        Queue a frame for matching against a template set
+        
+        Args:
+            frame: BGR/BGRA or grayscale uint8 image
+            template_set: Template set ID
+            threshold: Confidence threshold (default: set or service threshold)
+            frame_key: Requests in one batch with the same key share preprocessing
+            
+        Returns:
+            Future of a list of TemplateMatch
+        """
+        future: Future = Future()
+        if template_set not in self.template_sets:
+            future.set_exception(KeyError(f"Unknown template set: {template_set}"))
+            return future
+        if threshold is None:
+            threshold = self.set_thresholds.get(template_set, self.threshold)
+        self._requests.put(_PendingRequest(frame, frame_key, template_set, threshold, future))
+        return future
+    
+    def _collect_batch(self) -> List[_PendingRequest]:
+        """Wait for a request, then gather more for up to batch_window seconds"""
+        try:
+            batch = [self._requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+            
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._requests.get(timeout=remaining) if remaining > 0
+                             else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _process_batch(self, batch: List[_PendingRequest]):
+        """Match every request of a batch and resolve its future"""
+        grays: Dict[Any, np.ndarray] = {}
+        jobs = []
+        for request in batch:
+            key = request.frame_key if request.frame_key is not None else id(request)
+            gray = grays.get(key)
+            if gray is None:
+                frame = request.frame
+                if frame.ndim == 2:
+                    gray = frame
+                else:
+                    code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+                    gray = cv2.cvtColor(frame, code)
+                grays[key] = gray
+            for name, path in self.template_sets[request.template_set]:
+                jobs.append((request, name, path, gray))
+        
+        def run(job):
+            request, name, path, gray = job
+            template = self.image_matcher.load_template_gray(path)
+            result = self.image_matcher.match_template(gray, template, threshold=request.threshold)
+            x, y = result.location or (0, 0)
+            width, height = result.template_size or (0, 0)
+            return TemplateMatch(name, result.matched, float(result.confidence), x, y, width, height)
+            
+        results: Dict[int, List[TemplateMatch]] = {id(r): [] for r in batch}
+        for job, match in zip(jobs, self.pool.map(run, jobs)):
+            results[id(job[0])].append(match)
+            
+        for request in batch:
+            request.future.set_result(results[id(request)])
+            
+        self.batches += 1
+        self.requests += len(batch)
+    
+    def _run_batcher(self):
+        """Batcher thread body"""
+        while self._running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                self._process_batch(batch)
+            except Exception as e:
+                logger.error(f"Error processing batch: {e}", exc_info=True)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+            # Frames may be views of client segments; drop them before waiting for the next batch
+            del batch
+    
+    def detach_shared(self, connection: int, names: Optional[List[str]] = None):
+        """
+        Release client segments attached for a connection
+        
+        Args:
+            connection: Connection the segments were attached for
+            names: Segments to release (default: all of the connection's)
+        """
+        with self._shared_lock:
+            segments = self._shared.get(connection, {})
+            if names is None:
+                names = list(segments)
+            # A view of a detached segment may outlive its request briefly; those are retried
+            pending = self._stale_shared + [segments.pop(name) for name in names if name in segments]
+            self._stale_shared = []
+            if not segments:
+                self._shared.pop(connection, None)
+            for shm in pending:
+                try:
+                    shm.close()
+                except BufferError:
+                    self._stale_shared.append(shm)
+    
+    def handle_request(self,
+                       header: Dict[str, Any],
+                       payload: bytes,
+                       connection: int = 0) -> Tuple[Dict[str, Any], bytes]:
+        """
+        Serve one request message
+        
+        Args:
+            header: Request header
+            payload: Raw frame bytes (empty for shared memory frames)
+            connection: Connection the request arrived on; owns attached segments
+            
+        Returns:
+            Tuple of (response header, response payload)
+        """
+        op = header.get('op')
+        if op == 'sets':
+            return {'status': 'ok', 'sets': {set_id: [name for name, _ in templates]
+                                             for set_id, templates in self.template_sets.items()}}, b''
+        if op == 'stats':
+            return {'status': 'ok', 'batches': self.batches, 'requests': self.requests,
+                    'cache': self.image_matcher.cache_stats()}, b''
+        if op != 'match':
+            return {'status': 'error', 'error': f"Unknown op: {op}"}, b''
+            
+        if 'detach' in header:
+            # The client replaced the segment it named with a larger one
+            self.detach_shared(connection, [header['detach']])
+        try:
+            frame, frame_key = self._frame_from_request(header, payload, connection)
+            matches = self.submit(frame, header.get('set', ''), header.get('threshold'),
+                                  frame_key).result()
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}, b''
+            
+        if header.get('format', FORMAT_JSON) == FORMAT_BINARY:
+            records = b''.join(_RECORD.pack(i, m.matched, m.confidence, m.x, m.y, m.width, m.height)
+                               for i, m in enumerate(matches))
+            return {'status': 'ok', 'format': FORMAT_BINARY, 'count': len(matches)}, records
+        return {'status': 'ok', 'format': FORMAT_JSON,
+                'results': [m.__dict__ for m in matches]}, b''
+    
+    def start(self):
+        """Bind the socket and start serving"""
+        family, sock_address = parse_address(self.address)
+        service = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    while True:
+                        message = recv_message(self.request)
+                        if message is None:
+                            return
+                        send_message(self.request, *service.handle_request(*message, id(self)))
+                finally:
+                    service.detach_shared(id(self))
+                    
+        if family == socket.AF_UNIX:
+            if os.path.exists(sock_address):
+                os.unlink(sock_address)
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        server_class.daemon_threads = True
+        server_class.allow_reuse_address = True
+        self._server = server_class(sock_address, Handler)
+        
+        self._running = True
+        self._threads = [threading.Thread(target=self._run_batcher, daemon=True),
+                         threading.Thread(target=self._server.serve_forever, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Match service listening on {self.address}")
+    
+    def stop(self):
+        """Stop serving and release shared memory attachments"""
+        self._running = False
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            family, sock_address = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(sock_address):
+                os.unlink(sock_address)
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self.pool.shutdown(wait=True)
+        for connection in list(self._shared):
+            self.detach_shared(connection)
+        self._stale_shared = []
+        logger.info(f"Match service stopped: {self.requests} requests in {self.batches} batches")
+
+
+class MatchClient:
+    """Blocking client for MatchService; one connection per client"""
+    
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = 10.0):
+        """
+        Connect to a match service
+        
+        Args:
+            address: 'unix:/path' or 'tcp:127.0.0.1:port'
+            timeout: Socket timeout in seconds
+        """
+        family, sock_address = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(sock_address)
+        self._set_names: Dict[str, List[str]] = {}
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._detach: Optional[str] = None  # replaced segment the service still has attached
+        self._frame_id = 0
+    
+    def _call(self, header: Dict[str, Any], payload: bytes = b'') -> Tuple[Dict[str, Any], bytes]:
+        send_message(self.sock, header, payload)
+        message = recv_message(self.sock)
+        if message is None:
+            raise ConnectionError("Match service closed the connection")
+        response, data = message
+        if response.get('status') != 'ok':
+            raise RuntimeError(response.get('error', 'match service error'))
+        return response, data
+    
+    def template_sets(self) -> Dict[str, List[str]]:
+        """
+        Get template sets and their template names
+        
+        Returns:
+            Dictionary of set ID -> template names in result order
+        """
+        self._set_names = self._call({'op': 'sets'})[0]['sets']
+        return self._set_names
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get service counters"""
+        return self._call({'op': 'stats'})[0]
+    
+    def match(self,
+              frame: np.ndarray,
+              template_set: str,
+              threshold: Optional[float] = None,
+              binary: bool = True,
+              use_shared_memory: bool = False) -> List[TemplateMatch]:
+        """
+        Match a frame against every template of a set
+        
+        Args:
+            frame: BGR/BGRA or grayscale uint8 image
+            template_set: Template set ID
+            threshold: Confidence threshold (default: the set's threshold)
+            binary: Use compact binary results instead of JSON
+            use_shared_memory: Pass the frame through a reusable shared memory segment
+            
+        Returns:
+            List of TemplateMatch in template order
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        header: Dict[str, Any] = {'op': 'match', 'set': template_set, 'shape': list(frame.shape),
+                                  'format': FORMAT_BINARY if binary else FORMAT_JSON}
+        if threshold is not None:
+            header['threshold'] = threshold
+            
+        payload = b''
+        if use_shared_memory:
+            if self._shm is None or self._shm.size < frame.nbytes:
+                if self._shm is not None:
+                    self._detach = self._shm.name
+                self._close_shared()
+                self._shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+                _client_segments.add(self._shm.name)
+            np.ndarray(frame.shape, dtype=np.uint8, buffer=self._shm.buf)[...] = frame
+            self._frame_id += 1
+            header.update(shm=self._shm.name, offset=0, frame_id=self._frame_id)
+            if self._detach is not None:
+                header['detach'], self._detach = self._detach, None
+        else:
+            payload = frame.tobytes()
+            
+        response, data = self._call(header, payload)
+        if not binary:
+            return [TemplateMatch(**r) for r in response['results']]
+            
+        if template_set not in self._set_names:
+            self.template_sets()
+        names = self._set_names.get(template_set, [])
+        matches = []
+        for i in range(response['count']):
+            index, matched, confidence, x, y, width, height = _RECORD.unpack_from(data, i * _RECORD.size)
+            name = names[index] if index < len(names) else str(index)
+            matches.append(TemplateMatch(name, bool(matched), confidence, x, y, width, height))
+        return matches
+    
+    def _close_shared(self):
+        if self._shm is not None:
+            _client_segments.discard(self._shm.name)
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+    
+    def close(self):
+        """Close the connection and free the shared memory segment"""
+        self._close_shared()
+        self.sock.close()
+
+
+def main():
+    """Run the match service"""
+    import argparse
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description='Local template matching service')
+    parser.add_argument('--config', '-c', help='Register one template set per ProcessList entry')
+    parser.add_argument('--set', action='append', default=[], metavar='ID=DIR',
+                        help='Register every template in DIR as set ID (repeatable)')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS,
+                        help=f'unix:/path or tcp:127.0.0.1:port (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--threshold', type=float, default=0.8, help='Default threshold (default: 0.8)')
+    parser.add_argument('--workers', type=int, default=0, help='Matching threads (default: one per CPU)')
+    parser.add_argument('--batch-window', type=float, default=2.0,
+                        help='Milliseconds to collect a batch (default: 2)')
+    args = parser.parse_args()
+    
+    service = MatchService(args.address, threshold=args.threshold, workers=args.workers,
+                           batch_window=args.batch_window / 1000.0)
+    if args.config and not service.load_config(args.config):
+        sys.exit(1)
+    for spec in args.set:
+        set_id, _, directory = spec.partition('=')
+        if not directory:
+            logger.error(f"Invalid --set value, expected ID=DIR: {spec}")
+            sys.exit(1)
+        service.add_directory(set_id, directory)
+    if not service.template_sets:
+        logger.error("No template sets registered; use --config or --set")
+        sys.exit(1)
+        
+    service.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Keyboard interrupt received")
+    service.stop()
+
+
+if __name__ == '__main__':
+    main()
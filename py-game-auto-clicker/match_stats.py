@@ -0,0 +1,227 @@
+"""
+Match Stats Module
+Per-template hit rate and cost tracking used to order icon and group evaluation
+"""
+import os
+import json
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+from task_plan import CompiledIconGroup, CompiledTask, ProcessPlan
+
+logger = logging.getLogger(__name__)
+
+STATS_VERSION = 1
+
+# Counters are halved past this many attempts so stats follow changing screens
+MAX_ATTEMPTS = 10000
+
+
+class TemplateStats:
+    """Attempt, hit and cost counters of one template"""
+    
+    __slots__ = ('attempts', 'hits', 'cost')
+    
+    def __init__(self, attempts: int = 0, hits: int = 0, cost: float = 0.0):
+        self.attempts = attempts
+        self.hits = hits
+        self.cost = cost  # total seconds
+    
+    @property
+    def hit_rate(self) -> float:
+        """Match probability with add-one smoothing, 0.5 before any attempt"""
+        return (self.hits + 1) / (self.attempts + 2)
+    
+    def mean_cost(self, default: float) -> float:
+        """Mean seconds per attempt, or default before any attempt"""
+        return self.cost / self.attempts if self.attempts else default
+
+
+class MatchStats:
+    """
+    Learn evaluation orders that minimize expected matching cost
+    
+    Icons in a group are AND-ed, so evaluation stops at the first miss:
+    ordering by cost / miss probability minimizes expected cost. Groups of a
+    task are OR-ed and the first matching group wins, so they are only
+    reordered (by cost / hit probability) when the task declares
+    'IndependentGroups'. Orders are computed once when a run starts, from the
+    stats earlier runs saved, and stay fixed while stats are collected for
+    the next run, so a run is deterministic given its stats file.
+    """
+    
+    def __init__(self, base_dir: str):
+        """
+        Initialize match stats
+        
+        Args:
+            base_dir: Directory template paths are stored relative to
+        """
+        self.base_dir = os.path.abspath(base_dir)
+        self.templates: Dict[str, TemplateStats] = {}
+        # Stats as loaded from earlier runs; orders are computed from these only
+        self._loaded: Dict[str, TemplateStats] = {}
+        
+        self._icon_orders: Dict[Tuple, Tuple[int, ...]] = {}
+        self._group_orders: Dict[Tuple, Tuple[int, ...]] = {}
+        self.reorders = 0
+    
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.base_dir).replace(os.sep, '/')
+    
+    def record(self, path: str, matched: bool, cost: float):
+        """
+        Record one template evaluation
+        
+        Args:
+            path: Template path
+            matched: Whether the template matched
+            cost: Seconds spent matching
+        """
+        stats = self.templates.get(self._key(path))
+        if stats is None:
+            stats = self.templates[self._key(path)] = TemplateStats()
+        stats.attempts += 1
+        stats.hits += matched
+        stats.cost += cost
+        if stats.attempts > MAX_ATTEMPTS:
+            stats.attempts //= 2
+            stats.hits //= 2
+            stats.cost /= 2
+    
+    def record_group(self, task_index: int, group_index: int, matched: bool, cost: float):
+        """
+        Record one icon group evaluation; only profiling keeps these
+        
+        Args:
+            task_index: Task index in the config
+            group_index: Group index in the task
+            matched: Whether every icon of the group matched
+            cost: Seconds spent on the group
+        """
+    
+    def _template(self, path: str) -> TemplateStats:
+        return self._loaded.get(self._key(path)) or TemplateStats()
+    
+    def _default_cost(self) -> float:
+        """Mean cost over all templates, used for templates never evaluated"""
+        attempts = sum(s.attempts for s in self._loaded.values())
+        return sum(s.cost for s in self._loaded.values()) / attempts if attempts else 0.001
+    
+    def _group_estimate(self, group: CompiledIconGroup, order: Sequence[int], default: float) -> Tuple[float, float]:
+        """Expected cost and success probability of a group in a given order"""
+        cost = 0.0
+        reach = 1.0
+        for i in order:
+            stats = self._template(group.icons[i].path)
+            cost += reach * stats.mean_cost(default)
+            reach *= stats.hit_rate
+        return cost, reach
+    
+    def _best_icon_order(self, group: CompiledIconGroup, default: float) -> Tuple[int, ...]:
+        def rank(i):
+            stats = self._template(group.icons[i].path)
+            return (stats.mean_cost(default) / (1.0 - stats.hit_rate), i)
+        return tuple(sorted(range(len(group.icons)), key=rank))
+    
+    def update_orders(self, plan: ProcessPlan):
+        """
+        Recompute evaluation orders of every task from the loaded stats
+        
+        Args:
+            plan: Plan whose tasks are reordered
+        """
+        default = self._default_cost()
+        for task in plan.tasks:
+            estimates = []
+            for group in task.icon_groups:
+                order = self._best_icon_order(group, default)
+                self._icon_orders[group.icons] = order
+                estimates.append(self._group_estimate(group, order, default))
+            
+            if task.independent_groups:
+                def rank(g):
+                    cost, success = estimates[g]
+                    return (cost / success, g)
+                self._group_orders[task.icon_groups] = tuple(sorted(range(len(task.icon_groups)), key=rank))
+        self.reorders += 1
+    
+    def icon_order(self, group: CompiledIconGroup) -> Sequence[int]:
+        """Get the evaluation order of a group's icons as config indices"""
+        return self._icon_orders.get(group.icons) or range(len(group.icons))
+    
+    def group_order(self, task: CompiledTask) -> Sequence[int]:
+        """Get the evaluation order of a task's groups as config indices"""
+        if not task.independent_groups:
+            return range(len(task.icon_groups))
+        return self._group_orders.get(task.icon_groups) or range(len(task.icon_groups))
+    
+    def load(self, filepath: str) -> bool:
+        """
+        Load stats saved by an earlier run
+        
+        Args:
+            filepath: Stats file path
+            
+        Returns:
+            True if loaded, False if missing or unreadable
+        """
+        if not os.path.exists(filepath):
+            return False
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != STATS_VERSION:
+                logger.warning(f"Ignoring match stats with unsupported version: {filepath}")
+                return False
+            self.templates = {key: TemplateStats(int(v['attempts']), int(v['hits']), float(v['cost']))
+                              for key, v in data.get('templates', {}).items()}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Failed to load match stats {filepath}: {e}")
+            return False
+        self._loaded = {key: TemplateStats(s.attempts, s.hits, s.cost) for key, s in self.templates.items()}
+        logger.info(f"Loaded match stats for {len(self.templates)} templates")
+        return True
+    
+    def save(self, filepath: str) -> bool:
+        """
+        Save stats for the next run
+        
+        Args:
+            filepath: Stats file path
+            
+        Returns:
+            True if saved
+        """
+        data = {
+            'version': STATS_VERSION,
+            'templates': {key: {'attempts': s.attempts, 'hits': s.hits, 'cost': s.cost}
+                          for key, s in sorted(self.templates.items())},
+        }
+        tmp_path = filepath + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, filepath)
+        except OSError as e:
+            logger.error(f"Failed to save match stats {filepath}: {e}")
+            return False
+        return True
+    
+    def summary(self, plan: ProcessPlan) -> List[str]:
+        """
+        Describe the current orders for logging
+        
+        Args:
+            plan: Plan being run
+            
+        Returns:
+            One line per task whose order differs from config order
+        """
+        lines = []
+        for task in plan.tasks:
+            groups = list(self.group_order(task))
+            icons = [list(self.icon_order(g)) for g in task.icon_groups]
+            if groups != sorted(groups) or any(o != sorted(o) for o in icons):
+                lines.append(f"task {task.index}: groups {groups}, icons {icons}")
+        return lines
@@ -1,27 +1,41 @@
 """
 Mouse Controller Module
-Mouse operations using Win32 APIs
+Mouse operations submitted through an InputBackend (SendInput, XTest or fake)
 """
-import win32api
-import win32con
 import time
 import logging
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Sequence
+
+from input_backend import InputBackend, InputEvent, EventKind, create_input_backend
 
 logger = logging.getLogger(__name__)
 
 
 class MouseController:
-    """Mouse control using Win32 APIs"""
+    """Mouse control on top of a batched input backend"""
     
-    def __init__(self, click_delay: float = 0.05):
+    def __init__(self, click_delay: float = 0.05, backend: Optional[InputBackend] = None):
         """
         Initialize mouse controller
         
         Args:
             click_delay: Delay between mouse down and up (seconds)
+            backend: Input backend (default: platform backend from create_input_backend)
         """
         self.click_delay = click_delay
+        self.backend = backend or create_input_backend()
+    
+    def submit(self, events: Sequence[InputEvent]) -> bool:
+        """
+        Submit a sequence of events as one batch
+        
+        Args:
+            events: Input events in order
+            
+        Returns:
+            True if successful
+        """
+        return self.backend.submit(events)
     
     def move(self, x: int, y: int) -> bool:
         """
@@ -34,13 +48,35 @@ class MouseController:
         Returns:
             True if successful
         """
-        try:
-            win32api.SetCursorPos((x, y))
-            logger.debug(f"Moved mouse to ({x}, {y})")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to move mouse: {e}")
+        if not self.backend.submit([InputEvent(EventKind.MOVE, x, y)]):
+            logger.error(f"Failed to move mouse to ({x}, {y})")
             return False
+        logger.debug(f"Moved mouse to ({x}, {y})")
+        return True
+    
+    def press(self, button: str = "left") -> bool:
+        """
+        Press a mouse button at the current position
+        
+        Args:
+            button: Mouse button ('left', 'right', 'middle')
+            
+        Returns:
+            True if successful
+        """
+        return self.backend.submit([InputEvent(EventKind.DOWN, button=button)])
+    
+    def release(self, button: str = "left") -> bool:
+        """
+        Release a mouse button at the current position
+        
+        Args:
+            button: Mouse button ('left', 'right', 'middle')
+            
+        Returns:
+            True if successful
+        """
+        return self.backend.submit([InputEvent(EventKind.UP, button=button)])
     
     def click(self, x: Optional[int] = None, y: Optional[int] = None, button: str = "left") -> bool:
         """
@@ -54,36 +90,27 @@ class MouseController:
         Returns:
             True if successful
         """
-        try:
-            # Move to position if coordinates provided
-            if x is not None and y is not None:
-                self.move(x, y)
-            
-            # Determine button codes
-            if button == "left":
-                down_code = win32con.MOUSEEVENTF_LEFTDOWN
-                up_code = win32con.MOUSEEVENTF_LEFTUP
-            elif button == "right":
-                down_code = win32con.MOUSEEVENTF_RIGHTDOWN
-                up_code = win32con.MOUSEEVENTF_RIGHTUP
-            elif button == "middle":
-                down_code = win32con.MOUSEEVENTF_MIDDLEDOWN
-                up_code = win32con.MOUSEEVENTF_MIDDLEUP
-            else:
-                logger.error(f"Unknown button: {button}")
-                return False
-            
-            # Perform click
-            win32api.mouse_event(down_code, 0, 0, 0, 0)
-            time.sleep(self.click_delay)
-            win32api.mouse_event(up_code, 0, 0, 0, 0)
-            
-            logger.debug(f"Clicked {button} button at ({x}, {y})")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to click: {e}")
+        events = []
+        if x is not None and y is not None:
+            events.append(InputEvent(EventKind.MOVE, x, y))
+        events.append(InputEvent(EventKind.DOWN, button=button))
+        up = InputEvent(EventKind.UP, button=button)
+        
+        # Without a hold time the whole click is a single batch
+        if self.click_delay <= 0:
+            ok = self.backend.submit(events + [up])
+        else:
+            ok = self.backend.submit(events)
+            if ok:
+                time.sleep(self.click_delay)
+                ok = self.backend.submit([up])
+                
+        if not ok:
+            logger.error(f"Failed to click {button} button at ({x}, {y})")
             return False
+            
+        logger.debug(f"Clicked {button} button at ({x}, {y})")
+        return True
     
     def left_click(self, x: Optional[int] = None, y: Optional[int] = None) -> bool:
         """
@@ -140,8 +167,11 @@ class MouseController:
             Tuple of (x, y) coordinates
         """
         try:
-            pos = win32api.GetCursorPos()
-            return pos
+            return self.backend.get_position()
         except Exception as e:
             logger.error(f"Failed to get cursor position: {e}")
             return (0, 0)
+    
+    def latency_stats(self):
+        """Get input submission latency statistics"""
+        return self.backend.latency_stats()
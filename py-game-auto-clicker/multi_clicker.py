@@ -0,0 +1,535 @@
+"""
+Multi Clicker Module
+Drive many game windows from one process with shared templates, matching pool and input
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from window_manager import WindowManager
+from window_index import WindowIndex
+from screen_capture import Region, ScreenCapture, merge_regions
+from image_matcher import ImageMatcher
+from mouse_controller import MouseController
+from input_backend import InputBackend, create_input_backend, INPUT_BACKENDS
+from action_handler import ActionHandler
+from action_executor import ActionExecutor, POLICY_DROP
+from config_loader import ConfigLoader
+from task_plan import CompiledTask, ProcessPlan
+from task_matcher import match_task
+from screen_state import ScreenClassifier
+from scale_detector import ScaleDetector
+from frame_source import FrameSource
+from template_pack import TemplatePack
+from match_pool import MatchPool
+
+logger = logging.getLogger(__name__)
+
+# Pause after a window finishes its task list, like the single-window cycle delay
+CYCLE_DELAY = 0.01
+
+# Seconds between window discovery passes when no change notification arrives
+SYNC_INTERVAL = 1.0
+
+# Process settings the single-window loop implements and this runtime does not
+SINGLE_WINDOW_KEYS = ('CycleBudgetMs', 'AdaptiveOrder', 'FlightRecorder')
+
+
+@dataclass
+class ClickTarget:
+    """Scheduling state of one game window"""
+    hwnd: int
+    plan: ProcessPlan
+    task_index: int = 0
+    next_due: float = 0.0
+    in_flight: bool = False
+    steps: int = 0
+    submitted: int = 0
+    classifier: Optional[ScreenClassifier] = None  # set when the plan has 'ScreenStates'
+    scale_detector: Optional[ScaleDetector] = None  # set when the plan has 'MultiScale'
+    tasks: Tuple[CompiledTask, ...] = ()  # tasks of the current cycle
+    source: Optional[FrameSource] = None  # frames come from here instead of the window
+    
+    @property
+    def owner(self) -> str:
+        """Executor conflict key; one per window"""
+        return f"{self.plan.process_name}:{self.hwnd}"
+
+
+class MultiAutoClicker:
+    """
+    Run the task lists of many windows in one runtime
+    
+    Every window of every configured process gets its own task cursor and
+    due time. A scheduler thread hands due windows to a shared thread pool
+    (OpenCV releases the GIL while matching), all windows share one
+    template cache, and every timeline is played by a single ActionExecutor
+    that focuses the window first, so input for different windows never
+    interleaves.
+    """
+    
+    def __init__(self,
+                 config_path: str,
+                 process_names: List[str],
+                 capture_method: str = "win32",
+                 input_backend: Union[str, InputBackend] = "auto",
+                 workers: int = 0,
+                 match_processes: bool = False,
+                 frame_sources: Optional[Dict[str, Sequence[FrameSource]]] = None):
+        """
+        Initialize multi-window auto-clicker
+        
+        Args:
+            config_path: Path to configuration file
+            process_names: ProcessList entries to drive; every window of each is a target
+            capture_method: Screen capture method ('win32' or 'mss')
+            input_backend: Input backend ('auto', 'win32', 'xtest' or 'recording'), or an
+                           InputBackend instance such as a game simulator's input sink
+            workers: Matching threads or processes (0 = one per CPU)
+            match_processes: Match in worker processes fed through shared memory
+            frame_sources: Frame sources to drive per process name instead of its windows,
+                           e.g. replays or game simulators; targets are numbered from 1
+        """
+        self.config_path = config_path
+        self.config_dir = os.path.dirname(os.path.abspath(config_path))
+        self.process_names = process_names
+        self.capture_method = capture_method
+        self.workers = workers or os.cpu_count() or 4
+        self.match_processes = match_processes
+        self.frame_sources = frame_sources
+        
+        self.window_index = WindowIndex()
+        self.window_manager = WindowManager(index=self.window_index)
+        if not isinstance(input_backend, InputBackend):
+            input_backend = create_input_backend(input_backend)
+        self.mouse_controller = MouseController(backend=input_backend)
+        self.action_handler = ActionHandler(self.mouse_controller)
+        self.image_matcher: Optional[ImageMatcher] = None
+        self.action_executor: Optional[ActionExecutor] = None
+        self.plans: Dict[str, ProcessPlan] = {}
+        self.capture_regions: Dict[str, Optional[List[Region]]] = {}  # process -> regions grabbed
+        self.match_pool: Optional[MatchPool] = None
+        self._pack_dirs: List[str] = []
+        
+        self.targets: Dict[int, ClickTarget] = {}
+        self._targets_lock = threading.Lock()
+        self._targets_dirty = threading.Event()
+        self._wakeup = threading.Event()
+        
+        # mss handles must stay on the thread that created them
+        self._local = threading.local()
+        
+        self.is_running = False
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.scheduler_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        
+        logger.info(f"MultiAutoClicker initialized with config: {config_path}")
+    
+    def load_config(self) -> bool:
+        """
+        Load, validate and compile the configuration of every target process
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        config = ConfigLoader.load(self.config_path)
+        if not config:
+            logger.error("Failed to load configuration")
+            return False
+            
+        if not ConfigLoader.validate_config(config):
+            logger.error("Configuration validation failed")
+            return False
+            
+        process_configs = []
+        for process_name in self.process_names:
+            process_config = ConfigLoader.get_process_config(config, process_name)
+            if not process_config:
+                logger.error(f"No configuration found for process: {process_name}")
+                return False
+            process_configs.append(process_config)
+            
+        # Windows of one process share its plan; templates are shared by every window
+        cache_mb = sum(pc.get('TemplateCacheMB', 256) for pc in process_configs)
+        self.image_matcher = ImageMatcher(cache_bytes=int(cache_mb * 1024 * 1024))
+        
+        policies = {pc.get('ActionPolicy', POLICY_DROP) for pc in process_configs}
+        policy = process_configs[0].get('ActionPolicy', POLICY_DROP)
+        if len(policies) > 1:
+            logger.warning(f"Processes use different 'ActionPolicy' values, using '{policy}' for all")
+        try:
+            self.action_executor = ActionExecutor(self.mouse_controller, policy=policy)
+        except ValueError as e:
+            logger.error(f"Invalid 'ActionPolicy': {e}")
+            return False
+            
+        self._pack_dirs = []
+        for process_config in process_configs:
+            plan = ConfigLoader.compile_process(process_config, self.config_dir)
+            if not plan:
+                logger.error(f"Failed to compile configuration for {process_config.get('ProcessName')}")
+                return False
+            self.plans[plan.process_name] = plan
+            
+            regions = plan.capture_regions() if plan.region_capture else None
+            if plan.region_capture and regions is None:
+                logger.warning(f"'RegionCapture' of {plan.process_name} needs a 'SearchRegion' on every icon, "
+                               f"window-anchored probes, template matching and no 'MultiScale'; "
+                               f"capturing whole windows")
+            self.capture_regions[plan.process_name] = merge_regions(regions) if regions else None
+            unsupported = [key for key in SINGLE_WINDOW_KEYS if process_config.get(key)]
+            if unsupported:
+                logger.warning(f"{', '.join(unsupported)} of {plan.process_name} only apply in single-window "
+                               f"mode; ignored")
+            
+            if process_config.get('TemplatePack', False) and plan.resource_dir not in self._pack_dirs:
+                self._pack_dirs.append(plan.resource_dir)
+                if not self.match_processes:
+                    pack = TemplatePack.load_or_build(plan.resource_dir)
+                    if pack:
+                        self.image_matcher.attach_pack(pack)
+                        
+            # Worker processes load their own copy of the templates
+            if self.match_processes:
+                continue
+            for template_path in plan.template_paths():
+                self.image_matcher.load_template_gray(template_path)
+            for engine, paths in plan.feature_templates().items():
+                self.image_matcher.index_features(paths, engine)
+            if plan.multi_scale is not None:
+                ScaleDetector(self.image_matcher, plan.multi_scale).precompute(plan.template_paths())
+                
+        logger.info(f"Compiled {len(self.plans)} processes, template cache: "
+                    f"{self.image_matcher.cache_stats()['entries']} entries, budget {cache_mb} MB")
+        return True
+    
+    def _on_window_change(self, event: str, process_name: str, hwnd: int):
+        """WindowIndex listener; discovery itself runs on the scheduler thread"""
+        self._targets_dirty.set()
+        self._wakeup.set()
+    
+    def _new_target(self, hwnd: int, plan: ProcessPlan, source: Optional[FrameSource] = None) -> ClickTarget:
+        """Create the scheduling state of a window or frame source"""
+        classifier = ScreenClassifier(self.image_matcher, plan) if plan.screen_states else None
+        # Every window detects its own scale; the scaled templates are shared
+        scale_detector = ScaleDetector(self.image_matcher, plan.multi_scale) if plan.multi_scale else None
+        return ClickTarget(hwnd=hwnd, plan=plan, classifier=classifier, scale_detector=scale_detector,
+                           tasks=plan.tasks, source=source)
+    
+    def add_source_targets(self) -> bool:
+        """
+        Create one target per configured frame source; they never come or go
+        
+        Returns:
+            True if every source belongs to a compiled process
+        """
+        number = 0
+        for process_name, sources in self.frame_sources.items():
+            plan = self.plans.get(process_name)
+            if plan is None:
+                logger.error(f"Frame sources given for unknown process: {process_name}")
+                return False
+            for source in sources:
+                number += 1
+                source.set_regions(self.capture_regions.get(plan.process_name))
+                self.targets[number] = self._new_target(number, plan, source)
+        logger.info(f"Driving {number} frame sources instead of windows")
+        return True
+    
+    def sync_targets(self):
+        """Add targets for new windows and drop targets whose window is gone"""
+        if self.frame_sources is not None:
+            return
+        found: Dict[int, ProcessPlan] = {}
+        for plan in self.plans.values():
+            for hwnd in self.window_index.find_windows(plan.process_name):
+                found.setdefault(hwnd, plan)
+                
+        with self._targets_lock:
+            for hwnd in set(self.targets) - set(found):
+                target = self.targets.pop(hwnd)
+                self.action_executor.cancel(target.owner)
+                logger.info(f"Window {hwnd} of {target.plan.process_name} gone, target removed")
+                
+            for hwnd in set(found) - set(self.targets):
+                self.targets[hwnd] = self._new_target(hwnd, found[hwnd])
+                logger.info(f"Window {hwnd} of {found[hwnd].process_name} added as target")
+    
+    def _screen_capture(self) -> ScreenCapture:
+        """Get the calling thread's ScreenCapture"""
+        capture = getattr(self._local, 'screen_capture', None)
+        if capture is None:
+            capture = ScreenCapture(method=self.capture_method)
+            self._local.screen_capture = capture
+        return capture
+    
+    def _focus_window(self, hwnd: int) -> bool:
+        """Bring a window to the foreground before its input is played"""
+        if self.window_manager.is_foreground(hwnd):
+            return True
+        self.window_manager.restore_window(hwnd)
+        return self.window_manager.set_foreground(hwnd)
+    
+    def run_step(self, target: ClickTarget) -> float:
+        """
+        Run the next task of one window; called on a pool thread
+        
+        Args:
+            target: Window to process
+            
+        Returns:
+            Seconds until the window's next task is due
+        """
+        window_rect = None
+        if target.source is not None:
+            regions = target.source.regions
+            frame = target.source.grab()
+            if frame is not None:
+                screenshot, window_rect = frame
+            else:
+                screenshot = None
+        else:
+            regions = self.capture_regions.get(target.plan.process_name)
+            screenshot = self._screen_capture().capture_window(target.hwnd, regions)
+        
+        gray = None
+        scale = 1.0
+        if target.scale_detector is not None and screenshot is not None:
+            gray = self.image_matcher.to_gray(screenshot, regions)
+            scale = target.scale_detector.update(gray)
+            
+        # Each window classifies its screen at the start of its task cycle
+        if target.task_index == 0 and target.classifier is not None and screenshot is not None:
+            if gray is None:
+                gray = self.image_matcher.to_gray(screenshot, regions)
+            target.tasks = target.classifier.update(screenshot, gray, scale)
+        if not target.tasks:
+            return CYCLE_DELAY
+        
+        task = target.tasks[target.task_index]
+        target.task_index = (target.task_index + 1) % len(target.tasks)
+        target.steps += 1
+        delay = task.delay + (CYCLE_DELAY if target.task_index == 0 else 0.0)
+        
+        if screenshot is None:
+            logger.error(f"Failed to capture window {target.hwnd}")
+            return delay
+            
+        if window_rect is None:
+            window_rect = self.window_manager.get_window_rect(target.hwnd)
+        if not window_rect:
+            logger.error(f"Failed to get rect of window {target.hwnd}")
+            return delay
+            
+        if self.match_pool:
+            match_result = self.match_pool.match(screenshot, target.plan, task, scale)
+        else:
+            if gray is None:
+                gray = self.image_matcher.to_gray(screenshot, regions)
+            match_result = match_task(self.image_matcher, screenshot, task,
+                                      threshold=target.plan.match_value, stop_event=self._stop_event,
+                                      scale=scale, gray=gray)
+        if match_result:
+            hwnd = target.hwnd
+            # Frame sources have no window to bring to the foreground
+            prepare = None if target.source is not None else lambda: self._focus_window(hwnd)
+            timeline = self.action_handler.build_timeline(task.actions, match_result, window_rect,
+                                                          owner=target.owner,
+                                                          label=f"{target.owner} task {task.index}",
+                                                          prepare=prepare)
+            if self.action_executor.submit(timeline):
+                target.submitted += 1
+                
+        return delay
+    
+    def _on_step_done(self, target: ClickTarget, future: Future):
+        """Reschedule a window once its step finished"""
+        try:
+            delay = future.result()
+        except Exception as e:
+            logger.error(f"Error processing window {target.hwnd}: {e}", exc_info=True)
+            delay = SYNC_INTERVAL
+        target.next_due = time.monotonic() + delay
+        target.in_flight = False
+        self._wakeup.set()
+    
+    def run_scheduler(self):
+        """Dispatch due windows to the matching pool until stopped"""
+        next_sync = 0.0
+        try:
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+                if self._targets_dirty.is_set() or now >= next_sync:
+                    self._targets_dirty.clear()
+                    self.sync_targets()
+                    next_sync = now + SYNC_INTERVAL
+                    
+                timeout = next_sync - now
+                with self._targets_lock:
+                    targets = list(self.targets.values())
+                    
+                for target in targets:
+                    if target.in_flight:
+                        continue
+                    if target.next_due > now:
+                        timeout = min(timeout, target.next_due - now)
+                        continue
+                    target.in_flight = True
+                    future = self.pool.submit(self.run_step, target)
+                    future.add_done_callback(lambda f, t=target: self._on_step_done(t, f))
+                    
+                self._wakeup.wait(max(timeout, 0.0))
+                self._wakeup.clear()
+                
+        except Exception as e:
+            logger.error(f"Error in scheduler: {e}", exc_info=True)
+        finally:
+            self.is_running = False
+            logger.info("Scheduler stopped")
+    
+    def start(self) -> bool:
+        """
+        Start driving every window of the configured processes
+        
+        Returns:
+            True if started successfully, False otherwise
+        """
+        if self.is_running:
+            logger.warning("Multi auto-clicker is already running")
+            return False
+            
+        if not self.load_config():
+            return False
+            
+        if self.frame_sources is not None:
+            if not self.add_source_targets():
+                return False
+        else:
+            self.window_index.add_listener(self._on_window_change)
+            self.window_index.start()
+        
+        if self.match_processes:
+            self.match_pool = MatchPool(self.plans.values(), workers=self.workers,
+                                        cache_bytes=self.image_matcher.template_cache.max_bytes,
+                                        pack_dirs=self._pack_dirs)
+            self.match_pool.start()
+            
+        self._stop_event.clear()
+        self.action_executor.start()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='match')
+        self.is_running = True
+        self.scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
+        self.scheduler_thread.start()
+        
+        logger.info(f"Multi auto-clicker started: {', '.join(self.plans)} with {self.workers} workers")
+        return True
+    
+    def stop(self):
+        """Stop scheduling and release resources; also cleans up after the scheduler died"""
+        if self.scheduler_thread is None:
+            logger.warning("Multi auto-clicker is not running")
+            return
+            
+        logger.info("Stopping multi auto-clicker...")
+        self.is_running = False
+        self._stop_event.set()
+        self._wakeup.set()
+        self.action_executor.cancel()
+        
+        self.scheduler_thread.join(timeout=5.0)
+        self.scheduler_thread = None
+        if self.pool:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        if self.match_pool:
+            self.match_pool.close()
+            self.match_pool = None
+            
+        self.action_executor.stop()
+        if self.frame_sources is not None:
+            for sources in self.frame_sources.values():
+                for source in sources:
+                    source.close()
+        else:
+            self.window_index.stop()
+        
+        with self._targets_lock:
+            for target in self.targets.values():
+                logger.info(f"Window {target.owner}: {target.steps} steps, "
+                            f"{target.submitted} timelines submitted")
+                if target.scale_detector is not None:
+                    logger.info(f"Window {target.owner} scale detection: {target.scale_detector.stats()}")
+        logger.info(f"Template cache stats: {self.image_matcher.cache_stats()}")
+        logger.info(f"Input latency stats: {self.mouse_controller.latency_stats()}")
+        logger.info("Multi auto-clicker stopped")
+    
+    def is_active(self) -> bool:
+        """Check if the multi auto-clicker is running"""
+        return self.is_running
+
+
+def main():
+    """Main entry point"""
+    import argparse
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('auto_clicker.log', encoding='utf-8')
+        ]
+    )
+    
+    parser = argparse.ArgumentParser(description='Drive every window of one or more game processes')
+    parser.add_argument('--config', '-c', required=True, help='Path to configuration file')
+    parser.add_argument('--process', '-p', required=True, action='append',
+                        help='Target process name (repeat for several ProcessList entries)')
+    parser.add_argument('--capture', choices=['win32', 'mss'], default='win32',
+                        help='Screen capture method (default: win32)')
+    parser.add_argument('--input', choices=INPUT_BACKENDS, default='auto',
+                        help='Input backend (default: auto)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Matching threads or processes (default: one per CPU)')
+    parser.add_argument('--processes', action='store_true',
+                        help='Match in worker processes instead of threads')
+    parser.add_argument('--duration', '-d', type=int, default=0,
+                        help='Auto-stop after duration in seconds (0 = run indefinitely)')
+                        
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.config):
+        logger.error(f"Config file not found: {args.config}")
+        sys.exit(1)
+        
+    clicker = MultiAutoClicker(args.config, args.process, capture_method=args.capture,
+                               input_backend=args.input, workers=args.workers,
+                               match_processes=args.processes)
+    if not clicker.start():
+        logger.error("Failed to start multi auto-clicker")
+        sys.exit(1)
+        
+    try:
+        if args.duration > 0:
+            logger.info(f"Running for {args.duration} seconds...")
+            time.sleep(args.duration)
+            clicker.stop()
+        else:
+            logger.info("Running indefinitely. Press Ctrl+C to stop.")
+            while clicker.is_active():
+                time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Keyboard interrupt received")
+        clicker.stop()
+        
+    logger.info("Program terminated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Pixel Probe Module
+Cheap pixel color checks evaluated without template matching
+"""
+import numpy as np
+import logging
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+from image_matcher import MatchResult
+
+logger = logging.getLogger(__name__)
+
+ANCHOR_WINDOW = 'window'
+ANCHOR_MATCH = 'match'
+
+
+def parse_color(value: Union[str, Sequence[int]]) -> Tuple[int, int, int]:
+    """
+    Parse a probe color into a BGR tuple
+
+    Args:
+        value: '#RRGGBB' string or [R, G, B] list
+
+    Returns:
+        Tuple of (b, g, r)
+
+    Raises:
+        ValueError: If the color cannot be parsed
+    """
+    if isinstance(value, str):
+        text = value.lstrip('#')
+        if len(text) != 6:
+            raise ValueError(f"Invalid color '{value}', expected '#RRGGBB'")
+        r, g, b = (int(text[i:i + 2], 16) for i in (0, 2, 4))
+    else:
+        if len(value) != 3:
+            raise ValueError(f"Invalid color {value}, expected [R, G, B]")
+        r, g, b = (int(c) for c in value)
+
+    for channel in (r, g, b):
+        if not 0 <= channel <= 255:
+            raise ValueError(f"Color channel out of range: {value}")
+    return (b, g, r)
+
+
+class PixelProbeSet:
+    """A set of (x, y, color, tolerance) probes evaluated in one NumPy gather"""
+
+    def __init__(self,
+                 probes: List[Tuple[int, int, Tuple[int, int, int], int]],
+                 anchor: str = ANCHOR_WINDOW):
+        """
+        Initialize probe set
+
+        Args:
+            probes: List of (x, y, (b, g, r), tolerance) tuples
+            anchor: 'window' for window-relative probes or 'match' for
+                    probes relative to the matched icon location
+        """
+        if not probes:
+            raise ValueError("Probe set must contain at least one probe")
+        if anchor not in (ANCHOR_WINDOW, ANCHOR_MATCH):
+            raise ValueError(f"Unknown probe anchor: {anchor}")
+
+        self.anchor = anchor
+        self.xs = np.array([p[0] for p in probes], dtype=np.intp)
+        self.ys = np.array([p[1] for p in probes], dtype=np.intp)
+        self.colors = np.array([p[2] for p in probes], dtype=np.int16)
+        self.tolerances = np.array([p[3] for p in probes], dtype=np.int16)
+
+        # Bounds are checked once per evaluation against the offset extremes
+        self._min_x = int(self.xs.min())
+        self._max_x = int(self.xs.max())
+        self._min_y = int(self.ys.min())
+        self._max_y = int(self.ys.max())
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'PixelProbeSet':
+        """
+        Build probe set from a task's 'PixelProbes' configuration
+
+        Args:
+            config: Dictionary with 'Probes' list and optional 'Anchor'
+
+        Returns:
+            PixelProbeSet instance
+
+        Raises:
+            ValueError: If the configuration is malformed
+        """
+        if not isinstance(config, dict):
+            raise ValueError("'PixelProbes' must be an object with a 'Probes' list")
+
+        probes = []
+        for idx, probe in enumerate(config.get('Probes', [])):
+            try:
+                probes.append((int(probe['X']),
+                               int(probe['Y']),
+                               parse_color(probe['Color']),
+                               int(probe.get('Tolerance', 0))))
+            except KeyError as e:
+                raise ValueError(f"Probe {idx} missing {e}")
+
+        return cls(probes, anchor=config.get('Anchor', ANCHOR_WINDOW).lower())
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def bounds(self) -> Tuple[int, int, int, int]:
+        """Bounding box (x, y, width, height) of the probe positions"""
+        return (self._min_x, self._min_y,
+                self._max_x - self._min_x + 1, self._max_y - self._min_y + 1)
+
+    def evaluate(self, image: np.ndarray, origin: Tuple[int, int] = (0, 0)) -> MatchResult:
+        """
+        Evaluate all probes against an image
+
+        Args:
+            image: Source image (BGR or BGRA)
+            origin: (x, y) offset added to every probe position
+
+        Returns:
+            MatchResult located at origin; confidence is the fraction of
+            probes that passed
+        """
+        ox, oy = origin
+        h, w = image.shape[:2]
+        if (ox + self._min_x < 0 or oy + self._min_y < 0 or
+                ox + self._max_x >= w or oy + self._max_y >= h or image.ndim != 3):
+            logger.debug(f"Probes out of bounds for image {image.shape} at origin {origin}")
+            return MatchResult(matched=False, confidence=0.0)
+
+        pixels = image[self.ys + oy, self.xs + ox, :3].astype(np.int16)
+        passed = np.abs(pixels - self.colors).max(axis=1) <= self.tolerances
+        passed_count = int(np.count_nonzero(passed))
+
+        return MatchResult(
+            matched=passed_count == len(self.xs),
+            confidence=passed_count / len(self.xs),
+            location=(ox, oy),
+            template_size=(0, 0)
+        )
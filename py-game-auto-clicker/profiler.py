@@ -0,0 +1,292 @@
+"""
+Profiler Module
+Per-task, per-group and per-template cost report with a flame graph stack dump
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from match_stats import MatchStats
+from task_plan import CompiledIconGroup, CompiledTask, ProcessPlan
+
+logger = logging.getLogger(__name__)
+
+PHASE_CAPTURE = 'capture'
+PHASE_MATCH = 'match'
+PHASE_ACTION = 'action'
+PHASE_DELAY = 'delay'
+PHASES = (PHASE_CAPTURE, PHASE_MATCH, PHASE_ACTION, PHASE_DELAY)
+
+MODE_SAMPLE = 'sample'
+MODE_DETERMINISTIC = 'deterministic'
+PROFILE_MODES = (MODE_SAMPLE, MODE_DETERMINISTIC)
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.001
+
+
+class StackSampler:
+    """Sample one thread's Python stack and count collapsed stacks"""
+    
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        """
+        Initialize stack sampler
+        
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+    
+    def start(self, thread_id: int):
+        """
+        Start sampling a thread
+        
+        Args:
+            thread_id: threading.get_ident() of the sampled thread
+        """
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(thread_id,), daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop sampling"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+    
+    def _run(self, thread_id: int):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+    
+    def collapsed(self) -> List[str]:
+        """
+        Get stacks in collapsed format ('root;caller;callee count')
+        
+        Returns:
+            Lines readable by flamegraph.pl, speedscope and inferno
+        """
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+
+class ProfileStats(MatchStats):
+    """
+    MatchStats of one profiled run that also keeps per-group evaluation counters
+    
+    With adaptive ordering on, evaluations are also recorded into the run's
+    MatchStats, whose evaluation orders are used.
+    """
+    
+    def __init__(self, base_dir: str, orders: Optional[MatchStats] = None):
+        """
+        Initialize profile stats
+        
+        Args:
+            base_dir: Directory template paths are stored relative to
+            orders: Adaptive MatchStats providing evaluation orders (optional)
+        """
+        super().__init__(base_dir)
+        self.orders = orders
+        # (task index, group index) -> [evaluations, matches, seconds]
+        self.groups: Dict[tuple, List[float]] = {}
+    
+    def record(self, path: str, matched: bool, cost: float):
+        super().record(path, matched, cost)
+        if self.orders is not None:
+            self.orders.record(path, matched, cost)
+    
+    def record_group(self, task_index: int, group_index: int, matched: bool, cost: float):
+        entry = self.groups.setdefault((task_index, group_index), [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += matched
+        entry[2] += cost
+    
+    def icon_order(self, group: CompiledIconGroup) -> Sequence[int]:
+        if self.orders is None:
+            return super().icon_order(group)
+        return self.orders.icon_order(group)
+    
+    def group_order(self, task: CompiledTask) -> Sequence[int]:
+        if self.orders is None:
+            return super().group_order(task)
+        return self.orders.group_order(task)
+
+
+class CycleProfiler:
+    """
+    Collect where a task loop spends its time
+    
+    The runtime reports phase times (capture, match, action, delay) and
+    per-task match times; ProfileStats, passed to match_task as its stats,
+    collects per-group and per-template times. A stack sampler, or cProfile
+    in deterministic mode, runs on the task loop thread.
+    """
+    
+    def __init__(self, plan: ProcessPlan, mode: str = MODE_SAMPLE, orders: Optional[MatchStats] = None):
+        """
+        Initialize profiler
+        
+        Args:
+            plan: Plan being profiled
+            mode: 'sample' (stack sampling) or 'deterministic' (cProfile plus sampling)
+            orders: Adaptive MatchStats of the run (optional)
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.stats = ProfileStats(plan.resource_dir, orders)
+        self.phases: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.tasks: Dict[int, List[float]] = {}  # task index -> [evaluations, matches, seconds]
+        self.cycles = 0
+        
+        self.sampler = StackSampler()
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+    
+    def add_phase(self, phase: str, seconds: float):
+        """Add time spent in a phase"""
+        self.phases[phase] += seconds
+    
+    def record_task(self, task_index: int, matched: bool, seconds: float):
+        """Record one task evaluation"""
+        entry = self.tasks.setdefault(task_index, [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += matched
+        entry[2] += seconds
+    
+    def end_cycle(self):
+        """Count a finished cycle"""
+        self.cycles += 1
+    
+    def start(self):
+        """Start profiling the calling thread; call from the task loop thread"""
+        self._started = time.perf_counter()
+        self.sampler.start(threading.get_ident())
+        if self.mode == MODE_DETERMINISTIC:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+    
+    def stop(self):
+        """Stop profiling; call from the task loop thread"""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.sampler.stop()
+        self._elapsed = time.perf_counter() - self._started
+    
+    def report(self, plan: ProcessPlan) -> Dict[str, Any]:
+        """
+        Build the cost report
+        
+        Args:
+            plan: Plan that was profiled
+            
+        Returns:
+            Dictionary with phases, tasks, groups and templates, each ranked by total cost
+        """
+        def row(name, entry):
+            count, matches, seconds = entry
+            return {
+                'name': name,
+                'evaluations': int(count),
+                'matches': int(matches),
+                'match_ratio': matches / count if count else 0.0,
+                'total_ms': seconds * 1000,
+                'mean_ms': seconds / count * 1000 if count else 0.0,
+            }
+        
+        group_names = {(task.index, g): ','.join(group.names) for task in plan.tasks
+                       for g, group in enumerate(task.icon_groups)}
+        phase_total = sum(self.phases.values()) or 1.0
+        
+        return {
+            'cycles': self.cycles,
+            'elapsed_s': self._elapsed,
+            'mode': self.mode,
+            'phases': [{'name': name, 'total_ms': seconds * 1000, 'share': seconds / phase_total}
+                       for name, seconds in sorted(self.phases.items(), key=lambda kv: -kv[1])],
+            'tasks': sorted((row(f"task {index}", entry) for index, entry in self.tasks.items()),
+                            key=lambda r: -r['total_ms']),
+            'groups': sorted((row(f"task {t} group {g} [{group_names.get((t, g), '')}]", entry)
+                              for (t, g), entry in self.stats.groups.items()),
+                             key=lambda r: -r['total_ms']),
+            'templates': sorted((row(key, [s.attempts, s.hits, s.cost])
+                                 for key, s in self.stats.templates.items()),
+                                key=lambda r: -r['total_ms']),
+            'samples': self.sampler.samples,
+        }
+    
+    @staticmethod
+    def format_report(report: Dict[str, Any], limit: int = 20) -> str:
+        """
+        Render a report as text tables
+        
+        Args:
+            report: Report from report()
+            limit: Rows per table
+            
+        Returns:
+            Multi-line report text
+        """
+        lines = [f"Profile: {report['cycles']} cycles in {report['elapsed_s']:.2f}s "
+                 f"({report['mode']}, {report['samples']} stack samples)", "",
+                 f"{'phase':<12} {'total ms':>10} {'share':>7}"]
+        for phase in report['phases']:
+            lines.append(f"{phase['name']:<12} {phase['total_ms']:>10.1f} {phase['share']:>7.1%}")
+        
+        for title in ('tasks', 'groups', 'templates'):
+            lines += ["", f"{title[:-1]:<48} {'evals':>7} {'match':>7} {'total ms':>10} {'mean ms':>8}"]
+            for r in report[title][:limit]:
+                name = r['name'] if len(r['name']) <= 48 else '...' + r['name'][-45:]
+                lines.append(f"{name:<48} {r['evaluations']:>7} {r['match_ratio']:>7.1%} "
+                             f"{r['total_ms']:>10.1f} {r['mean_ms']:>8.2f}")
+        return '\n'.join(lines)
+    
+    def save(self, directory: str, plan: ProcessPlan) -> Optional[str]:
+        """
+        Write the report (.txt, .json), collapsed stacks (.folded) and cProfile data (.prof)
+        
+        Args:
+            directory: Output directory
+            plan: Plan that was profiled
+            
+        Returns:
+            Path prefix of the written files, or None on failure
+        """
+        report = self.report(plan)
+        prefix = os.path.join(directory, f"profile-{plan.process_name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(prefix + '.txt', 'w', encoding='utf-8') as f:
+                f.write(self.format_report(report, limit=1000) + '\n')
+            with open(prefix + '.json', 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            with open(prefix + '.folded', 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.sampler.collapsed()) + '\n')
+            if self._cprofile is not None:
+                pstats.Stats(self._cprofile).dump_stats(prefix + '.prof')
+        except OSError as e:
+            logger.error(f"Failed to save profile to {directory}: {e}")
+            return None
+        return prefix
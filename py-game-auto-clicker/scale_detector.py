@@ -0,0 +1,114 @@
+"""
+Scale Detector Module
+Determine a window's UI scale once from an anchor template and cache it
+"""
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from image_matcher import ImageMatcher
+from task_plan import ScaleSpec
+
+logger = logging.getLogger(__name__)
+
+# Seconds between detection attempts while the anchor is not on screen
+RETRY_INTERVAL = 1.0
+
+
+class ScaleDetector:
+    """
+    Pick the template scale of a window by searching for an anchor once
+    
+    The search over all precomputed scales runs on the first frame and again
+    only when the frame size changes (resolution or window size change), so
+    steady-state matching uses a single scale.
+    """
+    
+    def __init__(self, image_matcher: ImageMatcher, spec: ScaleSpec):
+        """
+        Initialize scale detector
+        
+        Args:
+            image_matcher: ImageMatcher holding the templates
+            spec: Scales to search and the anchor template
+        """
+        self.image_matcher = image_matcher
+        self.spec = spec
+        self.scale = 1.0
+        
+        self._frame_size: Optional[Tuple[int, int]] = None
+        self._last_attempt = 0.0
+        
+        self.detections = 0
+        self.attempts = 0
+    
+    def precompute(self, template_paths) -> int:
+        """
+        Build every scaled template variant up front
+        
+        Args:
+            template_paths: Template paths of the plan
+            
+        Returns:
+            Number of variants built
+        """
+        start = time.perf_counter()
+        built = self.image_matcher.precompute_scales(template_paths, self.spec.scales)
+        logger.info(f"Precomputed {built} template variants over {len(self.spec.scales)} scales "
+                    f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return built
+    
+    def update(self, screenshot: np.ndarray) -> float:
+        """
+        Detect the scale if this frame size has not been resolved yet
+        
+        Args:
+            screenshot: Current frame
+            
+        Returns:
+            Scale to match this frame at
+        """
+        frame_size = screenshot.shape[:2]
+        if frame_size == self._frame_size:
+            return self.scale
+        
+        now = time.monotonic()
+        if now - self._last_attempt < RETRY_INTERVAL:
+            return self.scale
+        self._last_attempt = now
+        self.attempts += 1
+        
+        start = time.perf_counter()
+        result = self.image_matcher.detect_scale(screenshot, self.spec.anchor.path, self.spec.scales)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if not result.matched:
+            logger.debug(f"Scale anchor {self.spec.anchor.name} not found "
+                         f"(best confidence {result.confidence:.3f})")
+            return self.scale
+        
+        self.scale = result.scale
+        self._frame_size = frame_size
+        self.detections += 1
+        logger.info(f"Detected UI scale {self.scale:g} from {self.spec.anchor.name} "
+                    f"(confidence {result.confidence:.3f}, {elapsed_ms:.0f} ms)")
+        return self.scale
+    
+    def reset(self):
+        """Forget the detected scale so the next frame is searched again"""
+        self._frame_size = None
+        self._last_attempt = 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get detection metrics
+        
+        Returns:
+            Dictionary with current scale, detections and attempts
+        """
+        return {
+            'scale': self.scale,
+            'detections': self.detections,
+            'attempts': self.attempts,
+        }
@@ -2,22 +2,105 @@
 Screen Capture Module
 High-performance screen capture using Win32 APIs (BitBlt) and mss
 """
-import win32gui
-import win32ui
-import win32con
-from ctypes import windll
+import ctypes
 from PIL import Image
 import numpy as np
 import logging
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import mss
 import mss.tools
+try:
+    import win32gui
+    import win32ui
+    import win32con
+except ImportError:
+    win32gui = win32ui = win32con = None
 
 logger = logging.getLogger(__name__)
 
+DIB_RGB_COLORS = 0
+BI_RGB = 0
+
+# Fixed cost of one region grab, counted in pixels of capture bandwidth
+GRAB_OVERHEAD = 64 * 64
+
+Region = Tuple[int, int, int, int]  # (x, y, width, height)
+
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    """Win32 BITMAPINFOHEADER used to request 32-bit top-down pixels"""
+    _fields_ = [
+        ('biSize', ctypes.c_uint32),
+        ('biWidth', ctypes.c_int32),
+        ('biHeight', ctypes.c_int32),
+        ('biPlanes', ctypes.c_uint16),
+        ('biBitCount', ctypes.c_uint16),
+        ('biCompression', ctypes.c_uint32),
+        ('biSizeImage', ctypes.c_uint32),
+        ('biXPelsPerMeter', ctypes.c_int32),
+        ('biYPelsPerMeter', ctypes.c_int32),
+        ('biClrUsed', ctypes.c_uint32),
+        ('biClrImportant', ctypes.c_uint32),
+    ]
+
+
+def merge_regions(regions: Sequence[Region], overhead: int = GRAB_OVERHEAD) -> List[Region]:
+    """
+    Plan the rectangles to grab for a set of regions
+    
+    Two rectangles are replaced by their bounding box while one grab of the
+    box costs no more than two separate grabs, each grab costing its area
+    plus overhead. Nearby regions end up in one grab; distant ones stay apart.
+    
+    Args:
+        regions: Window-relative (x, y, width, height) regions
+        overhead: Fixed cost of one grab in pixels
+        
+    Returns:
+        Rectangles to grab
+    """
+    rects = [tuple(int(v) for v in r) for r in regions if r[2] > 0 and r[3] > 0]
+    while len(rects) > 1:
+        best = None
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                (ax, ay, aw, ah), (bx, by, bw, bh) = rects[i], rects[j]
+                x, y = min(ax, bx), min(ay, by)
+                box = (x, y, max(ax + aw, bx + bw) - x, max(ay + ah, by + bh) - y)
+                saving = aw * ah + bw * bh + overhead - box[2] * box[3]
+                if saving >= 0 and (best is None or saving > best[0]):
+                    best = (saving, i, j, box)
+        if best is None:
+            break
+        _, i, j, box = best
+        rects = [r for k, r in enumerate(rects) if k not in (i, j)] + [box]
+    return rects
+
+
+def clip_regions(regions: Sequence[Region], width: int, height: int) -> List[Region]:
+    """Clip regions to a width x height window, dropping empty ones"""
+    clipped = []
+    for x, y, w, h in regions:
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(width, x + w), min(height, y + h)
+        if right > left and bottom > top:
+            clipped.append((left, top, right - left, bottom - top))
+    return clipped
+
 
 class ScreenCapture:
-    """High-performance screen capture using multiple methods"""
+    """
+    High-performance screen capture using multiple methods
+    
+    Frames are BGRA and are not copied after capture: the Win32 path writes
+    into one buffer reused while the window size is unchanged, and the mss
+    path wraps the pixels mss returns. A frame is only valid until the next
+    capture of the same instance; copy it to keep it longer.
+    
+    Given regions, only those parts of the window are grabbed and written
+    at their place in a full-size frame, so coordinates stay window-relative;
+    the rest of the frame holds stale pixels.
+    """
     
     def __init__(self, method: str = "win32"):
         """
@@ -30,6 +113,33 @@ class ScreenCapture:
         self.mss_instance = None
         if method == "mss":
             self.mss_instance = mss.mss()
+        
+        self._buffer: Optional[np.ndarray] = None
+        self._staging: Dict[Tuple[int, int], np.ndarray] = {}  # (width, height) -> region bitmap buffer
+        self._bitmap_info = BITMAPINFOHEADER()
+        self._bitmap_info.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        self._bitmap_info.biPlanes = 1
+        self._bitmap_info.biBitCount = 32
+        self._bitmap_info.biCompression = BI_RGB
+    
+    def _frame_buffer(self, width: int, height: int) -> np.ndarray:
+        """Get the reusable BGRA buffer, reallocating only when the size changes"""
+        if self._buffer is None or self._buffer.shape[:2] != (height, width):
+            self._buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        return self._buffer
+    
+    def _read_bitmap(self, hdc: int, bitmap: int, out: np.ndarray) -> bool:
+        """Copy a deselected bitmap into a contiguous BGRA array of its size"""
+        height, width = out.shape[:2]
+        # A negative height requests top-down rows, which is numpy order
+        self._bitmap_info.biWidth = width
+        self._bitmap_info.biHeight = -height
+        copied = ctypes.windll.gdi32.GetDIBits(hdc, bitmap, 0, height, out.ctypes.data_as(ctypes.c_void_p),
+                                               ctypes.byref(self._bitmap_info), DIB_RGB_COLORS)
+        if copied != height:
+            logger.error(f"Failed to read window bitmap: {copied}/{height} rows")
+            return False
+        return True
     
     def capture_window_win32(self, hwnd: int) -> Optional[np.ndarray]:
         """
@@ -39,7 +149,7 @@ class ScreenCapture:
             hwnd: Window handle
             
         Returns:
-            Image as numpy array (BGR format for OpenCV) or None if failed
+            Image as numpy array (BGRA, reused by the next capture) or None if failed
         """
         try:
             # Get window dimensions
@@ -58,7 +168,7 @@ class ScreenCapture:
             saveDC.SelectObject(saveBitMap)
             
             # Copy screen to bitmap
-            result = windll.user32.PrintWindow(hwnd, saveDC.GetSafeHdc(), 3)
+            result = ctypes.windll.user32.PrintWindow(hwnd, saveDC.GetSafeHdc(), 3)
             
             # Alternative: BitBlt from desktop DC
             if not result:
@@ -67,21 +177,21 @@ class ScreenCapture:
                 saveDC.BitBlt((0, 0), (width, height), desktop_mfc, (left, top), win32con.SRCCOPY)
                 win32gui.ReleaseDC(0, desktop_dc)
             
-            # Convert to numpy array
-            bmpinfo = saveBitMap.GetInfo()
-            bmpstr = saveBitMap.GetBitmapBits(True)
-            img = np.frombuffer(bmpstr, dtype=np.uint8)
-            img.shape = (height, width, 4)
+            # GetDIBits needs the bitmap deselected, which deleting its DC does
+            saveDC.DeleteDC()
             
-            # Convert BGRA to BGR for OpenCV
-            img = img[:, :, :3]
+            # Copy the bitmap straight into the reused buffer
+            img = self._frame_buffer(width, height)
+            copied = self._read_bitmap(hwndDC, saveBitMap.GetHandle(), img)
             
             # Cleanup
             win32gui.DeleteObject(saveBitMap.GetHandle())
-            saveDC.DeleteDC()
             mfcDC.DeleteDC()
             win32gui.ReleaseDC(hwnd, hwndDC)
             
+            if not copied:
+                return None
+            
             logger.debug(f"Captured window {hwnd} using Win32: {width}x{height}")
             return img
             
@@ -89,6 +199,82 @@ class ScreenCapture:
             logger.error(f"Failed to capture window using Win32: {e}")
             return None
     
+    def capture_regions_win32(self, hwnd: int, regions: Sequence[Region]) -> Optional[np.ndarray]:
+        """
+        Capture parts of a window using partial BitBlt
+        
+        PrintWindow always renders the whole window, so regions are copied
+        from the window DC, which needs the window content on screen.
+        
+        Args:
+            hwnd: Window handle
+            regions: Window-relative (x, y, width, height) rectangles
+            
+        Returns:
+            Full-size BGRA frame with the regions filled in, or None if failed
+        """
+        try:
+            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+            width = right - left
+            height = bottom - top
+            img = self._frame_buffer(width, height)
+            
+            hwndDC = win32gui.GetWindowDC(hwnd)
+            mfcDC = win32ui.CreateDCFromHandle(hwndDC)
+            try:
+                for x, y, w, h in clip_regions(regions, width, height):
+                    saveDC = mfcDC.CreateCompatibleDC()
+                    bitmap = win32ui.CreateBitmap()
+                    bitmap.CreateCompatibleBitmap(mfcDC, w, h)
+                    saveDC.SelectObject(bitmap)
+                    saveDC.BitBlt((0, 0), (w, h), mfcDC, (x, y), win32con.SRCCOPY)
+                    saveDC.DeleteDC()
+                    
+                    staging = self._staging.get((w, h))
+                    if staging is None:
+                        staging = self._staging[(w, h)] = np.empty((h, w, 4), dtype=np.uint8)
+                    copied = self._read_bitmap(hwndDC, bitmap.GetHandle(), staging)
+                    win32gui.DeleteObject(bitmap.GetHandle())
+                    if not copied:
+                        return None
+                    img[y:y + h, x:x + w] = staging
+            finally:
+                mfcDC.DeleteDC()
+                win32gui.ReleaseDC(hwnd, hwndDC)
+            
+            logger.debug(f"Captured {len(regions)} regions of window {hwnd} using Win32")
+            return img
+        
+        except Exception as e:
+            logger.error(f"Failed to capture window regions using Win32: {e}")
+            return None
+    
+    def capture_regions_mss(self, hwnd: int, regions: Sequence[Region]) -> Optional[np.ndarray]:
+        """
+        Capture parts of a window using mss region grabs
+        
+        Args:
+            hwnd: Window handle
+            regions: Window-relative (x, y, width, height) rectangles
+            
+        Returns:
+            Full-size BGRA frame with the regions filled in, or None if failed
+        """
+        try:
+            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+            img = self._frame_buffer(right - left, bottom - top)
+            
+            for x, y, w, h in clip_regions(regions, right - left, bottom - top):
+                sct_img = self.mss_instance.grab({"left": left + x, "top": top + y, "width": w, "height": h})
+                img[y:y + h, x:x + w] = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(h, w, 4)
+            
+            logger.debug(f"Captured {len(regions)} regions of window {hwnd} using mss")
+            return img
+        
+        except Exception as e:
+            logger.error(f"Failed to capture window regions using mss: {e}")
+            return None
+    
     def capture_window_mss(self, hwnd: int) -> Optional[np.ndarray]:
         """
         Capture window using mss library (alternative method)
@@ -97,7 +283,7 @@ class ScreenCapture:
             hwnd: Window handle
             
         Returns:
-            Image as numpy array (BGR format for OpenCV) or None if failed
+            Image as numpy array (BGRA, valid until the next capture) or None if failed
         """
         try:
             # Get window dimensions
@@ -114,11 +300,8 @@ class ScreenCapture:
             # Capture screenshot
             sct_img = self.mss_instance.grab(monitor)
             
-            # Convert to numpy array (BGRA format)
-            img = np.array(sct_img)
-            
-            # Convert BGRA to BGR for OpenCV
-            img = img[:, :, :3]
+            # View the BGRA pixels mss already holds, without copying
+            img = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
             
             logger.debug(f"Captured window {hwnd} using mss: {monitor['width']}x{monitor['height']}")
             return img
@@ -127,16 +310,21 @@ class ScreenCapture:
             logger.error(f"Failed to capture window using mss: {e}")
             return None
     
-    def capture_window(self, hwnd: int) -> Optional[np.ndarray]:
+    def capture_window(self, hwnd: int, regions: Optional[Sequence[Region]] = None) -> Optional[np.ndarray]:
         """
         Capture window using configured method
         
         Args:
             hwnd: Window handle
+            regions: Only grab these window-relative rectangles (default: whole window)
             
         Returns:
-            Image as numpy array (BGR format for OpenCV) or None if failed
+            Image as numpy array (BGRA, valid until the next capture) or None if failed
         """
+        if regions:
+            if self.method == "mss":
+                return self.capture_regions_mss(hwnd, regions)
+            return self.capture_regions_win32(hwnd, regions)
         if self.method == "mss":
             return self.capture_window_mss(hwnd)
         else:
@@ -153,7 +341,7 @@ class ScreenCapture:
         Returns:
             Image as numpy array or None if failed
         """
-        img = self.capture_window(hwnd)
+        img = self.capture_window(hwnd, [region])
         if img is None:
             return None
         
@@ -0,0 +1,147 @@
+"""
+Screen State Module
+Classify which screen a frame shows from cheap anchors and pick the tasks that apply to it
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from image_matcher import ImageMatcher
+from task_plan import CompiledTask, ProcessPlan, ScreenState
+from task_matcher import match_icon
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenClassifier:
+    """
+    Track the current screen state and hand out only its tasks
+    
+    The current state's anchors are checked first, so a steady screen costs
+    one state's checks per cycle. When they fail, the other states are tried
+    in order of how often they followed the current one. A change, including
+    to no known state, takes effect only after it was seen on `hysteresis`
+    consecutive frames, so transition animations and single odd frames do
+    not swap the task set back and forth. While no state is known every task
+    runs.
+    """
+    
+    def __init__(self, image_matcher: ImageMatcher, plan: ProcessPlan):
+        """
+        Initialize screen classifier
+        
+        Args:
+            image_matcher: ImageMatcher holding the anchor templates
+            plan: Plan with screen states and state-tagged tasks
+        """
+        self.image_matcher = image_matcher
+        self.states: Dict[str, ScreenState] = {state.name: state for state in plan.screen_states}
+        self.hysteresis = plan.state_hysteresis
+        self.threshold = plan.match_value
+        self.state: Optional[str] = None
+        
+        # Task lists are fixed per state, so switching costs a dict lookup
+        self._tasks: Dict[Optional[str], Tuple[CompiledTask, ...]] = {
+            name: tuple(task for task in plan.tasks if not task.states or name in task.states)
+            for name in self.states
+        }
+        self._tasks[None] = plan.tasks
+        # state -> {following state: times seen}
+        self._transitions: Dict[Optional[str], Dict[Optional[str], int]] = {}
+        self._candidate: Optional[str] = None
+        self._streak = 0
+        
+        self.frames = 0
+        self.checks = 0
+        self.switches = 0
+    
+    @property
+    def tasks(self) -> Tuple[CompiledTask, ...]:
+        """Tasks of the current state, in config order"""
+        return self._tasks[self.state]
+    
+    def _matches(self, state: ScreenState, screenshot: np.ndarray, gray: np.ndarray, scale: float) -> bool:
+        """Check a state's anchors, probes before icons"""
+        self.checks += 1
+        if state.probes is not None and not state.probes.evaluate(screenshot).matched:
+            return False
+        return all(match_icon(self.image_matcher, gray, icon, self.threshold, scale).matched
+                   for icon in state.icons)
+    
+    def classify(self, screenshot: np.ndarray, gray: np.ndarray, scale: float = 1.0) -> Optional[str]:
+        """
+        Find the state a frame shows, without hysteresis
+        
+        Args:
+            screenshot: Captured frame
+            gray: Frame converted with image_matcher.to_gray
+            scale: Template resize factor
+            
+        Returns:
+            State name, or None if no state's anchors all pass
+        """
+        if self.state is not None and self._matches(self.states[self.state], screenshot, gray, scale):
+            return self.state
+        
+        # Likely successors first; the stable sort keeps config order among ties
+        followers = self._transitions.get(self.state, {})
+        for name in sorted(self.states, key=lambda n: -followers.get(n, 0)):
+            if name != self.state and self._matches(self.states[name], screenshot, gray, scale):
+                return name
+        return None
+    
+    def update(self,
+               screenshot: np.ndarray,
+               gray: Optional[np.ndarray] = None,
+               scale: float = 1.0) -> Tuple[CompiledTask, ...]:
+        """
+        Classify a frame and switch state once a change has persisted
+        
+        Args:
+            screenshot: Captured frame
+            gray: Frame converted once with image_matcher.to_gray (optional)
+            scale: Template resize factor
+            
+        Returns:
+            Tasks to evaluate this cycle
+        """
+        if gray is None:
+            gray = self.image_matcher.to_gray(screenshot)
+        self.frames += 1
+        
+        seen = self.classify(screenshot, gray, scale)
+        if seen == self.state:
+            self._candidate = None
+            self._streak = 0
+            return self.tasks
+        
+        if seen == self._candidate:
+            self._streak += 1
+        else:
+            self._candidate = seen
+            self._streak = 1
+        
+        if self._streak >= self.hysteresis:
+            followers = self._transitions.setdefault(self.state, {})
+            followers[seen] = followers.get(seen, 0) + 1
+            logger.info(f"Screen state {self.state} -> {seen} ({len(self._tasks[seen])} tasks)")
+            self.state = seen
+            self.switches += 1
+            self._candidate = None
+            self._streak = 0
+        return self.tasks
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get classification metrics
+        
+        Returns:
+            Dictionary with current state, frames, anchor checks and state switches
+        """
+        return {
+            'state': self.state,
+            'frames': self.frames,
+            'checks_per_frame': self.checks / self.frames if self.frames else 0.0,
+            'switches': self.switches,
+        }
@@ -0,0 +1,184 @@
+"""
+Task Matcher Module
+Evaluate a compiled task's pixel probes and icon groups against a screenshot
+"""
+import time
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+
+from image_matcher import ImageMatcher, MatchResult
+from match_stats import MatchStats
+from feature_matcher import ENGINE_TEMPLATE
+from pixel_probe import ANCHOR_MATCH
+from task_plan import CompiledIconGroup, CompiledTask, TemplateRef
+
+logger = logging.getLogger(__name__)
+
+
+def match_icon(image_matcher: ImageMatcher,
+               screenshot: np.ndarray,
+               icon: TemplateRef,
+               threshold: Optional[float] = None,
+               scale: float = 1.0,
+               engine: str = ENGINE_TEMPLATE) -> MatchResult:
+    """
+    Find one icon, honouring its search region, crop origin and exact mode
+    
+    Args:
+        image_matcher: ImageMatcher instance
+        screenshot: Screenshot image
+        icon: Template reference
+        threshold: Confidence threshold (default: matcher threshold)
+        scale: Template resize factor
+        engine: 'template' for correlation, or a feature engine ('orb', 'akaze')
+        
+    Returns:
+        MatchResult located where the uncropped icon would be
+    """
+    if engine != ENGINE_TEMPLATE:
+        # Features describe the whole frame once, so search regions do not apply
+        match_result = image_matcher.match_features(screenshot, icon.path, engine)
+        scale = match_result.scale
+    elif icon.region is None:
+        if icon.exact_tolerance is not None:
+            match_result = image_matcher.match_exact(screenshot, icon.path, icon.exact_tolerance, scale)
+        else:
+            match_result = image_matcher.match_template_from_file(screenshot, icon.path,
+                                                                  threshold=threshold, scale=scale)
+    else:
+        x, y, width, height = (int(round(v * scale)) for v in icon.region)
+        x, y = max(0, x), max(0, y)
+        region = screenshot[y:y + height, x:x + width]
+        template = image_matcher.load_template_gray(icon.path, scale)
+        if template is None or region.shape[0] < template.shape[0] or region.shape[1] < template.shape[1]:
+            return MatchResult(matched=False, confidence=0.0)
+        if icon.exact_tolerance is not None:
+            match_result = image_matcher.match_exact(region, icon.path, icon.exact_tolerance, scale)
+        else:
+            match_result = image_matcher.match_template(region, template, threshold=threshold)
+        match_result.scale = scale
+        if match_result.location is not None:
+            match_result.location = (match_result.location[0] + x, match_result.location[1] + y)
+    
+    if icon.origin != (0, 0) and match_result.location is not None:
+        # Report the position of the full icon so action offsets stay valid
+        match_result.location = (match_result.location[0] - int(round(icon.origin[0] * scale)),
+                                 match_result.location[1] - int(round(icon.origin[1] * scale)))
+    return match_result
+
+
+def match_icon_group(image_matcher: ImageMatcher,
+                     screenshot: np.ndarray,
+                     icon_group: CompiledIconGroup,
+                     threshold: Optional[float] = None,
+                     stats: Optional[MatchStats] = None,
+                     scale: float = 1.0,
+                     engine: str = ENGINE_TEMPLATE) -> Optional[MatchResult]:
+    """
+    Check if all icons of a group match
+    
+    Args:
+        image_matcher: ImageMatcher instance
+        screenshot: Screenshot image
+        icon_group: Compiled icon group
+        threshold: Confidence threshold (default: matcher threshold)
+        stats: Match stats to record into and take the icon order from (optional)
+        scale: Template resize factor
+        engine: 'template' for correlation, or a feature engine ('orb', 'akaze')
+        
+    Returns:
+        MatchResult of the last icon if all icons matched, None otherwise
+    """
+    target_result = None
+    icons = icon_group.icons
+    last = len(icons) - 1
+    order = stats.icon_order(icon_group) if stats is not None else range(len(icons))
+    
+    for i in order:
+        icon = icons[i]
+        start = time.perf_counter()
+        match_result = match_icon(image_matcher, screenshot, icon, threshold, scale, engine)
+        if stats is not None:
+            stats.record(icon.path, match_result.matched, time.perf_counter() - start)
+        if not match_result.matched:
+            logger.debug(f"Not matched: {icon.name}, confidence: {match_result.confidence:.3f}")
+            return None
+        
+        logger.info(f"Matched: {icon.name}, confidence: {match_result.confidence:.3f}")
+        # The last icon in config order is the target, whatever order icons run in
+        if i == last:
+            target_result = match_result
+    
+    return target_result
+
+
+def match_task(image_matcher: ImageMatcher,
+               screenshot: np.ndarray,
+               task: CompiledTask,
+               threshold: Optional[float] = None,
+               stop_event: Optional[threading.Event] = None,
+               stats: Optional[MatchStats] = None,
+               scale: float = 1.0,
+               gray: Optional[np.ndarray] = None) -> Optional[MatchResult]:
+    """
+    Find the match that triggers a task's actions
+    
+    Icons are matched against a grayscale frame converted once per call, or
+    once per frame when the caller passes one from image_matcher.to_gray.
+    
+    Args:
+        image_matcher: ImageMatcher instance
+        screenshot: Screenshot image
+        task: Compiled task
+        threshold: Confidence threshold (default: matcher threshold)
+        stop_event: Abandon remaining icon groups once set (optional)
+        stats: Match stats to record into and take evaluation orders from (optional)
+        scale: Template resize factor
+        gray: Screenshot already converted with image_matcher.to_gray on this thread (optional)
+        
+    Returns:
+        MatchResult used as position reference, or None if the task does not trigger
+    """
+    icon_groups = task.icon_groups
+    probes = task.probes
+    
+    # Window-anchored probes are cheap, so they gate template matching
+    if probes is not None and probes.anchor != ANCHOR_MATCH:
+        probe_result = probes.evaluate(screenshot)
+        if not probe_result.matched:
+            logger.debug(f"Pixel probes not matched: {probe_result.confidence:.2f}")
+            return None
+            
+        if not icon_groups:
+            logger.info("All pixel probes matched")
+            return probe_result
+            
+    if gray is None:
+        gray = image_matcher.to_gray(screenshot)
+    group_order = stats.group_order(task) if stats is not None else range(len(icon_groups))
+    for g in group_order:
+        if stop_event is not None and stop_event.is_set():
+            return None
+        
+        icon_group = icon_groups[g]
+        start = time.perf_counter()
+        target_result = match_icon_group(image_matcher, gray, icon_group, threshold, stats, scale,
+                                         task.engine)
+        if stats is not None:
+            stats.record_group(task.index, g, target_result is not None, time.perf_counter() - start)
+        
+        if target_result and probes is not None and probes.anchor == ANCHOR_MATCH:
+            if not probes.evaluate(screenshot, target_result.location).matched:
+                logger.debug(f"Pixel probes not matched relative to group: {icon_group.names}")
+                continue
+                
+        if target_result:
+            logger.info(f"All icons matched in group: {icon_group.names}")
+            return target_result
+            
+        logger.debug(f"Icon group not fully matched: {icon_group.names}")
+        
+    return None
@@ -0,0 +1,162 @@
+"""
+Task Plan Module
+Immutable, picklable runtime representation of a process configuration
+"""
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from pixel_probe import PixelProbeSet, ANCHOR_MATCH
+
+
+class ActionOp(IntEnum):
+    """Pre-parsed action opcodes"""
+    MOVE = 1
+    CLICK = 2
+    DELAY = 3
+
+
+@dataclass(frozen=True)
+class CompiledAction:
+    """Single action with all parameters resolved"""
+    op: ActionOp
+    offset: Tuple[int, int] = (0, 0)  # (x, y) relative to match location
+    button: str = "left"
+    delay: float = 0.0  # seconds
+
+
+@dataclass(frozen=True)
+class TemplateRef:
+    """Handle to a template image"""
+    name: str  # icon file name as written in the config
+    path: str  # absolute, normalized path
+    region: Optional[Tuple[int, int, int, int]] = None  # (x, y, width, height) searched; None = whole frame
+    origin: Tuple[int, int] = (0, 0)  # template position inside the icon it was cropped from
+    exact_tolerance: Optional[int] = None  # per-pixel gray tolerance of exact matching; None = correlation
+
+
+@dataclass(frozen=True)
+class CompiledIconGroup:
+    """Icons that must all match for the group to match"""
+    icons: Tuple[TemplateRef, ...]
+    
+    @property
+    def names(self) -> List[str]:
+        return [icon.name for icon in self.icons]
+
+
+@dataclass(frozen=True)
+class CompiledTask:
+    """Task with icon groups, probes and actions resolved"""
+    index: int
+    icon_groups: Tuple[CompiledIconGroup, ...]
+    target_index: int
+    actions: Tuple[CompiledAction, ...]
+    delay: float  # seconds
+    probes: Optional[PixelProbeSet] = None
+    priority: int = 0  # higher runs first within a cycle
+    independent_groups: bool = False  # any matching group may trigger, so groups can be reordered
+    engine: str = 'template'  # 'template', 'orb' or 'akaze'
+    states: Tuple[str, ...] = ()  # screen states the task runs in; empty = every state
+    fingerprint: str = field(default='', compare=False)  # hash of the source config
+
+
+@dataclass(frozen=True)
+class ScaleSpec:
+    """Template scales to precompute and the anchor used to pick one"""
+    scales: Tuple[float, ...]  # ascending, always includes 1.0
+    anchor: TemplateRef
+
+
+@dataclass(frozen=True)
+class ScreenState:
+    """Screen recognized by cheap anchor checks that must all pass"""
+    name: str
+    probes: Optional[PixelProbeSet] = None  # window-anchored
+    icons: Tuple[TemplateRef, ...] = ()
+
+
+@dataclass(frozen=True)
+class ProcessPlan:
+    """Compiled configuration for one process"""
+    process_name: str
+    resource_dir: str
+    match_value: float
+    tasks: Tuple[CompiledTask, ...]
+    cycle_budget: float = 0.0  # seconds per cycle; 0 = unlimited
+    adaptive_order: bool = False  # reorder matching by learned hit rate and cost
+    stats_file: str = ''  # absolute path of the persisted match stats
+    multi_scale: Optional[ScaleSpec] = None  # None = templates match at their own size only
+    region_capture: bool = False  # capture only the regions the tasks read
+    screen_states: Tuple[ScreenState, ...] = ()  # empty = every task runs every cycle
+    state_hysteresis: int = 2  # consecutive frames a new screen state must be seen on
+    
+    def feature_templates(self) -> Dict[str, List[str]]:
+        """
+        Get the template paths of tasks using a feature engine
+        
+        Returns:
+            Dictionary mapping feature engine to unique template paths
+        """
+        engines: Dict[str, Dict[str, None]] = {}
+        for task in self.tasks:
+            if task.engine == 'template':
+                continue
+            paths = engines.setdefault(task.engine, {})
+            for group in task.icon_groups:
+                for icon in group.icons:
+                    paths.setdefault(icon.path, None)
+        return {engine: list(paths) for engine, paths in engines.items()}
+    
+    def capture_regions(self) -> Optional[List[Tuple[int, int, int, int]]]:
+        """
+        Get the window areas the plan reads
+        
+        Returns:
+            List of (x, y, width, height) regions, or None if some task needs
+            the whole window: an icon without a search region, a feature
+            engine, match-anchored probes or multi-scale matching
+        """
+        if self.multi_scale is not None:
+            return None
+        
+        regions = []
+        for task in self.tasks:
+            if task.engine != 'template':
+                return None
+            if task.probes is not None:
+                if task.probes.anchor == ANCHOR_MATCH:
+                    return None
+                regions.append(task.probes.bounds())
+            for group in task.icon_groups:
+                for icon in group.icons:
+                    if icon.region is None:
+                        return None
+                    regions.append(icon.region)
+        for state in self.screen_states:
+            if state.probes is not None:
+                regions.append(state.probes.bounds())
+            for icon in state.icons:
+                if icon.region is None:
+                    return None
+                regions.append(icon.region)
+        return regions
+    
+    def template_paths(self) -> List[str]:
+        """
+        Get every template path used by the plan
+        
+        Returns:
+            List of unique absolute template paths in first-use order
+        """
+        paths = {}
+        for task in self.tasks:
+            for group in task.icon_groups:
+                for icon in group.icons:
+                    paths.setdefault(icon.path, None)
+        for state in self.screen_states:
+            for icon in state.icons:
+                paths.setdefault(icon.path, None)
+        if self.multi_scale is not None:
+            paths.setdefault(self.multi_scale.anchor.path, None)
+        return list(paths)
@@ -0,0 +1,150 @@
+"""
+Template Cache Module
+Bounded LRU cache for decoded template variants with memory accounting
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+VARIANT_COLOR = 'color'
+VARIANT_GRAY = 'gray'
+
+
+class TemplateCache:
+    """LRU cache keyed by (normalized path, variant) with a byte budget"""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        """
+        Initialize template cache
+
+        Args:
+            max_bytes: Byte budget over the nbytes of all cached arrays
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: 'OrderedDict[Tuple[str, str], np.ndarray]' = OrderedDict()
+        self._key_memo: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def normalize_key(self, path: str) -> str:
+        """
+        Map any spelling of a path to one cache key
+
+        Args:
+            path: Template path (relative, absolute, with '..' or symlinks)
+
+        Returns:
+            Canonical path used as cache key
+        """
+        key = self._key_memo.get(path)
+        if key is None:
+            key = os.path.normcase(os.path.realpath(path))
+            self._key_memo[path] = key
+        return key
+
+    def get(self, path: str, variant: str = VARIANT_COLOR) -> Optional[np.ndarray]:
+        """
+        Look up a cached template variant
+
+        Args:
+            path: Template path
+            variant: Variant name ('color' or 'gray')
+
+        Returns:
+            Cached array or None on miss
+        """
+        key = (self.normalize_key(path), variant)
+        with self._lock:
+            array = self._entries.get(key)
+            if array is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return array
+
+    def put(self, path: str, array: np.ndarray, variant: str = VARIANT_COLOR):
+        """
+        Insert a template variant, evicting least recently used entries
+
+        Args:
+            path: Template path
+            array: Template array
+            variant: Variant name ('color' or 'gray')
+        """
+        if array.nbytes > self.max_bytes:
+            logger.debug(f"Template larger than cache budget, not cached: {path}")
+            return
+
+        key = (self.normalize_key(path), variant)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+
+            self._entries[key] = array
+            self.current_bytes += array.nbytes
+
+            while self.current_bytes > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+                logger.debug(f"Evicted template {evicted_key[0]} ({evicted_key[1]})")
+
+    def invalidate(self, path: str):
+        """
+        Drop every variant of a template
+
+        Args:
+            path: Template path
+        """
+        normalized = self.normalize_key(path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == normalized]:
+                self.current_bytes -= self._entries.pop(key).nbytes
+
+    def clear(self):
+        """Drop all entries; statistics are kept"""
+        with self._lock:
+            self._entries.clear()
+            self._key_memo.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, path: str) -> bool:
+        normalized = self.normalize_key(path)
+        with self._lock:
+            return any(k[0] == normalized for k in self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with entry count, byte usage and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
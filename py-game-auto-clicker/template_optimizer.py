@@ -0,0 +1,419 @@
+"""
+Template Optimizer Module
+Shrink templates to their discriminative core and propose search regions from recorded frames
+"""
+import os
+import sys
+import copy
+import json
+import time
+import shutil
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config_loader import ConfigLoader
+from frame_source import ReplayFrameSource
+from feature_matcher import ENGINE_TEMPLATE
+from task_plan import ProcessPlan, TemplateRef
+
+logger = logging.getLogger(__name__)
+
+# Side lengths tried, as fractions of the template side
+SIZE_FRACTIONS = (0.25, 0.35, 0.5, 0.65, 0.8)
+# Highest-variance positions tried per candidate size
+POSITIONS_PER_SIZE = 8
+# Location error in pixels still counted as the same sighting
+LOCATION_TOLERANCE = 1
+
+Region = Tuple[int, int, int, int]  # (x, y, width, height)
+
+
+@dataclass
+class OptimizedTemplate:
+    """Outcome of optimizing one template"""
+    icon: TemplateRef
+    size: Tuple[int, int]  # original (width, height)
+    sightings: int
+    crop: Optional[Region] = None  # sub-patch of the original; None = kept whole
+    region: Optional[Region] = None
+    margin: float = 0.0  # worst best-minus-second peak over the frames
+    cost_before_ms: float = 0.0
+    cost_after_ms: float = 0.0
+    agreement: int = 0  # frames where the optimized template decides like the original
+    frames: int = 0
+    note: str = ''
+    
+    def row(self) -> Dict[str, Any]:
+        """Report entry as a plain dictionary"""
+        width, height = self.crop[2:] if self.crop else self.size
+        return {
+            'icon': self.icon.name,
+            'original_size': list(self.size),
+            'optimized_size': [width, height],
+            'area_ratio': width * height / (self.size[0] * self.size[1]),
+            'origin': list(self.crop[:2]) if self.crop else [0, 0],
+            'search_region': list(self.region) if self.region else None,
+            'sightings': self.sightings,
+            'margin': self.margin,
+            'cost_before_ms': self.cost_before_ms,
+            'cost_after_ms': self.cost_after_ms,
+            'accuracy': self.agreement / self.frames if self.frames else 0.0,
+            'note': self.note,
+        }
+
+
+class TemplateOptimizer:
+    """
+    Find, for each template, the smallest sub-patch that still matches uniquely
+    
+    The original template's sightings on the recorded frames (confidence at
+    or above MatchValue) are the ground truth. A sub-patch is accepted when,
+    inside the proposed search region, it is found at the same place on every
+    sighting frame with its best peak at least margin above the second best,
+    and stays below the threshold on every other frame. Sizes are tried from
+    the smallest up and, per size, the most textured positions first.
+    """
+    
+    def __init__(self,
+                 frames: List[np.ndarray],
+                 threshold: float,
+                 margin: float = 0.1,
+                 min_size: int = 12,
+                 region_padding: int = 16):
+        """
+        Initialize template optimizer
+        
+        Args:
+            frames: Recorded frames (BGR or grayscale)
+            threshold: Match threshold (the process MatchValue)
+            margin: Required gap between best and second-best peak
+            min_size: Smallest sub-patch side in pixels
+            region_padding: Pixels added around the seen area for the search region
+        """
+        self.frames = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) if f.ndim == 3 else f for f in frames]
+        self.threshold = threshold
+        self.margin = margin
+        self.min_size = min_size
+        self.region_padding = region_padding
+        
+        # Regions are clipped to the smallest frame
+        self.frame_size = (min(f.shape[1] for f in self.frames), min(f.shape[0] for f in self.frames))
+    
+    def _peaks(self, image: np.ndarray, template: np.ndarray) -> Tuple[float, Tuple[int, int], float]:
+        """Best peak, its location and the second-best peak outside the template footprint"""
+        result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, location = cv2.minMaxLoc(result)
+        height, width = template.shape[:2]
+        x, y = location
+        result[max(0, y - height // 2):y + height // 2 + 1, max(0, x - width // 2):x + width // 2 + 1] = -1.0
+        _, second, _, _ = cv2.minMaxLoc(result)
+        return best, location, second
+    
+    def _sightings(self, template: np.ndarray) -> List[Optional[Tuple[int, int]]]:
+        """Where the original template matches on each frame"""
+        sightings = []
+        for frame in self.frames:
+            if frame.shape[0] < template.shape[0] or frame.shape[1] < template.shape[1]:
+                sightings.append(None)
+                continue
+            _, best, _, location = cv2.minMaxLoc(cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED))
+            sightings.append(location if best >= self.threshold else None)
+        return sightings
+    
+    def _region(self, sightings: List[Tuple[int, int]], size: Tuple[int, int]) -> Region:
+        """Padded bounding box of every sighting, clipped to the frame"""
+        xs = [x for x, _ in sightings]
+        ys = [y for _, y in sightings]
+        left = max(0, min(xs) - self.region_padding)
+        top = max(0, min(ys) - self.region_padding)
+        right = min(self.frame_size[0], max(xs) + size[0] + self.region_padding)
+        bottom = min(self.frame_size[1], max(ys) + size[1] + self.region_padding)
+        return left, top, right - left, bottom - top
+    
+    def _candidates(self, template: np.ndarray) -> List[Region]:
+        """Sub-patches ordered by area, then by texture"""
+        height, width = template.shape[:2]
+        widths = sorted({min(width, max(self.min_size, int(width * f))) for f in SIZE_FRACTIONS})
+        heights = sorted({min(height, max(self.min_size, int(height * f))) for f in SIZE_FRACTIONS})
+        sizes = sorted(((w, h) for w in widths for h in heights if (w, h) != (width, height)),
+                       key=lambda s: s[0] * s[1])
+        
+        candidates = []
+        for w, h in sizes:
+            stride = max(2, min(w, h) // 4)
+            positions = [(x, y) for y in range(0, height - h + 1, stride) for x in range(0, width - w + 1, stride)]
+            # Flat patches correlate with anything, so textured ones go first
+            positions.sort(key=lambda p: -float(template[p[1]:p[1] + h, p[0]:p[0] + w].std()))
+            candidates.extend((x, y, w, h) for x, y in positions[:POSITIONS_PER_SIZE])
+        return candidates
+    
+    def _evaluate(self,
+                  patch: np.ndarray,
+                  offset: Tuple[int, int],
+                  region: Region,
+                  sightings: List[Optional[Tuple[int, int]]]) -> Tuple[int, float]:
+        """
+        Compare a patch's decisions with the original's on every frame
+        
+        Returns:
+            Tuple of (frames in agreement, worst margin over sighting frames)
+        """
+        x, y, width, height = region
+        agreement = 0
+        worst = 1.0
+        for frame, sighting in zip(self.frames, sightings):
+            area = frame[y:y + height, x:x + width]
+            if area.shape[0] < patch.shape[0] or area.shape[1] < patch.shape[1]:
+                agreement += sighting is None
+                continue
+            best, location, second = self._peaks(area, patch)
+            if sighting is None:
+                agreement += best < self.threshold
+                continue
+            expected = (sighting[0] + offset[0] - x, sighting[1] + offset[1] - y)
+            found = (best >= self.threshold and
+                     abs(location[0] - expected[0]) <= LOCATION_TOLERANCE and
+                     abs(location[1] - expected[1]) <= LOCATION_TOLERANCE)
+            agreement += found
+            worst = min(worst, best - second)
+        return agreement, worst
+    
+    def _cost(self, patch: np.ndarray, region: Optional[Region]) -> float:
+        """Mean milliseconds to search the frames with a patch"""
+        start = time.perf_counter()
+        for frame in self.frames:
+            area = frame if region is None else frame[region[1]:region[1] + region[3], region[0]:region[0] + region[2]]
+            if area.shape[0] >= patch.shape[0] and area.shape[1] >= patch.shape[1]:
+                cv2.matchTemplate(area, patch, cv2.TM_CCOEFF_NORMED)
+        return (time.perf_counter() - start) * 1000 / len(self.frames)
+    
+    def optimize(self, icon: TemplateRef, template: np.ndarray) -> OptimizedTemplate:
+        """
+        Optimize one template
+        
+        Args:
+            icon: Template reference
+            template: Grayscale template image
+            
+        Returns:
+            OptimizedTemplate; crop and region stay None when nothing safe was found
+        """
+        height, width = template.shape[:2]
+        outcome = OptimizedTemplate(icon=icon, size=(width, height), sightings=0, frames=len(self.frames))
+        outcome.cost_before_ms = outcome.cost_after_ms = self._cost(template, None)
+        
+        sightings = self._sightings(template)
+        seen = [s for s in sightings if s is not None]
+        outcome.sightings = len(seen)
+        outcome.agreement = len(self.frames)
+        if not seen:
+            outcome.note = 'not seen in frames'
+            return outcome
+        
+        region = self._region(seen, (width, height))
+        agreement, margin = self._evaluate(template, (0, 0), region, sightings)
+        if agreement == len(self.frames) and margin >= self.margin:
+            outcome.region = region
+            outcome.margin = margin
+        
+        for crop in self._candidates(template):
+            x, y, w, h = crop
+            patch = np.ascontiguousarray(template[y:y + h, x:x + w])
+            agreement, margin = self._evaluate(patch, (x, y), region, sightings)
+            if agreement == len(self.frames) and margin >= self.margin:
+                outcome.crop = crop
+                outcome.region = region
+                outcome.margin = margin
+                outcome.cost_after_ms = self._cost(patch, region)
+                return outcome
+        
+        if outcome.region is None:
+            outcome.note = 'not unique within margin'
+        else:
+            outcome.cost_after_ms = self._cost(template, outcome.region)
+            outcome.note = 'region only'
+        return outcome
+
+
+def load_frames(path: str, max_frames: int = 0) -> List[np.ndarray]:
+    """
+    Read recorded frames from an image directory or a video file
+    
+    Args:
+        path: Frame directory or video
+        max_frames: Frame limit (0 = all)
+        
+    Returns:
+        List of BGR frames
+    """
+    source = ReplayFrameSource(path)
+    frames = []
+    while not max_frames or len(frames) < max_frames:
+        frame = source.grab()
+        if frame is None:
+            break
+        frames.append(frame[0])
+    source.close()
+    return frames
+
+
+def template_icons(plan: ProcessPlan) -> Dict[str, TemplateRef]:
+    """
+    Collect the correlation-matched icons of a plan by path
+    
+    Feature engines ignore search regions and lose keypoints on crops, so
+    their icons are left as they are.
+    """
+    icons = {}
+    for task in plan.tasks:
+        if task.engine != ENGINE_TEMPLATE:
+            continue
+        for group in task.icon_groups:
+            for icon in group.icons:
+                icons.setdefault(icon.path, icon)
+    return icons
+
+
+def write_output(config: Dict[str, Any],
+                 process_name: str,
+                 plan: ProcessPlan,
+                 outcomes: List[OptimizedTemplate],
+                 out_dir: str) -> bool:
+    """
+    Write the optimized resource directory, config and report
+    
+    Args:
+        config: Full original configuration
+        process_name: Optimized process
+        plan: Compiled plan of the process
+        outcomes: Optimization results
+        out_dir: Output directory
+        
+    Returns:
+        True if written
+    """
+    resource_out = os.path.join(out_dir, 'resources')
+    try:
+        shutil.copytree(plan.resource_dir, resource_out, dirs_exist_ok=True)
+        options: Dict[str, Dict[str, Any]] = {}
+        for outcome in outcomes:
+            entry: Dict[str, Any] = {}
+            if outcome.crop is not None:
+                x, y, w, h = outcome.crop
+                image = cv2.imread(outcome.icon.path, cv2.IMREAD_UNCHANGED)
+                target = os.path.join(resource_out, os.path.relpath(outcome.icon.path, plan.resource_dir))
+                if image is None or not cv2.imwrite(target, image[y:y + h, x:x + w]):
+                    logger.error(f"Failed to write optimized template: {target}")
+                    return False
+                # Crops of already cropped templates keep pointing at the full icon
+                entry['Origin'] = {'X': outcome.icon.origin[0] + x, 'Y': outcome.icon.origin[1] + y}
+            elif outcome.icon.origin != (0, 0):
+                entry['Origin'] = {'X': outcome.icon.origin[0], 'Y': outcome.icon.origin[1]}
+            if outcome.region is not None:
+                x, y, w, h = outcome.region
+                entry['SearchRegion'] = {'X': x, 'Y': y, 'Width': w, 'Height': h}
+            if entry:
+                options[outcome.icon.name] = entry
+        
+        optimized = copy.deepcopy(config)
+        process = ConfigLoader.get_process_config(optimized, process_name)
+        process['ResourcePath'] = 'resources'
+        for task in process.get('Tasks', []):
+            names = {icon for group in task.get('IconGroups', []) for icon in group}
+            # Merge per icon so options the optimizer does not set (e.g. 'ExactTolerance') survive
+            for name in sorted(names & set(options)):
+                task.setdefault('IconOptions', {}).setdefault(name, {}).update(options[name])
+        with open(os.path.join(out_dir, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump(optimized, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(out_dir, 'optimize_report.json'), 'w', encoding='utf-8') as f:
+            json.dump({'process': process_name, 'frames': outcomes[0].frames if outcomes else 0,
+                       'templates': [o.row() for o in outcomes]}, f, indent=2)
+    except OSError as e:
+        logger.error(f"Failed to write optimized output to {out_dir}: {e}")
+        return False
+    return True
+
+
+def format_report(outcomes: List[OptimizedTemplate]) -> str:
+    """
+    Render the before/after report as a text table
+    
+    Args:
+        outcomes: Optimization results
+        
+    Returns:
+        Multi-line report text
+    """
+    lines = [f"{'icon':<32} {'size':>9} {'optimized':>9} {'area':>6} {'margin':>6} "
+             f"{'before ms':>9} {'after ms':>8} {'accuracy':>8}  note"]
+    before = after = 0.0
+    for outcome in outcomes:
+        r = outcome.row()
+        before += r['cost_before_ms']
+        after += r['cost_after_ms']
+        name = r['icon'] if len(r['icon']) <= 32 else '...' + r['icon'][-29:]
+        lines.append(f"{name:<32} {'x'.join(map(str, r['original_size'])):>9} "
+                     f"{'x'.join(map(str, r['optimized_size'])):>9} {r['area_ratio']:>6.0%} "
+                     f"{r['margin']:>6.2f} {r['cost_before_ms']:>9.2f} {r['cost_after_ms']:>8.2f} "
+                     f"{r['accuracy']:>8.1%}  {r['note']}")
+    if before:
+        lines.append(f"Total matching cost per frame: {before:.2f} ms -> {after:.2f} ms "
+                     f"({before / max(after, 1e-9):.1f}x)")
+    return '\n'.join(lines)
+
+
+def main():
+    """Optimize a process's templates from the command line"""
+    parser = argparse.ArgumentParser(description='Shrink templates and propose search regions from recorded frames')
+    parser.add_argument('-c', '--config', required=True, help='Configuration file (JSON or YAML)')
+    parser.add_argument('-p', '--process', required=True, help='Process name in the config')
+    parser.add_argument('--frames', required=True, help='Directory of recorded frames or a video file')
+    parser.add_argument('--out', required=True, help='Output directory for resources, config and report')
+    parser.add_argument('--margin', type=float, default=0.1,
+                        help='Required gap between best and second-best peak (default: 0.1)')
+    parser.add_argument('--min-size', type=int, default=12, help='Smallest sub-patch side in pixels (default: 12)')
+    parser.add_argument('--region-padding', type=int, default=16,
+                        help='Pixels added around where a template was seen (default: 16)')
+    parser.add_argument('--max-frames', type=int, default=0, help='Frames to use (default: all)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    
+    config = ConfigLoader.load(args.config)
+    if not config or not ConfigLoader.validate_config(config):
+        sys.exit(1)
+    process_config = ConfigLoader.get_process_config(config, args.process)
+    if not process_config:
+        sys.exit(1)
+    plan = ConfigLoader.compile_process(process_config, os.path.dirname(os.path.abspath(args.config)))
+    if plan is None:
+        sys.exit(1)
+    
+    frames = load_frames(args.frames, args.max_frames)
+    if not frames:
+        logger.error(f"No frames read from {args.frames}")
+        sys.exit(1)
+    
+    optimizer = TemplateOptimizer(frames, plan.match_value, args.margin, args.min_size, args.region_padding)
+    outcomes = []
+    for icon in template_icons(plan).values():
+        template = cv2.imread(icon.path, cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            logger.error(f"Failed to load template: {icon.path}")
+            continue
+        outcomes.append(optimizer.optimize(icon, template))
+    
+    print(f"{args.process}: {len(outcomes)} templates over {len(frames)} frames")
+    print(format_report(outcomes))
+    if not write_output(config, args.process, plan, outcomes, args.out):
+        sys.exit(1)
+    print(f"Optimized resources and config written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Template Pack Module
+Pack a resource directory's templates into one memory-mapped binary file
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PACK_MAGIC = b'ACTPACK\0'
+PACK_VERSION = 1
+PACK_FILENAME = '.templates.pack'
+PACK_ALIGNMENT = 64
+TEMPLATE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# magic, version, header length
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _align(offset: int) -> int:
+    """Round offset up to the pack alignment"""
+    return (offset + PACK_ALIGNMENT - 1) // PACK_ALIGNMENT * PACK_ALIGNMENT
+
+
+def _file_sha1(filepath: str) -> str:
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class TemplatePack:
+    """
+    Read-only view of a template pack file
+
+    Layout: preamble | JSON header | padding | grayscale arrays, each
+    aligned to 64 bytes. Arrays are zero-copy views into the mapped file.
+    """
+
+    def __init__(self, pack_path: str):
+        """
+        Open and memory-map a pack file
+
+        Args:
+            pack_path: Path to pack file
+
+        Raises:
+            ValueError: If the file is not a pack of the current version
+        """
+        self.pack_path = os.path.abspath(pack_path)
+        self.resource_dir = os.path.dirname(self.pack_path)
+
+        with open(self.pack_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"Not a template pack: {pack_path}")
+        if version != PACK_VERSION:
+            raise ValueError(f"Unsupported template pack version {version}: {pack_path}")
+
+        header_start = _PREAMBLE.size
+        self.header: Dict[str, Any] = json.loads(
+            self._mmap[header_start:header_start + header_len].decode('utf-8'))
+        self.entries: Dict[str, Dict[str, Any]] = {e['name']: e for e in self.header['entries']}
+
+        buffer = memoryview(self._mmap)
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, entry in self.entries.items():
+            h, w = entry['shape']
+            self._arrays[name] = np.frombuffer(buffer, dtype=np.uint8, count=h * w,
+                                               offset=entry['offset']).reshape(h, w)
+
+        logger.info(f"Mapped template pack {self.pack_path}: {len(self._arrays)} templates")
+
+    def __len__(self) -> int:
+        return len(self._arrays)
+
+    def __contains__(self, template_path: str) -> bool:
+        return self.get(template_path) is not None
+
+    def get(self, template_path: str) -> Optional[np.ndarray]:
+        """
+        Get the packed grayscale template for a source path
+
+        Args:
+            template_path: Path of the source template image
+
+        Returns:
+            Read-only grayscale array or None if not in this pack
+        """
+        path = os.path.abspath(template_path)
+        if os.path.dirname(path) != self.resource_dir:
+            return None
+        return self._arrays.get(os.path.basename(path))
+
+    def is_stale(self) -> bool:
+        """
+        Check whether source templates changed since the pack was built
+
+        A changed mtime or size only counts when the content hash differs too,
+        so touching files does not force a rebuild.
+
+        Returns:
+            True if the pack must be rebuilt
+        """
+        sources = TemplatePack.list_sources(self.resource_dir)
+        if set(os.path.basename(p) for p in sources) != set(self.entries):
+            return True
+
+        for path in sources:
+            entry = self.entries[os.path.basename(path)]
+            st = os.stat(path)
+            if st.st_mtime_ns == entry['mtime_ns'] and st.st_size == entry['size']:
+                continue
+            if _file_sha1(path) != entry['sha1']:
+                return True
+        return False
+
+    @staticmethod
+    def list_sources(resource_dir: str) -> List[str]:
+        """
+        List template image files in a resource directory
+
+        Args:
+            resource_dir: Directory containing template images
+
+        Returns:
+            Sorted list of absolute file paths
+        """
+        resource_dir = os.path.abspath(resource_dir)
+        if not os.path.isdir(resource_dir):
+            return []
+        return sorted(
+            os.path.join(resource_dir, name) for name in os.listdir(resource_dir)
+            if name.lower().endswith(TEMPLATE_EXTENSIONS)
+        )
+
+    @staticmethod
+    def build(resource_dir: str, pack_path: Optional[str] = None) -> Optional[str]:
+        """
+        Build a pack file from every template in a resource directory
+
+        Args:
+            resource_dir: Directory containing template images
+            pack_path: Output path (default: <resource_dir>/.templates.pack)
+
+        Returns:
+            Path of the written pack or None if failed
+        """
+        resource_dir = os.path.abspath(resource_dir)
+        pack_path = pack_path or os.path.join(resource_dir, PACK_FILENAME)
+
+        entries = []
+        arrays = []
+        for path in TemplatePack.list_sources(resource_dir):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                logger.warning(f"Skipping unreadable template: {path}")
+                continue
+            # Same conversion the matcher applies at match time
+            gray = np.ascontiguousarray(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+            st = os.stat(path)
+            entries.append({
+                'name': os.path.basename(path),
+                'shape': list(gray.shape),
+                'mtime_ns': st.st_mtime_ns,
+                'size': st.st_size,
+                'sha1': _file_sha1(path),
+            })
+            arrays.append(gray)
+
+        # Header offsets depend on header length, so lay out until stable
+        data_offset = 0
+        while True:
+            offset = data_offset
+            for entry, gray in zip(entries, arrays):
+                entry['offset'] = offset
+                offset = _align(offset + gray.nbytes)
+            header = json.dumps({'entries': entries}).encode('utf-8')
+            required = _align(_PREAMBLE.size + len(header))
+            if required == data_offset:
+                break
+            data_offset = required
+
+        tmp_path = pack_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_PREAMBLE.pack(PACK_MAGIC, PACK_VERSION, len(header)))
+                f.write(header)
+                for entry, gray in zip(entries, arrays):
+                    f.write(b'\0' * (entry['offset'] - f.tell()))
+                    f.write(gray.tobytes())
+            os.replace(tmp_path, pack_path)
+        except OSError as e:
+            logger.error(f"Failed to write template pack {pack_path}: {e}")
+            return None
+
+        logger.info(f"Built template pack {pack_path}: {len(entries)} templates")
+        return pack_path
+
+    @classmethod
+    def load_or_build(cls, resource_dir: str) -> Optional['TemplatePack']:
+        """
+        Map the pack for a resource directory, rebuilding it first if stale
+
+        Args:
+            resource_dir: Directory containing template images
+
+        Returns:
+            TemplatePack or None if it could not be built
+        """
+        pack_path = os.path.join(os.path.abspath(resource_dir), PACK_FILENAME)
+
+        if os.path.exists(pack_path):
+            try:
+                pack = cls(pack_path)
+                if not pack.is_stale():
+                    return pack
+                logger.info(f"Template pack is stale, rebuilding: {pack_path}")
+                pack.close()
+            except (ValueError, OSError, KeyError) as e:
+                logger.warning(f"Discarding unreadable template pack {pack_path}: {e}")
+
+        if not cls.build(resource_dir, pack_path):
+            return None
+        return cls(pack_path)
+
+    def close(self):
+        """Drop array views and unmap the file"""
+        self._arrays.clear()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Views handed out to callers keep the mapping alive until collected
+            pass
+
+
+def main():
+    """Build template packs from the command line"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Pack template images into a memory-mapped file')
+    parser.add_argument('resource_dirs', nargs='+', help='Template directories (ResourcePath)')
+    args = parser.parse_args()
+
+    failed = [d for d in args.resource_dirs if not TemplatePack.build(d)]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -49,7 +49,8 @@ def test_capture(process_name: str, save_screenshot: bool = True):
     # Save screenshot
     if save_screenshot:
         output_file = f"screenshot_{process_name}.png"
-        cv2.imwrite(output_file, screenshot)
+        # Captured alpha is often zero, which would save a transparent image
+        cv2.imwrite(output_file, screenshot[:, :, :3])
         logger.info(f"Screenshot saved to: {output_file}")
     
     # Display screenshot (optional)
@@ -0,0 +1,87 @@
+"""
+Test Script for Input Backends
+Checks that action timelines reach the input backend as batched submissions
+"""
+import sys
+import time
+import logging
+
+from action_executor import ActionExecutor, StepKind
+from action_handler import ActionHandler
+from image_matcher import MatchResult
+from input_backend import RecordingInputBackend
+from mouse_controller import MouseController
+from task_plan import ActionOp, CompiledAction
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WINDOW_RECT = (100, 200, 900, 800)
+MATCH = MatchResult(matched=True, confidence=1.0, location=(10, 20), template_size=(30, 30))
+
+
+def play(actions, click_delay: float) -> RecordingInputBackend:
+    """
+    Play actions through an ActionExecutor on a recording backend
+    
+    Args:
+        actions: Compiled actions
+        click_delay: Delay between mouse down and up (seconds)
+        
+    Returns:
+        Backend holding the submitted batches
+    """
+    backend = RecordingInputBackend()
+    mouse = MouseController(click_delay=click_delay, backend=backend)
+    executor = ActionExecutor(mouse)
+    executor.start()
+    try:
+        assert executor.submit(ActionHandler(mouse).build_timeline(actions, MATCH, WINDOW_RECT, owner="test"))
+        deadline = time.monotonic() + 2.0
+        while executor.completed < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert executor.completed == 1, "timeline did not finish"
+    finally:
+        executor.stop()
+    return backend
+
+
+def test_click_is_one_batch():
+    """A click without a hold is submitted as a single move/down/up batch"""
+    backend = play([CompiledAction(ActionOp.CLICK, offset=(5, 5))], click_delay=0.0)
+    
+    assert len(backend.batches) == 1
+    _, batch = backend.batches[0]
+    assert [event.kind for event in batch] == [StepKind.MOVE, StepKind.DOWN, StepKind.UP]
+    assert (batch[0].x, batch[0].y) == (115, 225)
+    assert backend.position == (115, 225)
+
+
+def test_held_click_releases_in_second_batch():
+    """The release of a held click waits for click_delay in its own batch"""
+    backend = play([CompiledAction(ActionOp.CLICK, button="right")], click_delay=0.05)
+    
+    assert [[event.kind for event in batch] for _, batch in backend.batches] == \
+        [[StepKind.MOVE, StepKind.DOWN], [StepKind.UP]]
+    assert all(event.button == "right" for event in backend.events if event.kind != StepKind.MOVE)
+    (down_at, _), (up_at, _) = backend.batches
+    assert up_at - down_at >= 0.045
+
+
+def main():
+    """Main entry point"""
+    failed = 0
+    for test in (test_click_is_one_batch, test_held_click_releases_in_second_batch):
+        try:
+            test()
+            logger.info(f"{test.__name__}: passed")
+        except AssertionError as e:
+            logger.error(f"{test.__name__}: failed {e}")
+            failed += 1
+    
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Window Index Module
+Incrementally maintained index of process name -> PIDs -> window handles and rects
+"""
+import ctypes
+import ctypes.wintypes
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import psutil
+try:
+    import win32gui
+    import win32process
+except ImportError:
+    win32gui = win32process = None
+
+logger = logging.getLogger(__name__)
+
+# WinEvent constants (see <winuser.h>)
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+WINEVENT_OUTOFCONTEXT = 0x0000
+OBJID_WINDOW = 0
+WM_QUIT = 0x0012
+
+WINDOW_ADDED = 'window_added'
+WINDOW_REMOVED = 'window_removed'
+
+WindowListener = Callable[[str, str, int], None]
+
+
+def normalize_process_name(name: str) -> str:
+    """Lower-case a process name and strip a trailing '.exe'"""
+    name = name.lower()
+    return name[:-4] if name.endswith('.exe') else name
+
+
+class WindowIndex:
+    """Background-refreshed index of processes, their windows and window rects"""
+    
+    def __init__(self, refresh_interval: float = 1.0, use_events: bool = True):
+        """
+        Initialize window index
+        
+        Args:
+            refresh_interval: Seconds between incremental refreshes
+            use_events: Invalidate cached rects from WinEvent move/resize hooks;
+                        without hooks cached rects expire every refresh
+        """
+        self.refresh_interval = refresh_interval
+        self.use_events = use_events
+        
+        self._lock = threading.RLock()
+        self._pid_names: Dict[int, str] = {}
+        self._name_pids: Dict[str, Set[int]] = {}
+        self._pid_windows: Dict[int, List[int]] = {}
+        self._rects: Dict[int, Tuple[int, int, int, int]] = {}
+        self._listeners: List[WindowListener] = []
+        
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._hook_thread: Optional[threading.Thread] = None
+        self._hook_thread_id: Optional[int] = None
+        self._hook_callback = None
+        self._events_active = False
+        
+        self.refreshes = 0
+        self.rect_hits = 0
+        self.rect_misses = 0
+    
+    def add_listener(self, listener: WindowListener):
+        """
+        Register a change listener
+        
+        Args:
+            listener: Called with (event, process_name, hwnd) where event is
+                      'window_added' or 'window_removed'
+        """
+        self._listeners.append(listener)
+    
+    def _notify(self, event: str, process_name: str, hwnd: int):
+        for listener in self._listeners:
+            try:
+                listener(event, process_name, hwnd)
+            except Exception as e:
+                logger.error(f"Error in window listener: {e}")
+    
+    def refresh(self):
+        """Update the index, only querying names of processes that are new"""
+        pids = set(psutil.pids())
+        
+        with self._lock:
+            for pid in set(self._pid_names) - pids:
+                name = self._pid_names.pop(pid)
+                self._name_pids.get(name, set()).discard(pid)
+                
+            for pid in pids - set(self._pid_names):
+                try:
+                    name = normalize_process_name(psutil.Process(pid).name())
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                self._pid_names[pid] = name
+                self._name_pids.setdefault(name, set()).add(pid)
+                
+        # One EnumWindows pass maps every visible top-level window to its PID
+        pid_windows: Dict[int, List[int]] = {}
+        
+        def callback(hwnd, _):
+            if win32gui.IsWindowVisible(hwnd):
+                _, pid = win32process.GetWindowThreadProcessId(hwnd)
+                pid_windows.setdefault(pid, []).append(hwnd)
+            return True
+            
+        win32gui.EnumWindows(callback, None)
+        
+        with self._lock:
+            old_windows = {hwnd: pid for pid, hwnds in self._pid_windows.items() for hwnd in hwnds}
+            new_windows = {hwnd: pid for pid, hwnds in pid_windows.items() for hwnd in hwnds}
+            self._pid_windows = pid_windows
+            
+            for hwnd in set(old_windows) - set(new_windows):
+                self._rects.pop(hwnd, None)
+            if not self._events_active:
+                self._rects.clear()
+                
+            added = [(self._pid_names.get(new_windows[h], ''), h) for h in set(new_windows) - set(old_windows)]
+            removed = [(self._pid_names.get(old_windows[h], ''), h) for h in set(old_windows) - set(new_windows)]
+            self.refreshes += 1
+            
+        # The first refresh populates the index; only later ones are changes
+        if self.refreshes > 1:
+            for name, hwnd in added:
+                self._notify(WINDOW_ADDED, name, hwnd)
+            for name, hwnd in removed:
+                self._notify(WINDOW_REMOVED, name, hwnd)
+    
+    def find_pids(self, process_name: str) -> List[int]:
+        """
+        Get PIDs of processes with a given name
+        
+        Args:
+            process_name: Process name, with or without '.exe'
+            
+        Returns:
+            Sorted list of PIDs
+        """
+        with self._lock:
+            return sorted(self._name_pids.get(normalize_process_name(process_name), ()))
+    
+    def find_windows(self, process_name: str) -> List[int]:
+        """
+        Get visible top-level windows of processes with a given name
+        
+        Args:
+            process_name: Process name, with or without '.exe'
+            
+        Returns:
+            List of window handles in PID order
+        """
+        with self._lock:
+            return [hwnd for pid in self.find_pids(process_name)
+                    for hwnd in self._pid_windows.get(pid, ())]
+    
+    def has_window(self, hwnd: int) -> bool:
+        """Check whether a window was present at the last refresh"""
+        with self._lock:
+            return any(hwnd in hwnds for hwnds in self._pid_windows.values())
+    
+    def get_rect(self, hwnd: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Get a window rect, served from cache until the window moves or resizes
+        
+        Args:
+            hwnd: Window handle
+            
+        Returns:
+            Tuple of (left, top, right, bottom) or None if the window is gone
+        """
+        with self._lock:
+            rect = self._rects.get(hwnd)
+            if rect is not None:
+                self.rect_hits += 1
+                return rect
+            self.rect_misses += 1
+            
+        try:
+            rect = win32gui.GetWindowRect(hwnd)
+        except Exception as e:
+            logger.debug(f"Failed to get rect for window {hwnd}: {e}")
+            return None
+            
+        with self._lock:
+            self._rects[hwnd] = rect
+        return rect
+    
+    def invalidate_rect(self, hwnd: int):
+        """Drop the cached rect of a window"""
+        with self._lock:
+            self._rects.pop(hwnd, None)
+    
+    def _on_win_event(self, _hook, event, hwnd, id_object, _id_child, _thread, _time):
+        """WinEvent callback; runs on the hook thread"""
+        if id_object != OBJID_WINDOW or not hwnd:
+            return
+        self.invalidate_rect(hwnd)
+        if event != EVENT_OBJECT_DESTROY:
+            return
+            
+        removed_from = None
+        with self._lock:
+            for pid, hwnds in self._pid_windows.items():
+                if hwnd in hwnds:
+                    hwnds.remove(hwnd)
+                    removed_from = self._pid_names.get(pid, '')
+                    break
+        if removed_from is not None:
+            self._notify(WINDOW_REMOVED, removed_from, hwnd)
+    
+    def _run_hooks(self):
+        """Install WinEvent hooks and pump messages until stopped"""
+        user32 = ctypes.windll.user32
+        WinEventProc = ctypes.WINFUNCTYPE(None, ctypes.c_void_p, ctypes.c_ulong, ctypes.c_void_p,
+                                          ctypes.c_long, ctypes.c_long, ctypes.c_ulong, ctypes.c_ulong)
+        self._hook_callback = WinEventProc(
+            lambda *args: self._on_win_event(args[0], args[1], args[2] or 0, *args[3:]))
+        # HWINEVENTHOOK is pointer-sized; the default int restype truncates it on 64-bit
+        user32.SetWinEventHook.restype = ctypes.c_void_p
+        user32.SetWinEventHook.argtypes = [ctypes.wintypes.DWORD, ctypes.wintypes.DWORD,
+                                           ctypes.wintypes.HMODULE, WinEventProc,
+                                           ctypes.wintypes.DWORD, ctypes.wintypes.DWORD,
+                                           ctypes.wintypes.DWORD]
+        user32.UnhookWinEvent.restype = ctypes.wintypes.BOOL
+        user32.UnhookWinEvent.argtypes = [ctypes.c_void_p]
+        self._hook_thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        
+        # Separate hooks so the events in between (focus, name, value...) are never delivered
+        hooks = [user32.SetWinEventHook(event, event, 0, self._hook_callback, 0, 0, WINEVENT_OUTOFCONTEXT)
+                 for event in (EVENT_OBJECT_DESTROY, EVENT_OBJECT_LOCATIONCHANGE)]
+        if not all(hooks):
+            logger.warning("SetWinEventHook failed, cached rects expire on refresh instead")
+            for hook in filter(None, hooks):
+                user32.UnhookWinEvent(hook)
+            return
+            
+        self._events_active = True
+        try:
+            msg = ctypes.wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            self._events_active = False
+            for hook in hooks:
+                user32.UnhookWinEvent(hook)
+    
+    def _run_refresh(self):
+        """Refresh thread body"""
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Window index refresh failed: {e}")
+    
+    def start(self):
+        """Populate the index and start background maintenance"""
+        self._stop_event.clear()
+        self.refresh()
+        
+        self._refresh_thread = threading.Thread(target=self._run_refresh, daemon=True)
+        self._refresh_thread.start()
+        
+        if self.use_events:
+            self._hook_thread = threading.Thread(target=self._run_hooks, daemon=True)
+            self._hook_thread.start()
+            
+        logger.info(f"Window index started: {len(self._pid_names)} processes")
+    
+    def stop(self):
+        """Stop background maintenance"""
+        self._stop_event.set()
+        if self._hook_thread_id is not None:
+            ctypes.windll.user32.PostThreadMessageW(self._hook_thread_id, WM_QUIT, 0, 0)
+            self._hook_thread_id = None
+        for thread in (self._refresh_thread, self._hook_thread):
+            if thread:
+                thread.join(timeout=self.refresh_interval + 1.0)
+        self._refresh_thread = None
+        self._hook_thread = None
+    
+    def stats(self) -> Dict[str, int]:
+        """Get refresh and rect cache counters"""
+        with self._lock:
+            return {
+                'processes': len(self._pid_names),
+                'windows': sum(len(h) for h in self._pid_windows.values()),
+                'refreshes': self.refreshes,
+                'rect_hits': self.rect_hits,
+                'rect_misses': self.rect_misses,
+            }
@@ -2,22 +2,48 @@
 Window Manager Module
 Handles process finding and window management using Win32 APIs
 """
-import win32gui
-import win32process
-import win32con
 import psutil
+try:
+    import win32gui
+    import win32process
+    import win32con
+except ImportError:
+    # Windows-only; replays and simulations run without windows
+    win32gui = win32process = win32con = None
+import time
 import logging
 from typing import Optional, Tuple
 
+from window_index import WindowIndex
+
 logger = logging.getLogger(__name__)
 
 
 class WindowManager:
     """Manages window operations like finding, activating, and restoring windows"""
     
-    def __init__(self):
+    def __init__(self,
+                 index: Optional[WindowIndex] = None,
+                 min_backoff: float = 0.1,
+                 max_backoff: float = 5.0):
+        """
+        Initialize window manager
+        
+        Args:
+            index: Window index used for lookups and cached rects (optional)
+            min_backoff: First retry delay after the window is lost (seconds)
+            max_backoff: Maximum retry delay (seconds)
+        """
         self.hwnd: Optional[int] = None
         self.process_name: Optional[str] = None
+        self.index = index
+        
+        # Window loss recovery
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._backoff = min_backoff
+        self._next_retry = 0.0
+        self._lost = False
         
     def find_process_by_name(self, process_name: str) -> Optional[int]:
         """
@@ -29,6 +55,10 @@ class WindowManager:
         Returns:
             Process ID if found, None otherwise
         """
+        if self.index:
+            pids = self.index.find_pids(process_name)
+            return pids[0] if pids else None
+            
         process_name_lower = process_name.lower()
         for proc in psutil.process_iter(['pid', 'name']):
             try:
@@ -54,6 +84,16 @@ class WindowManager:
             Window handle (HWND) if found, None otherwise
         """
         self.process_name = process_name
+        
+        if self.index:
+            hwnds = self.index.find_windows(process_name)
+            if hwnds:
+                self.hwnd = hwnds[0]
+                logger.info(f"Found window handle: {self.hwnd}")
+                return self.hwnd
+            logger.warning(f"No window found for process '{process_name}'")
+            return None
+            
         target_pid = self.find_process_by_name(process_name)
         
         if not target_pid:
@@ -158,6 +198,9 @@ class WindowManager:
             logger.error("No window handle available")
             return None
         
+        if self.index:
+            return self.index.get_rect(hwnd)
+            
         try:
             rect = win32gui.GetWindowRect(hwnd)
             logger.debug(f"Window rect: {rect}")
@@ -181,3 +224,52 @@ class WindowManager:
             return False
         
         return win32gui.GetForegroundWindow() == hwnd
+    
+    def is_window_alive(self, hwnd: Optional[int] = None) -> bool:
+        """
+        Check if a window handle still refers to a window
+        
+        Args:
+            hwnd: Window handle (uses stored hwnd if not provided)
+            
+        Returns:
+            True if the window exists
+        """
+        hwnd = hwnd or self.hwnd
+        if not hwnd:
+            return False
+        return bool(win32gui.IsWindow(hwnd))
+    
+    def ensure_window(self) -> Optional[int]:
+        """
+        Get the stored window, re-finding it with backoff if it was lost
+        
+        Returns:
+            Window handle or None while the window is missing
+        """
+        if self.hwnd and self.is_window_alive(self.hwnd):
+            return self.hwnd
+            
+        if not self._lost:
+            logger.warning(f"Window for '{self.process_name}' lost, retrying with backoff")
+            self._lost = True
+            self._next_retry = 0.0
+            
+        now = time.monotonic()
+        if now < self._next_retry or not self.process_name:
+            return None
+            
+        if self.index:
+            self.index.refresh()
+            
+        hwnd = self.get_window_by_process_name(self.process_name)
+        if hwnd:
+            logger.info(f"Window for '{self.process_name}' recovered: {hwnd}")
+            self._lost = False
+            self._backoff = self.min_backoff
+            return hwnd
+            
+        self.hwnd = None
+        self._next_retry = now + self._backoff
+        self._backoff = min(self._backoff * 2, self.max_backoff)
+        return None